@@ -10,7 +10,6 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 import os
 from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
 from channels.security.websocket import AllowedHostsOriginValidator
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ai_platform.settings')
@@ -21,14 +20,16 @@ django_asgi_app = get_asgi_application()
 
 # Import routing after Django setup
 from core import routing
+from core.middleware import JWTAuthMiddlewareStack
 
 application = ProtocolTypeRouter({
     # Django's ASGI application to handle traditional HTTP requests
     "http": django_asgi_app,
     
-    # WebSocket handler with authentication
+    # WebSocket handler with JWT authentication (user cached per process),
+    # falling back to the Django session when no token is sent
     "websocket": AllowedHostsOriginValidator(
-        AuthMiddlewareStack(
+        JWTAuthMiddlewareStack(
             URLRouter(
                 routing.websocket_urlpatterns
             )
@@ -273,10 +273,57 @@ CHANNEL_LAYERS = {
         'BACKEND': 'channels_redis.core.RedisChannelLayer',
         'CONFIG': {
             "hosts": [(REDIS_HOST, REDIS_PORT)] if not REDIS_PASSWORD else [(REDIS_URL)],
+            # Messages a consumer's channel holds before group_send drops new ones.
+            # Consumers drain it into their own outbound queue (WS_OUTBOUND_QUEUE_SIZE)
+            "capacity": int(os.environ.get('CHANNEL_LAYER_CAPACITY', '100')),
+            "expiry": int(os.environ.get('CHANNEL_LAYER_EXPIRY', '60')),  # seconds
         },
     },
 }
 
+# Single-host deployments can run the channel layer without Redis: 'unix'
+# connects the ASGI processes and Celery workers over Unix sockets (see
+# core/channel_layers.py). The Celery broker and the cache (presence, event
+# replay, scheduler lock) are configured separately and may still use Redis.
+CHANNEL_LAYER_BACKEND = os.environ.get('CHANNEL_LAYER_BACKEND', 'redis')
+if CHANNEL_LAYER_BACKEND == 'unix':
+    CHANNEL_LAYERS['default'] = {
+        'BACKEND': 'core.channel_layers.UnixSocketChannelLayer',
+        'CONFIG': {
+            "path": os.environ.get('CHANNEL_LAYER_PATH', '/tmp/ai_platform_channels'),
+            "capacity": CHANNEL_LAYERS['default']['CONFIG']['capacity'],
+            "expiry": CHANNEL_LAYERS['default']['CONFIG']['expiry'],
+        },
+    }
+
+# WebSocket JWT auth user cache (see core/middleware.py), per ASGI process
+WS_AUTH_CACHE_SIZE = int(os.environ.get('WS_AUTH_CACHE_SIZE', '10000'))
+WS_AUTH_CACHE_TTL = int(os.environ.get('WS_AUTH_CACHE_TTL', '60'))  # seconds
+
+# Maximum job/project subscriptions (channel groups) per WebSocket connection
+WS_MAX_SUBSCRIPTIONS = int(os.environ.get('WS_MAX_SUBSCRIPTIONS', '200'))
+# Default window for coalescing job events into batched frames; 0 sends every
+# event immediately. Clients can pick their own with ?coalesce=<ms>
+WS_COALESCE_WINDOW = float(os.environ.get('WS_COALESCE_WINDOW', '0'))  # seconds
+# Unsent non-progress messages per connection before a slow client is told to
+# resync and disconnected; counters are flushed to the cache every interval
+WS_OUTBOUND_QUEUE_SIZE = int(os.environ.get('WS_OUTBOUND_QUEUE_SIZE', '500'))
+WS_METRICS_FLUSH_INTERVAL = int(os.environ.get('WS_METRICS_FLUSH_INTERVAL', '10'))  # seconds
+
+# Job event replay buffers (see core/event_replay.py), per channel group
+JOB_EVENT_REPLAY_ENABLED = os.environ.get('JOB_EVENT_REPLAY_ENABLED', 'True').lower() == 'true'
+JOB_EVENT_REPLAY_SIZE = int(os.environ.get('JOB_EVENT_REPLAY_SIZE', '100'))
+JOB_EVENT_REPLAY_TTL = int(os.environ.get('JOB_EVENT_REPLAY_TTL', '3600'))  # seconds
+
+# Server-Sent Events job streams (see core/sse.py): idle keepalive comment interval
+SSE_KEEPALIVE_INTERVAL = int(os.environ.get('SSE_KEEPALIVE_INTERVAL', '15'))  # seconds
+
+# Subscriber presence (see core/presence.py): skip publishing to groups nobody listens to
+JOB_EVENTS_SKIP_UNWATCHED = os.environ.get('JOB_EVENTS_SKIP_UNWATCHED', 'True').lower() == 'true'
+PRESENCE_TTL = int(os.environ.get('PRESENCE_TTL', '60'))  # seconds, refreshed every TTL / 2
+PRESENCE_GRACE = int(os.environ.get('PRESENCE_GRACE', '120'))  # seconds kept after a client leaves
+PRESENCE_CACHE_SECONDS = float(os.environ.get('PRESENCE_CACHE_SECONDS', '1.0'))
+
 # Celery Configuration
 CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', REDIS_URL)
 CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND', REDIS_URL)
@@ -291,6 +338,74 @@ CELERY_WORKER_SEND_TASK_EVENTS = True
 CELERY_TASK_SEND_SENT_EVENT = True
 CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
 
+# Periodic tasks (run by the celery-beat service)
+CELERY_BEAT_SCHEDULE = {
+    'evict-result-cache': {
+        'task': 'core.tasks.evict_result_cache',
+        'schedule': timedelta(minutes=15),
+    },
+    'schedule-pending-jobs': {
+        'task': 'core.tasks.schedule_pending_jobs',
+        'schedule': timedelta(seconds=30),
+    },
+    'reconcile-job-stats': {
+        'task': 'core.tasks.reconcile_job_stats',
+        'schedule': timedelta(minutes=30),
+    },
+}
+
+# Per-job-type processor routing overrides (see core/processors.py)
+# e.g. {'dubbing': {'max_concurrency': 4}, 'default': {'queue': 'celery'}}
+JOB_PROCESSOR_OVERRIDES = {}
+
+# Fair-share job scheduler (see core/scheduler.py)
+# Weights are keyed by user/project ID, e.g. {'12': 2.0}; the default weight is 1
+SCHEDULER_MAX_RUNNING_PER_USER = int(os.environ.get('SCHEDULER_MAX_RUNNING_PER_USER', '4'))
+SCHEDULER_MAX_RUNNING_PER_PROJECT = int(os.environ.get('SCHEDULER_MAX_RUNNING_PER_PROJECT', '8'))
+SCHEDULER_SCAN_LIMIT = int(os.environ.get('SCHEDULER_SCAN_LIMIT', '1000'))
+# Highest meta.priority non-staff users may set; staff may use up to 100
+SCHEDULER_MAX_USER_PRIORITY = int(os.environ.get('SCHEDULER_MAX_USER_PRIORITY', '0'))
+# Seconds a released job holds capacity; covers the longest time limit and its retries
+SCHEDULER_DISPATCH_LEASE = int(os.environ.get('SCHEDULER_DISPATCH_LEASE', '14400'))
+SCHEDULER_USER_WEIGHTS = {}
+SCHEDULER_PROJECT_WEIGHTS = {}
+
+# Dubbing fans out transcribe/translate/synthesize over segments of this length (seconds)
+DUBBING_SEGMENT_SECONDS = int(os.environ.get('DUBBING_SEGMENT_SECONDS', '60'))
+
+# Chunked parallel STT for long recordings (per-job overrides via Job.meta:
+# stt_mode, chunk_seconds, chunk_overlap_seconds, parallelism)
+STT_CHUNKED_MIN_SECONDS = int(os.environ.get('STT_CHUNKED_MIN_SECONDS', '600'))
+STT_CHUNK_SECONDS = int(os.environ.get('STT_CHUNK_SECONDS', '120'))
+STT_CHUNK_OVERLAP_SECONDS = float(os.environ.get('STT_CHUNK_OVERLAP_SECONDS', '2.0'))
+STT_PARALLELISM = int(os.environ.get('STT_PARALLELISM', '4'))
+
+# Content-addressed result cache for repeated jobs (see core/result_cache.py)
+RESULT_CACHE_ENABLED = os.environ.get('RESULT_CACHE_ENABLED', 'True').lower() == 'true'
+RESULT_CACHE_TTL_SECONDS = int(os.environ.get('RESULT_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))  # 7 days
+RESULT_CACHE_MAX_BYTES = int(os.environ.get('RESULT_CACHE_MAX_BYTES', str(1024 * 1024 * 1024)))  # 1 GB
+
+# Streaming job logs (see core/job_logs.py)
+JOB_LOG_ROOT = os.environ.get('JOB_LOG_ROOT', os.path.join(MEDIA_ROOT, 'jobs', 'logs'))
+JOB_LOG_FLUSH_LINES = int(os.environ.get('JOB_LOG_FLUSH_LINES', '50'))
+JOB_LOG_FLUSH_INTERVAL = float(os.environ.get('JOB_LOG_FLUSH_INTERVAL', '1.0'))
+JOB_LOG_SEGMENT_LINES = int(os.environ.get('JOB_LOG_SEGMENT_LINES', '1000'))
+JOB_LOG_SUMMARY_LINES = int(os.environ.get('JOB_LOG_SUMMARY_LINES', '20'))
+JOB_LOG_MAX_RANGE_LINES = int(os.environ.get('JOB_LOG_MAX_RANGE_LINES', '5000'))
+JOB_LOG_MAX_RANGE_BYTES = int(os.environ.get('JOB_LOG_MAX_RANGE_BYTES', str(1024 * 1024)))
+
+# Maximum number of job specs accepted by POST /api/jobs/bulk/
+JOB_BULK_MAX_ITEMS = int(os.environ.get('JOB_BULK_MAX_ITEMS', '10000'))
+
+# Job progress throttling (see core/progress.py)
+# Progress is persisted/broadcast only when it moved by at least MIN_DELTA points
+# or MIN_INTERVAL seconds passed; stage boundaries and terminal states always emit.
+JOB_PROGRESS_MIN_DELTA = int(os.environ.get('JOB_PROGRESS_MIN_DELTA', '10'))
+JOB_PROGRESS_MIN_INTERVAL = float(os.environ.get('JOB_PROGRESS_MIN_INTERVAL', '2.0'))
+
+# How often running processors check for cancellation, in seconds (see core/cancellation.py)
+JOB_CANCEL_POLL_INTERVAL = float(os.environ.get('JOB_CANCEL_POLL_INTERVAL', '1.0'))
+
 # Logging configuration
 LOGGING = {
     'version': 1,
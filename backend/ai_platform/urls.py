@@ -25,6 +25,7 @@ from rest_framework_simplejwt.views import (
     TokenVerifyView,
 )
 from core.serializers import CustomTokenObtainPairSerializer
+from core.sse import job_events, user_job_events
 from core.views import (
     test_connection,
     ProjectViewSet,
@@ -48,6 +49,9 @@ urlpatterns = [
     path('api/token/', TokenObtainPairView.as_view(serializer_class=CustomTokenObtainPairSerializer), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('api/token/verify/', TokenVerifyView.as_view(), name='token_verify'),
+    # Server-Sent Events streams of job events (ASGI only, before the router's jobs/<pk>/ route)
+    path('api/jobs/events/', user_job_events, name='user_job_events'),
+    path('api/jobs/<int:job_id>/events/', job_events, name='job_events'),
     # API endpoints using DRF router
     path('api/', include(router.urls)),
     # Test endpoint (kept for backward compatibility)
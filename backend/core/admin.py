@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Project, Job, JobResult, Profile, Settings
+from .models import Project, Job, JobResult, Profile, Settings, ResultCacheEntry, JobStats
 
 
 @admin.register(Project)
@@ -76,3 +76,22 @@ class SettingsAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+
+
+@admin.register(ResultCacheEntry)
+class ResultCacheEntryAdmin(admin.ModelAdmin):
+    """Admin interface for ResultCacheEntry model"""
+    list_display = ['key', 'job_type', 'hit_count', 'size_bytes', 'last_used_at', 'created_at']
+    list_filter = ['job_type', 'created_at']
+    search_fields = ['key', 'result_url']
+    readonly_fields = ['created_at']
+    date_hierarchy = 'last_used_at'
+
+
+@admin.register(JobStats)
+class JobStatsAdmin(admin.ModelAdmin):
+    """Admin interface for JobStats model (maintained by core/job_stats.py)"""
+    list_display = ['scope', 'scope_id', 'pending', 'running', 'completed', 'failed', 'cancelled', 'updated_at']
+    list_filter = ['scope']
+    search_fields = ['scope_id']
+    readonly_fields = ['updated_at']
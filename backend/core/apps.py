@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        # Job processors register themselves when core.tasks is imported. Web
+        # processes never import it otherwise, and the scheduler needs the
+        # registry there too.
+        from . import tasks  # noqa: F401
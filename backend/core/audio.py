@@ -0,0 +1,206 @@
+"""
+Audio/video segmentation helpers for parallel job processing.
+
+Long media is split into segments that are processed independently by
+Celery sub-tasks and reassembled in order by a fan-in task.
+"""
+
+import math
+import sys
+import wave
+from array import array
+
+
+# Window size (seconds) used for level analysis and silence detection
+LEVEL_WINDOW_SECONDS = 0.05
+
+
+def fixed_segments(duration, segment_seconds):
+    """
+    Split ``duration`` seconds into consecutive fixed-length segments.
+
+    Returns a list of ``(index, start, end)`` tuples covering the whole
+    duration; the last segment may be shorter.
+    """
+    if duration <= 0:
+        return []
+    segment_seconds = max(1, segment_seconds)
+    segments = []
+    start = 0
+    index = 0
+    while start < duration:
+        end = min(start + segment_seconds, duration)
+        segments.append((index, start, end))
+        start = end
+        index += 1
+    return segments
+
+
+def read_wav_levels(path, window_seconds=LEVEL_WINDOW_SECONDS, start=0.0, end=None, max_rate=4000):
+    """
+    Read a PCM WAV file and return its duration and per-window RMS levels.
+
+    Levels are normalized to 0.0-1.0 of full scale and cover [start, end)
+    of the file. Samples are decimated to at most ``max_rate`` per second,
+    which is plenty for silence detection and keeps multi-hour files fast.
+    Only the standard library is used, so only uncompressed PCM WAV input
+    is supported.
+
+    Returns:
+        (duration_seconds, levels) where levels[i] covers
+        [start + i * window_seconds, start + (i + 1) * window_seconds)
+    """
+    with wave.open(str(path), 'rb') as wav:
+        channels = wav.getnchannels()
+        sample_width = wav.getsampwidth()
+        rate = wav.getframerate()
+        frame_count = wav.getnframes()
+        typecode = {1: 'b', 2: 'h', 4: 'i'}.get(sample_width)
+        if typecode is None:
+            raise ValueError(f'Unsupported WAV sample width: {sample_width} bytes')
+        full_scale = float(2 ** (8 * sample_width - 1))
+        frames_per_window = max(1, int(round(rate * window_seconds)))
+        stride = channels * max(1, rate // max_rate)
+
+        first_frame = min(frame_count, int(round(start * rate)))
+        last_frame = frame_count if end is None else min(frame_count, int(round(end * rate)))
+        wav.setpos(first_frame)
+        remaining = last_frame - first_frame
+
+        levels = []
+        while remaining > 0:
+            raw = wav.readframes(min(frames_per_window, remaining))
+            if not raw:
+                break
+            remaining -= len(raw) // (sample_width * channels)
+            samples = array(typecode)
+            if sample_width == 1:
+                # 8-bit WAV is unsigned; shift to signed
+                samples.frombytes(bytes((byte - 128) & 0xFF for byte in raw))
+            else:
+                samples.frombytes(raw)
+                if sys.byteorder == 'big':
+                    samples.byteswap()
+            samples = samples[::stride]
+            power = sum(sample * sample for sample in samples) / max(1, len(samples))
+            levels.append(math.sqrt(power) / full_scale)
+
+    return frame_count / float(rate), levels
+
+
+def detect_silences(levels, window_seconds=LEVEL_WINDOW_SECONDS, threshold=0.02, min_silence_seconds=0.3):
+    """
+    Find silent intervals in a level sequence from read_wav_levels().
+
+    Returns a list of ``(start, end)`` tuples in seconds for runs of windows
+    below ``threshold`` lasting at least ``min_silence_seconds``.
+    """
+    silences = []
+    run_start = None
+    for index, level in enumerate(list(levels) + [float('inf')]):
+        if level < threshold:
+            if run_start is None:
+                run_start = index
+        elif run_start is not None:
+            start, end = run_start * window_seconds, index * window_seconds
+            if end - start >= min_silence_seconds:
+                silences.append((start, end))
+            run_start = None
+    return silences
+
+
+def speech_runs(levels, window_seconds=LEVEL_WINDOW_SECONDS, threshold=0.02):
+    """
+    Return ``(start, end)`` tuples in seconds of contiguous non-silent windows.
+    """
+    runs = []
+    run_start = None
+    for index, level in enumerate(list(levels) + [0.0]):
+        if level >= threshold and run_start is None:
+            run_start = index
+        elif level < threshold and run_start is not None:
+            runs.append((run_start * window_seconds, index * window_seconds))
+            run_start = None
+    return runs
+
+
+def plan_chunks(duration, chunk_seconds, overlap_seconds=0.0, silences=(), search_ratio=0.2,
+                resolution=None):
+    """
+    Split ``duration`` seconds into overlapping chunks cut at silence.
+
+    Each nominal boundary (every ``chunk_seconds``) is moved to the middle
+    of the closest silence within ``search_ratio * chunk_seconds``, so words
+    are not cut in half. Every chunk except the last extends
+    ``overlap_seconds`` past its boundary; merge_transcripts() removes the
+    duplicated words from that overlap.
+
+    Boundaries are snapped to multiples of ``resolution`` seconds when given
+    (e.g. the level window size, so chunk analysis lines up with a serial pass).
+
+    Returns a list of ``(index, start, end, boundary)`` tuples where
+    ``boundary`` is where the chunk's own region ends (start of the next chunk).
+    """
+    if duration <= 0:
+        return []
+    chunk_seconds = max(1.0, float(chunk_seconds))
+    search = chunk_seconds * search_ratio
+    midpoints = [(start + end) / 2.0 for start, end in silences]
+
+    boundaries = []
+    position = 0.0
+    while position + chunk_seconds < duration:
+        target = position + chunk_seconds
+        candidates = [
+            point for point in midpoints
+            if abs(point - target) <= search and position < point < duration
+        ]
+        boundary = min(candidates, key=lambda point: abs(point - target)) if candidates else target
+        if resolution:
+            boundary = round(round(boundary / resolution) * resolution, 6)
+        if boundary <= position:
+            boundary = target
+        boundaries.append(boundary)
+        position = boundary
+    boundaries.append(duration)
+
+    chunks = []
+    start = 0.0
+    for index, boundary in enumerate(boundaries):
+        end = min(duration, boundary + overlap_seconds) if boundary < duration else duration
+        chunks.append((index, start, end, boundary))
+        start = boundary
+    return chunks
+
+
+def merge_transcripts(chunk_results):
+    """
+    Merge per-chunk transcripts into one transcript with absolute timestamps.
+
+    Each chunk result is a dict with ``index``, ``start``, ``boundary`` and
+    ``segments`` (dicts with ``start``/``end``/``text`` relative to the chunk
+    start). Segments from a chunk's overlap region (starting at or after its
+    boundary) are dropped because the next chunk transcribes them, and a
+    segment overlapping the previously kept one is treated as a duplicate.
+    """
+    merged = []
+    for chunk in sorted(chunk_results, key=lambda result: result['index']):
+        offset = chunk['start']
+        for segment in chunk['segments']:
+            start = round(segment['start'] + offset, 3)
+            end = round(segment['end'] + offset, 3)
+            if start >= chunk['boundary']:
+                continue
+            if merged and start < merged[-1]['end']:
+                continue
+            merged.append({'start': start, 'end': end, 'text': segment['text']})
+    return merged
+
+
+def wav_duration(path):
+    """Return the duration of a WAV file in seconds, or None if it is not a readable WAV"""
+    try:
+        with wave.open(str(path), 'rb') as wav:
+            return wav.getnframes() / float(wav.getframerate())
+    except (wave.Error, EOFError, OSError):
+        return None
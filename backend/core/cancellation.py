@@ -0,0 +1,138 @@
+"""
+Cooperative job cancellation.
+
+Cancelling a job does three things:
+- moves it to CANCELLED with a conditional UPDATE, so only PENDING or
+  RUNNING jobs can be cancelled
+- sets a cancellation flag in the Django cache (Redis in production)
+- revokes its process_job task if it is still waiting in a queue
+
+Running processors poll the flag through a CancellationToken. Every
+ProgressReporter holds one, and update()/stage() raise JobCancelled once
+the flag is set. The worker therefore stops within one progress step
+and its slot is free for the next job. Polling reads the cache, never
+the database, and is throttled to settings.JOB_CANCEL_POLL_INTERVAL.
+
+Terminal transitions in ProgressReporter only apply to PENDING/RUNNING
+jobs, so a cancelled job never becomes COMPLETED or FAILED afterwards,
+and finish_job discards the result of a job cancelled mid-flight.
+"""
+
+import time
+from celery import current_app
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from .models import Job, JobStatus
+from .events import publisher
+from . import job_stats, scheduler
+
+
+# How long the cancellation flag outlives the cancel request
+FLAG_TIMEOUT = 24 * 3600
+
+
+class JobCancelled(Exception):
+    """Raised inside a processor when its job has been cancelled"""
+
+    def __init__(self, job_id):
+        super().__init__(f'Job {job_id} was cancelled')
+        self.job_id = job_id
+
+
+def _flag_key(job_id):
+    return f'job_cancelled_{job_id}'
+
+
+def task_id_for(job_id):
+    """Celery task ID used when dispatching process_job for a job, so it can be revoked"""
+    return f'process_job-{job_id}'
+
+
+def is_cancelled(job_id):
+    """Whether cancellation was requested for a job (a cache read)"""
+    return bool(cache.get(_flag_key(job_id)))
+
+
+def check(job_id):
+    """Raise JobCancelled if cancellation was requested for a job"""
+    if is_cancelled(job_id):
+        raise JobCancelled(job_id)
+
+
+class CancellationToken:
+    """
+    Cheap, throttled cancellation check for one job.
+
+    Usage:
+        token = CancellationToken(job.id)
+        for step in steps:
+            token.check()   # raises JobCancelled once the job is cancelled
+            ...
+    """
+
+    def __init__(self, job_id, poll_interval=None, clock=time.monotonic):
+        self.job_id = job_id
+        self.poll_interval = (
+            poll_interval if poll_interval is not None
+            else getattr(settings, 'JOB_CANCEL_POLL_INTERVAL', 1.0)
+        )
+        self.clock = clock
+        self.cancelled = False
+        self._checked_at = None
+
+    def check(self, force=False):
+        """
+        Raise JobCancelled if the job was cancelled.
+
+        The cache is read at most once per poll interval unless ``force``
+        is set; once cancellation is seen it is remembered.
+        """
+        if not self.cancelled:
+            now = self.clock()
+            if force or self._checked_at is None or now - self._checked_at >= self.poll_interval:
+                self._checked_at = now
+                self.cancelled = is_cancelled(self.job_id)
+        if self.cancelled:
+            raise JobCancelled(self.job_id)
+
+
+def cancel(job):
+    """
+    Cancel a pending or running job.
+
+    Queued tasks are revoked, so workers discard them without running the
+    processor. Running processors see the flag at their next progress step.
+    Returns False if the job was already in a final state.
+
+    Args:
+        job: Job instance, ideally fetched with select_related('project', 'created_by')
+    """
+    with transaction.atomic():
+        # The caller's instance may be stale (a worker started the job since):
+        # lock the row and cancel from the status it holds now
+        current = Job.objects.select_for_update().filter(pk=job.pk).values('status', 'dispatched_at').first()
+        if current is None:
+            return False
+        previous_status = job.status = current['status']
+        job.dispatched_at = current['dispatched_at']
+        if previous_status not in (JobStatus.PENDING, JobStatus.RUNNING):
+            return False
+        Job.objects.filter(pk=job.pk).update(status=JobStatus.CANCELLED)
+        job.status = JobStatus.CANCELLED
+        job_stats.record_status_change(job, previous_status)
+
+    cache.set(_flag_key(job.pk), 1, timeout=FLAG_TIMEOUT)
+    if previous_status == JobStatus.PENDING and job.dispatched_at:
+        current_app.control.revoke(task_id_for(job.pk))
+
+    publisher.publish(
+        job,
+        'job_status_change',
+        status=JobStatus.CANCELLED,
+        previous_status=previous_status
+    )
+
+    # The job no longer holds scheduler capacity
+    scheduler.schedule()
+    return True
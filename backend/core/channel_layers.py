@@ -0,0 +1,295 @@
+"""
+Channel layer for single-host deployments, without Redis.
+
+UnixSocketChannelLayer connects the ASGI processes and Celery workers of
+one machine over Unix domain datagram sockets. Select it in
+settings.CHANNEL_LAYERS (CHANNEL_LAYER_BACKEND=unix):
+
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'core.channel_layers.UnixSocketChannelLayer',
+            'CONFIG': {'path': '/dev/shm/ai_platform_channels'},
+        },
+    }
+
+Every process that receives messages (ASGI servers) binds one datagram
+socket under ``<path>/sockets/``. Its channels are process-local channels
+whose names carry the process ID (``specific.<process>!<token>``).
+Incoming datagrams are dispatched to a bounded asyncio queue per channel.
+
+Group membership lives on the filesystem. Each group is a directory
+under ``<path>/groups/`` with one empty file per member channel, so
+publishers in other processes can fan out without asking anyone.
+group_send() sends one datagram per receiving process, not one per
+member channel, and the receiving process delivers it to all of its
+members locally.
+
+Only process-local channels exist: send() to a plain channel name such
+as ``email.send`` raises ValueError, since no process owns it.
+
+Sends never block, and a message that cannot be delivered is dropped and
+logged instead of raising:
+- if a receiving process is gone, its memberships are removed
+- if its socket buffer or a channel queue is full, the message is
+  dropped, the same as a full channel in channels_redis
+- if the message is larger than one datagram (MAX_DATAGRAM) or the
+  kernel refuses it, it is dropped for that process only, and
+  group_send() carries on with the other processes
+
+Messages are MessagePack-encoded and must fit in one datagram (about
+200 KB with default kernel limits). Keep ``path`` on a tmpfs such as
+/dev/shm and short enough for socket paths (108 bytes).
+
+This layer only takes the channel layer off Redis. Other parts of the
+platform still use the Django cache, and with django-redis that is Redis
+too: the Celery broker, presence (core/presence.py), the replay buffers
+(core/event_replay.py), the scheduler lock and cancellation flags. With a
+non-Redis cache, presence is disabled (every group counts as watched),
+and the replay buffers only live inside each process. Events published
+by Celery workers then cannot be replayed by ASGI processes, so set
+JOB_EVENT_REPLAY_ENABLED=False there.
+
+group_send() works from synchronous code through async_to_sync(), e.g.
+in Celery workers, because sending needs no event loop. See
+``python manage.py channel_layer_benchmark`` for a latency comparison
+with the Redis layer.
+"""
+
+import asyncio
+import atexit
+import logging
+import os
+import random
+import shutil
+import socket
+import string
+import time
+from collections import defaultdict
+import msgpack
+from channels.layers import BaseChannelLayer
+
+
+logger = logging.getLogger(__name__)
+
+# Largest datagram read from the socket
+MAX_DATAGRAM = 256 * 1024
+# Receive buffer requested for a process socket (capped by net.core.rmem_max)
+RECEIVE_BUFFER = 4 * 1024 * 1024
+# How often a receiving process drops queues whose messages all expired
+CLEANUP_INTERVAL = 30
+
+
+class UnixSocketChannelLayer(BaseChannelLayer):
+    """Channel layer over Unix datagram sockets for processes on the same host"""
+
+    extensions = ['groups', 'flush']
+
+    def __init__(self, path=None, expiry=60, capacity=100, channel_capacity=None, **kwargs):
+        super().__init__(expiry=expiry, capacity=capacity, channel_capacity=channel_capacity, **kwargs)
+        self.path = path or '/tmp/ai_platform_channels'
+        self.process_id = f'{os.getpid()}-{"".join(random.choices(string.ascii_lowercase, k=6))}'
+        self._receiver = None
+        self._loop = None
+        self._sender = None
+        self._queues = {}
+        self._cleaned_at = time.monotonic()
+        os.makedirs(self._groups_dir(), exist_ok=True)
+        os.makedirs(self._sockets_dir(), exist_ok=True)
+
+    # Paths
+
+    def _groups_dir(self):
+        return os.path.join(self.path, 'groups')
+
+    def _sockets_dir(self):
+        return os.path.join(self.path, 'sockets')
+
+    def _socket_path(self, process_id):
+        return os.path.join(self._sockets_dir(), f'{process_id}.sock')
+
+    def _group_dir(self, group):
+        return os.path.join(self._groups_dir(), group)
+
+    @staticmethod
+    def _process_of(channel):
+        """Process ID embedded in a process-local channel name"""
+        if '!' not in channel:
+            raise ValueError(
+                f'UnixSocketChannelLayer cannot send to {channel!r}: only process-local channels '
+                f'from new_channel() ("<prefix>.<process>!<token>") have a receiving process'
+            )
+        return channel.split('!', 1)[0].rsplit('.', 1)[-1]
+
+    # Sending
+
+    def _send_datagram(self, process_id, channels, message):
+        """Send a message for some channels of one process; False if the process is gone"""
+        if self._sender is None:
+            self._sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self._sender.setblocking(False)
+        payload = msgpack.packb(
+            {'c': channels, 'm': message, 'e': time.time() + self.expiry}, use_bin_type=True
+        )
+        if len(payload) > MAX_DATAGRAM:
+            logger.warning(
+                'Dropped %s message of %d bytes for %d channel(s): larger than one datagram (%d bytes)',
+                message.get('type'), len(payload), len(channels), MAX_DATAGRAM,
+            )
+            return True
+        try:
+            self._sender.sendto(payload, self._socket_path(process_id))
+        except (FileNotFoundError, ConnectionRefusedError):
+            return False
+        except BlockingIOError:
+            # Receiver is saturated; drop like a full channel
+            pass
+        except OSError as exc:
+            # e.g. EMSGSIZE below the kernel's datagram limit; the other processes still get theirs
+            logger.warning('Dropped %s message for process %s: %s', message.get('type'), process_id, exc)
+        return True
+
+    async def send(self, channel, message):
+        """Send a message onto a process-local channel"""
+        assert isinstance(message, dict), 'message is not a dict'
+        self.require_valid_channel_name(channel)
+        self._send_datagram(self._process_of(channel), [channel], message)
+
+    async def group_send(self, group, message):
+        """Send a message to every member of a group, one datagram per process"""
+        assert isinstance(message, dict), 'message is not a dict'
+        self.require_valid_group_name(group)
+        try:
+            members = os.listdir(self._group_dir(group))
+        except FileNotFoundError:
+            return
+        by_process = defaultdict(list)
+        for channel in members:
+            by_process[self._process_of(channel)].append(channel)
+        for process_id, channels in by_process.items():
+            if not self._send_datagram(process_id, channels, message):
+                # The process is gone; forget its memberships
+                for channel in channels:
+                    self._unlink(os.path.join(self._group_dir(group), channel))
+
+    # Receiving
+
+    async def new_channel(self, prefix='specific.'):
+        """Return a new process-local channel name served by this process"""
+        self._ensure_receiver()
+        token = ''.join(random.choices(string.ascii_letters, k=12))
+        return f'{prefix.rstrip(".")}.{self.process_id}!{token}'
+
+    async def receive(self, channel):
+        """Receive the next unexpired message on one of this process's channels"""
+        self.require_valid_channel_name(channel)
+        if self._process_of(channel) != self.process_id:
+            raise ValueError(f'Channel {channel} is not served by this process')
+        self._ensure_receiver()
+        queue = self._queue(channel)
+        while True:
+            expires, message = await queue.get()
+            if expires >= time.time():
+                return message
+
+    def _queue(self, channel):
+        queue = self._queues.get(channel)
+        if queue is None:
+            queue = self._queues[channel] = asyncio.Queue(maxsize=self.get_capacity(channel))
+        return queue
+
+    def _ensure_receiver(self):
+        loop = asyncio.get_running_loop()
+        if self._receiver is None:
+            path = self._socket_path(self.process_id)
+            receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            receiver.setblocking(False)
+            receiver.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER)
+            receiver.bind(path)
+            self._receiver = receiver
+            atexit.register(self._unlink, path)
+        if loop is not self._loop:
+            # The reader is tied to the loop that registered it
+            if self._loop is not None and not self._loop.is_closed():
+                self._loop.remove_reader(self._receiver.fileno())
+            loop.add_reader(self._receiver.fileno(), self._on_readable)
+            self._loop, self._queues = loop, {}
+
+    def _on_readable(self):
+        while True:
+            try:
+                payload = self._receiver.recv(MAX_DATAGRAM)
+            except BlockingIOError:
+                break
+            data = msgpack.unpackb(payload, raw=False)
+            for channel in data['c']:
+                try:
+                    self._queue(channel).put_nowait((data['e'], data['m']))
+                except asyncio.QueueFull:
+                    pass
+        if time.monotonic() - self._cleaned_at >= CLEANUP_INTERVAL:
+            self._clean_expired()
+
+    def _clean_expired(self):
+        """Drop queues of channels nobody reads any more, once all their messages expired"""
+        self._cleaned_at = time.monotonic()
+        now = time.time()
+        for channel, queue in list(self._queues.items()):
+            if queue._getters:
+                continue
+            if queue.empty() or queue._queue[-1][0] < now:
+                del self._queues[channel]
+
+    # Groups
+
+    async def group_add(self, group, channel):
+        """Add a channel to a group"""
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+        directory = self._group_dir(group)
+        while True:
+            os.makedirs(directory, exist_ok=True)
+            try:
+                with open(os.path.join(directory, channel), 'a'):
+                    return
+            except FileNotFoundError:
+                # A group_discard() elsewhere removed the group directory
+                # after it became empty; create it again
+                continue
+
+    async def group_discard(self, group, channel):
+        """Remove a channel from a group"""
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+        self._unlink(os.path.join(self._group_dir(group), channel))
+        try:
+            os.rmdir(self._group_dir(group))
+        except OSError:
+            # Not empty, or already removed
+            pass
+
+    # Flush extension
+
+    async def flush(self):
+        """Remove all group memberships and queued messages"""
+        shutil.rmtree(self._groups_dir(), ignore_errors=True)
+        os.makedirs(self._groups_dir(), exist_ok=True)
+        self._queues = {}
+
+    async def close(self):
+        """Stop receiving and remove this process's socket"""
+        if self._receiver is not None:
+            if self._loop is not None and not self._loop.is_closed():
+                self._loop.remove_reader(self._receiver.fileno())
+            self._receiver.close()
+            self._receiver, self._loop = None, None
+            self._unlink(self._socket_path(self.process_id))
+        if self._sender is not None:
+            self._sender.close()
+            self._sender = None
+
+    @staticmethod
+    def _unlink(path):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
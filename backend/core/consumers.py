@@ -1,280 +1,491 @@
-import json
+import asyncio
+import time
+from collections import Counter, OrderedDict, deque
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
+from asgiref.sync import sync_to_async
 from channels.db import database_sync_to_async
-from django.contrib.auth.models import AnonymousUser
-from rest_framework_simplejwt.tokens import UntypedToken
-from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
-from jwt import decode as jwt_decode
 from django.conf import settings
-from .models import Job
+from django.contrib.auth.models import AnonymousUser
+from django.db.models import Q
+from .models import Job, Project
+from .events import job_group, user_group, project_group
+from . import event_replay, presence, ws_metrics, ws_protocol
 
 
-class JobUpdateConsumer(AsyncWebsocketConsumer):
+class JobEventsConsumer(AsyncWebsocketConsumer):
     """
-    WebSocket consumer for real-time job updates.
-    Clients can subscribe to updates for specific jobs or all jobs for a user.
+    Base consumer for job event streams.
+
+    Tracks the channel groups the connection belongs to and supports a
+    multiplexed subscription protocol, so one socket can follow many jobs
+    and projects:
+
+        {"type": "subscribe", "jobs": [1, 2], "projects": [7]}
+        {"type": "unsubscribe", "jobs": [2]}
+
+    Subscriptions are limited to jobs and projects the user can see and
+    capped at settings.WS_MAX_SUBSCRIPTIONS groups per connection. Every
+    event sent to the client carries ``job_id`` for demultiplexing, and an
+    event reaching the socket through several subscribed groups (e.g. a job
+    and its project) is delivered once.
+
+    Events can be coalesced per connection: with a window set (by
+    settings.WS_COALESCE_WINDOW or ``?coalesce=<ms>`` on the URL), events
+    are buffered for that long and sent as one frame,
+    ``{"type": "batch", "events": [...]}``. Only the latest job_progress per
+    job is kept; status changes, job updates and log lines are never
+    dropped, and events keep their order.
+
+    Connecting with ``?last_event_id=<id>``, or passing ``last_event_id``
+    in a subscribe message, first replays the buffered events the client
+    missed (see core/event_replay.py) and then sends ``replay_complete``.
+
+    Frames are JSON text unless the client negotiates the compact
+    MessagePack subprotocol (see core/ws_protocol.py).
+
+    Events go through a bounded outbound queue drained by a writer task, so
+    a slow socket never stalls the channel-layer receive loop and its
+    channel does not silently overflow. While the writer is behind, queued
+    progress events are coalesced per job. Once settings.WS_OUTBOUND_QUEUE_SIZE
+    other events are waiting, the client is sent
+    ``{"type": "resync", "last_event_id": ...}`` and disconnected with
+    close code 4008. It should reconnect with that last_event_id to replay
+    what it missed. Delivered, coalesced and dropped events are counted per
+    consumer class (see core/ws_metrics.py).
     """
-    
-    async def connect(self):
-        """
-        Handle WebSocket connection.
-        Authenticates user via JWT token and subscribes to job update channels.
-        """
-        # Get JWT token from query string or headers
-        self.job_id = self.scope['url_route']['kwargs'].get('job_id')
-        self.user = self.scope.get('user')
-        
-        # If user is not authenticated via Channels auth middleware, try JWT
-        if isinstance(self.user, AnonymousUser):
-            await self.authenticate_jwt()
-        
-        # Reject connection if still not authenticated
-        if isinstance(self.user, AnonymousUser):
-            await self.close()
-            return
-        
-        # Determine channel group name
-        if self.job_id:
-            # Subscribe to updates for a specific job
-            self.group_name = f'job_{self.job_id}'
-        else:
-            # Subscribe to updates for all jobs created by this user
-            self.group_name = f'user_{self.user.id}_jobs'
-        
-        # Join the channel group
-        await self.channel_layer.group_add(
-            self.group_name,
-            self.channel_name
-        )
-        
-        # Accept the WebSocket connection
-        await self.accept()
-        
-        # Send initial connection confirmation
-        await self.send(text_data=json.dumps({
-            'type': 'connection_established',
-            'message': 'Connected to job updates',
-            'group': self.group_name,
-            'job_id': self.job_id,
-        }))
-    
+
+    # Recently delivered events remembered for de-duplication
+    RECENT_EVENTS = 256
+    # Upper bound for a client-requested coalescing window
+    MAX_COALESCE_WINDOW = 1.0
+    # Close code telling a slow client to reconnect and replay
+    OVERFLOW_CLOSE_CODE = 4008
+    # Close code for a job the user may not follow
+    FORBIDDEN_CLOSE_CODE = 4003
+
+    async def setup_subscriptions(self):
+        self.subprotocol = ws_protocol.negotiate(self.scope.get('subprotocols'))
+        self.groups_joined = set()
+        self._recent = deque(maxlen=self.RECENT_EVENTS)
+        self._recent_keys = set()
+        self.coalesce_window = self.get_coalesce_window()
+        self._outbox = OrderedDict()
+        self._outbox_seq = 0
+        # Queued messages other than coalesced progress; these count against outbox_limit
+        self._outbox_pending = 0
+        self._writer = None
+        self.outbox_limit = getattr(settings, 'WS_OUTBOUND_QUEUE_SIZE', 500)
+        self.overflowed = False
+        self.last_event_id = None
+        self.metrics = Counter()
+        self._metrics_flushed_at = time.monotonic()
+
+    def get_coalesce_window(self):
+        """Coalescing window in seconds for this connection (0 disables buffering)"""
+        window = getattr(settings, 'WS_COALESCE_WINDOW', 0)
+        milliseconds = self.query_int('coalesce')
+        if milliseconds is not None:
+            window = milliseconds / 1000
+        return min(max(window, 0), self.MAX_COALESCE_WINDOW)
+
+    def query_int(self, name):
+        """Integer query string parameter of the connection URL, or None"""
+        values = parse_qs(self.scope.get('query_string', b'').decode()).get(name)
+        try:
+            return int(values[0]) if values else None
+        except ValueError:
+            return None
+
+    async def replay(self, groups, after):
+        """Send buffered events of the groups newer than ``after``, then replay_complete"""
+        events, truncated = await sync_to_async(event_replay.read)(sorted(groups), after)
+        for event in events:
+            await getattr(self, event['type'])(event)
+        await self.queue_message({
+            'type': 'replay_complete',
+            'replayed': len(events),
+            'last_event_id': events[-1]['event_id'] if events else after,
+            'truncated': truncated,
+        })
+
+    async def join_group(self, group):
+        if group not in self.groups_joined:
+            await self.channel_layer.group_add(group, self.channel_name)
+            await presence.tracker.join(group, self.channel_name)
+            self.groups_joined.add(group)
+
+    async def leave_group(self, group):
+        if group in self.groups_joined:
+            await self.channel_layer.group_discard(group, self.channel_name)
+            await presence.tracker.leave(group, self.channel_name)
+            self.groups_joined.discard(group)
+
     async def disconnect(self, close_code):
         """
         Handle WebSocket disconnection.
-        Leave the channel group when client disconnects.
+        Leave every channel group the connection joined.
         """
-        if hasattr(self, 'group_name'):
-            await self.channel_layer.group_discard(
-                self.group_name,
-                self.channel_name
-            )
-    
-    async def authenticate_jwt(self):
+        if getattr(self, '_writer', None):
+            self._writer.cancel()
+        for group in list(getattr(self, 'groups_joined', ())):
+            await self.leave_group(group)
+        if hasattr(self, 'metrics'):
+            await self.flush_metrics()
+
+    async def send_connection_established(self, **fields):
+        """Confirm the connection; msgpack clients also get the code tables"""
+        message = {'type': 'connection_established', **fields}
+        if self.subprotocol == ws_protocol.MSGPACK_SUBPROTOCOL:
+            message['schema'] = ws_protocol.schema()
+        await self.send_json(message)
+
+    async def receive(self, text_data=None, bytes_data=None):
         """
-        Authenticate user using JWT token from query string.
+        Handle messages received from WebSocket client.
         """
-        query_string = self.scope.get('query_string', b'').decode()
-        token = None
-        
-        # Extract token from query string (e.g., ?token=xxx)
-        if 'token=' in query_string:
-            token = query_string.split('token=')[1].split('&')[0]
-        else:
-            # Try to get from headers
-            headers = dict(self.scope.get('headers', []))
-            auth_header = headers.get(b'authorization', b'').decode()
-            if auth_header.startswith('Bearer '):
-                token = auth_header.split('Bearer ')[1]
-        
-        if not token:
-            return
-        
         try:
-            # Validate token
-            UntypedToken(token)
-            decoded_data = jwt_decode(
-                token,
-                settings.SECRET_KEY,
-                algorithms=["HS256"]
+            data = ws_protocol.decode(text_data, bytes_data)
+        except ValueError:
+            await self.send_json({
+                'type': 'error',
+                'message': 'Invalid JSON format' if bytes_data is None else 'Invalid MessagePack frame',
+            })
+            return
+
+        message_type = data.get('type')
+        if message_type == 'ping':
+            # Respond to ping with pong
+            await self.send_json({
+                'type': 'pong',
+                'timestamp': data.get('timestamp'),
+            })
+        elif message_type == 'subscribe':
+            await self.subscribe(
+                data.get('jobs') or [], data.get('projects') or [], data.get('last_event_id')
             )
-            
-            # Get user from token
-            from django.contrib.auth import get_user_model
-            User = get_user_model()
-            user_id = decoded_data.get('user_id')
-            if user_id:
-                self.user = await database_sync_to_async(User.objects.get)(id=user_id)
-        except (InvalidToken, TokenError, Exception) as e:
-            # Token is invalid, user remains AnonymousUser
-            pass
-    
-    async def receive(self, text_data):
+        elif message_type == 'unsubscribe':
+            await self.unsubscribe(data.get('jobs') or [], data.get('projects') or [])
+        elif message_type == 'subscribe_job':
+            # Single-job form kept for older clients; adds to existing subscriptions
+            job_id = data.get('job_id')
+            if job_id:
+                await self.subscribe([job_id], [])
+
+    async def subscribe(self, job_ids, project_ids, last_event_id=None):
         """
-        Handle messages received from WebSocket client.
+        Join the groups of the visible jobs/projects, up to the per-socket cap.
+        With ``last_event_id``, missed events of the new groups are replayed.
+        """
+        job_ids = self.clean_ids(job_ids)
+        project_ids = self.clean_ids(project_ids)
+        allowed_jobs, allowed_projects = await self.visible_ids(job_ids, project_ids)
+
+        limit = getattr(settings, 'WS_MAX_SUBSCRIPTIONS', 200)
+        subscribed = {'jobs': [], 'projects': []}
+        rejected = {'jobs': [], 'projects': []}
+        joined = []
+        for kind, ids, allowed, group_for in (
+            ('jobs', job_ids, allowed_jobs, job_group),
+            ('projects', project_ids, allowed_projects, project_group),
+        ):
+            for object_id in ids:
+                group = group_for(object_id)
+                if object_id not in allowed:
+                    rejected[kind].append({'id': object_id, 'reason': 'not_found'})
+                elif group not in self.groups_joined and len(self.groups_joined) >= limit:
+                    rejected[kind].append({'id': object_id, 'reason': 'limit_reached'})
+                else:
+                    await self.join_group(group)
+                    subscribed[kind].append(object_id)
+                    joined.append(group)
+
+        await self.send_json({
+            'type': 'subscribed',
+            **subscribed,
+            'rejected': rejected,
+            'subscriptions': len(self.groups_joined),
+            'limit': limit,
+        })
+        if joined and last_event_id is not None:
+            try:
+                await self.replay(joined, int(last_event_id))
+            except (TypeError, ValueError):
+                pass
+
+    async def unsubscribe(self, job_ids, project_ids):
+        """Leave the groups of the given jobs/projects"""
+        job_ids = self.clean_ids(job_ids)
+        project_ids = self.clean_ids(project_ids)
+        for job_id in job_ids:
+            await self.leave_group(job_group(job_id))
+        for project_id in project_ids:
+            await self.leave_group(project_group(project_id))
+        await self.send_json({
+            'type': 'unsubscribed',
+            'jobs': job_ids,
+            'projects': project_ids,
+            'subscriptions': len(self.groups_joined),
+        })
+
+    @staticmethod
+    def clean_ids(values):
+        ids = []
+        for value in values if isinstance(values, list) else [values]:
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                continue
+            if value not in ids:
+                ids.append(value)
+        return ids
+
+    @database_sync_to_async
+    def visible_ids(self, job_ids, project_ids):
+        """IDs of the jobs and projects this user may follow, one query each"""
+        jobs = Job.objects.filter(id__in=job_ids)
+        projects = Project.objects.filter(id__in=project_ids)
+        if not self.user.is_superuser:
+            jobs = jobs.filter(Q(project__owner=self.user) | Q(created_by=self.user))
+            projects = projects.filter(owner=self.user)
+        return (
+            set(jobs.values_list('id', flat=True)) if job_ids else set(),
+            set(projects.values_list('id', flat=True)) if project_ids else set(),
+        )
+
+    async def send_json(self, data):
+        """Send a message in the connection's negotiated encoding"""
+        text_data, bytes_data = ws_protocol.encode(data, self.subprotocol)
+        await self.send(text_data=text_data, bytes_data=bytes_data)
+
+    async def send_event(self, event, data):
+        """Send an event unless it already reached this socket through another group"""
+        key = event.get('event_id') or (event['type'], event.get('job_id'), event.get('timestamp'))
+        if key in self._recent_keys:
+            return
+        if len(self._recent) == self._recent.maxlen:
+            self._recent_keys.discard(self._recent[0])
+        self._recent.append(key)
+        self._recent_keys.add(key)
+        await self.queue_message(data)
+
+    async def queue_message(self, data):
+        """
+        Queue a message for the writer task.
+
+        A job_progress replaces an unsent progress event of the same job,
+        so at most one per job is queued and those do not count against
+        the limit. Any other message is kept, unless outbox_limit of them
+        are already waiting, in which case the connection is closed with a
+        resync hint.
+        """
+        if self.overflowed:
+            self.metrics['dropped'] += 1
+            return
+        if data['type'] == 'job_progress':
+            buffer_key = ('job_progress', data['job_id'])
+            if self._outbox.pop(buffer_key, None) is not None:
+                self.metrics['coalesced'] += 1
+        elif self._outbox_pending >= self.outbox_limit:
+            await self.overflow()
+            return
+        else:
+            self._outbox_seq += 1
+            self._outbox_pending += 1
+            buffer_key = self._outbox_seq
+        self._outbox[buffer_key] = data
+        if self._writer is None:
+            self._writer = asyncio.ensure_future(self.drain())
+
+    async def drain(self):
+        """
+        Writer task: send queued messages until the queue is empty.
+
+        With a coalescing window, messages are collected for that long and
+        several are sent as a single batch frame.
         """
         try:
-            data = json.loads(text_data)
-            message_type = data.get('type')
-            
-            if message_type == 'ping':
-                # Respond to ping with pong
-                await self.send(text_data=json.dumps({
-                    'type': 'pong',
-                    'timestamp': data.get('timestamp'),
-                }))
-            elif message_type == 'subscribe_job':
-                # Subscribe to a specific job
-                job_id = data.get('job_id')
-                if job_id:
-                    new_group = f'job_{job_id}'
-                    # Leave old group if exists
-                    if hasattr(self, 'group_name'):
-                        await self.channel_layer.group_discard(
-                            self.group_name,
-                            self.channel_name
-                        )
-                    # Join new group
-                    self.group_name = new_group
-                    await self.channel_layer.group_add(
-                        self.group_name,
-                        self.channel_name
-                    )
-                    await self.send(text_data=json.dumps({
-                        'type': 'subscribed',
-                        'job_id': job_id,
-                        'group': self.group_name,
-                    }))
-        except json.JSONDecodeError:
-            await self.send(text_data=json.dumps({
-                'type': 'error',
-                'message': 'Invalid JSON format',
-            }))
-    
+            while self._outbox:
+                if self.coalesce_window:
+                    await asyncio.sleep(self.coalesce_window)
+                messages = list(self._outbox.values())
+                self._outbox.clear()
+                self._outbox_pending = 0
+                if self.coalesce_window and len(messages) > 1:
+                    await self.send_json({'type': 'batch', 'events': messages})
+                else:
+                    for message in messages:
+                        await self.send_json(message)
+                self.metrics['delivered'] += len(messages)
+                for message in reversed(messages):
+                    if message.get('event_id') is not None:
+                        self.last_event_id = message['event_id']
+                        break
+                if time.monotonic() - self._metrics_flushed_at >= getattr(settings, 'WS_METRICS_FLUSH_INTERVAL', 10):
+                    await self.flush_metrics()
+        finally:
+            self._writer = None
+
+    async def overflow(self):
+        """Drop the queue and disconnect a client that cannot keep up"""
+        self.overflowed = True
+        self.metrics['dropped'] += len(self._outbox) + 1
+        self.metrics['overflow_disconnects'] += 1
+        self._outbox.clear()
+        self._outbox_pending = 0
+        if self._writer is not None:
+            self._writer.cancel()
+        await self.send_json({
+            'type': 'resync',
+            'reason': 'slow_consumer',
+            'last_event_id': self.last_event_id,
+        })
+        await self.close(code=self.OVERFLOW_CLOSE_CODE)
+
+    async def flush_metrics(self):
+        """Add this connection's counters to the shared totals"""
+        counts, self.metrics = self.metrics, Counter()
+        self._metrics_flushed_at = time.monotonic()
+        if counts:
+            await sync_to_async(ws_metrics.record)(type(self).__name__, dict(counts))
+
     async def job_update(self, event):
         """
         Handle job update messages sent to the channel group.
         This method is called when a job update is broadcast to the group.
         """
         # Send job update to WebSocket
-        await self.send(text_data=json.dumps({
+        await self.send_event(event, {
             'type': 'job_update',
+            'job_id': event['job_id'],
+            'event_id': event.get('event_id'),
             'job': event['job'],
             'timestamp': event.get('timestamp'),
-        }))
-    
+        })
+
     async def job_progress(self, event):
         """
         Handle job progress update messages.
         """
-        await self.send(text_data=json.dumps({
+        await self.send_event(event, {
             'type': 'job_progress',
             'job_id': event['job_id'],
+            'event_id': event.get('event_id'),
             'progress': event['progress'],
             'status': event.get('status'),
             'timestamp': event.get('timestamp'),
-        }))
-    
+        })
+
     async def job_status_change(self, event):
         """
         Handle job status change messages.
         """
-        await self.send(text_data=json.dumps({
+        await self.send_event(event, {
             'type': 'job_status_change',
             'job_id': event['job_id'],
+            'event_id': event.get('event_id'),
             'status': event['status'],
             'previous_status': event.get('previous_status'),
             'timestamp': event.get('timestamp'),
-        }))
+        })
+
+    async def job_log(self, event):
+        """
+        Handle live log lines for a job (see core/job_logs.py).
+        Earlier lines can be fetched from /api/jobs/{id}/logs/ using first_line.
+        """
+        await self.send_event(event, {
+            'type': 'job_log',
+            'job_id': event['job_id'],
+            'first_line': event['first_line'],
+            'lines': event['lines'],
+            'timestamp': event.get('timestamp'),
+        })
+
+
+class JobUpdateConsumer(JobEventsConsumer):
+    """
+    WebSocket consumer for real-time job updates.
+    Clients can subscribe to updates for specific jobs or all jobs for a user,
+    and add or remove job/project subscriptions on the same connection.
+    """
+
+    async def connect(self):
+        """
+        Handle WebSocket connection.
+        Requires a user authenticated by JWTAuthMiddleware and subscribes to job update channels.
+        """
+        # User is resolved from the JWT by JWTAuthMiddleware (core/middleware.py)
+        self.job_id = self.scope['url_route']['kwargs'].get('job_id')
+        self.user = self.scope.get('user') or AnonymousUser()
+
+        # Reject connection if not authenticated
+        if not self.user.is_authenticated:
+            await self.close()
+            return
+
+        # Determine channel group name
+        if self.job_id:
+            # Same visibility check as the subscribe message, before any
+            # group is joined or event replayed
+            self.job_id = int(self.job_id)
+            visible_jobs, _ = await self.visible_ids([self.job_id], [])
+            if self.job_id not in visible_jobs:
+                await self.close(code=self.FORBIDDEN_CLOSE_CODE)
+                return
+            # Subscribe to updates for a specific job
+            self.group_name = job_group(self.job_id)
+        else:
+            # Subscribe to updates for all jobs created by this user
+            self.group_name = user_group(self.user.id)
+
+        # Join the channel group
+        await self.setup_subscriptions()
+        await self.join_group(self.group_name)
+
+        # Accept the WebSocket connection
+        await self.accept(subprotocol=self.subprotocol)
+
+        # Send initial connection confirmation
+        await self.send_connection_established(
+            message='Connected to job updates',
+            group=self.group_name,
+            job_id=self.job_id,
+        )
+
+        last_event_id = self.query_int('last_event_id')
+        if last_event_id is not None:
+            await self.replay(self.groups_joined, last_event_id)
 
 
-class UserJobsConsumer(AsyncWebsocketConsumer):
+class UserJobsConsumer(JobEventsConsumer):
     """
     WebSocket consumer for all jobs belonging to a user.
     Provides updates for all jobs created by the authenticated user.
     """
-    
+
     async def connect(self):
         """Handle WebSocket connection for user's jobs"""
-        self.user = self.scope.get('user')
-        
-        # Authenticate via JWT if needed
-        if isinstance(self.user, AnonymousUser):
-            await self.authenticate_jwt()
-        
-        if isinstance(self.user, AnonymousUser):
+        # User is resolved from the JWT by JWTAuthMiddleware (core/middleware.py)
+        self.user = self.scope.get('user') or AnonymousUser()
+
+        if not self.user.is_authenticated:
             await self.close()
             return
-        
+
         # Subscribe to all jobs for this user
-        self.group_name = f'user_{self.user.id}_jobs'
-        
-        await self.channel_layer.group_add(
-            self.group_name,
-            self.channel_name
+        self.group_name = user_group(self.user.id)
+
+        await self.setup_subscriptions()
+        await self.join_group(self.group_name)
+
+        await self.accept(subprotocol=self.subprotocol)
+
+        await self.send_connection_established(
+            message=f'Connected to updates for user {self.user.id} jobs',
+            user_id=self.user.id,
         )
-        
-        await self.accept()
-        
-        await self.send(text_data=json.dumps({
-            'type': 'connection_established',
-            'message': f'Connected to updates for user {self.user.id} jobs',
-            'user_id': self.user.id,
-        }))
-    
-    async def disconnect(self, close_code):
-        """Handle WebSocket disconnection"""
-        if hasattr(self, 'group_name'):
-            await self.channel_layer.group_discard(
-                self.group_name,
-                self.channel_name
-            )
-    
-    async def authenticate_jwt(self):
-        """Authenticate user using JWT token"""
-        query_string = self.scope.get('query_string', b'').decode()
-        token = None
-        
-        if 'token=' in query_string:
-            token = query_string.split('token=')[1].split('&')[0]
-        else:
-            headers = dict(self.scope.get('headers', []))
-            auth_header = headers.get(b'authorization', b'').decode()
-            if auth_header.startswith('Bearer '):
-                token = auth_header.split('Bearer ')[1]
-        
-        if not token:
-            return
-        
-        try:
-            UntypedToken(token)
-            decoded_data = jwt_decode(
-                token,
-                settings.SECRET_KEY,
-                algorithms=["HS256"]
-            )
-            from django.contrib.auth import get_user_model
-            User = get_user_model()
-            user_id = decoded_data.get('user_id')
-            if user_id:
-                self.user = await database_sync_to_async(User.objects.get)(id=user_id)
-        except (InvalidToken, TokenError, Exception):
-            pass
-    
-    async def job_update(self, event):
-        """Handle job update messages"""
-        await self.send(text_data=json.dumps({
-            'type': 'job_update',
-            'job': event['job'],
-            'timestamp': event.get('timestamp'),
-        }))
-    
-    async def job_progress(self, event):
-        """Handle job progress updates"""
-        await self.send(text_data=json.dumps({
-            'type': 'job_progress',
-            'job_id': event['job_id'],
-            'progress': event['progress'],
-            'status': event.get('status'),
-            'timestamp': event.get('timestamp'),
-        }))
 
+        last_event_id = self.query_int('last_event_id')
+        if last_event_id is not None:
+            await self.replay(self.groups_joined, last_event_id)
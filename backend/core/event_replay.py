@@ -0,0 +1,166 @@
+"""
+Replayable job event stream.
+
+Every job_update/job_progress/job_status_change event gets a
+monotonically increasing ``event_id`` when it is published. A copy is
+kept in a bounded ring buffer per channel group (``job_{id}``,
+``user_{id}_jobs``, ``project_{id}_jobs``). A WebSocket client that
+reconnects with ``?last_event_id=<id>`` (or passes ``last_event_id`` in a
+subscribe message) is first sent the events it missed, then goes live.
+It therefore does not need to re-list its jobs over REST after a network
+blip or an ASGI restart.
+
+Buffers keep the last settings.JOB_EVENT_REPLAY_SIZE events per group for
+up to settings.JOB_EVENT_REPLAY_TTL seconds. With django-redis as the
+cache backend, buffers and the sequence live in Redis (a sorted set per
+group, scored by event ID) and are shared by all workers and ASGI
+processes. Otherwise an in-process store is used, which only suits a
+single process (development, tests and the in-memory channel layer).
+
+When older events may have been evicted from a buffer, read() reports the
+replay as truncated and the client should re-fetch the jobs over REST.
+"""
+
+import json
+import threading
+from collections import deque
+from django.conf import settings
+
+
+# Event types kept for replay; log lines have their own range endpoint
+REPLAYED_EVENTS = {'job_update', 'job_progress', 'job_status_change'}
+
+SEQUENCE_KEY = 'job_events:seq'
+
+
+def _buffer_key(group):
+    return f'job_events:{group}'
+
+
+def _size():
+    return getattr(settings, 'JOB_EVENT_REPLAY_SIZE', 100)
+
+
+def _ttl():
+    return getattr(settings, 'JOB_EVENT_REPLAY_TTL', 3600)
+
+
+class LocalEventStore:
+    """In-process ring buffers, one deque per group"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self._buffers = {}
+
+    def next_id(self):
+        with self._lock:
+            self._sequence += 1
+            return self._sequence
+
+    def append(self, groups, event):
+        with self._lock:
+            for group in groups:
+                if group not in self._buffers:
+                    self._buffers[group] = deque(maxlen=_size())
+                self._buffers[group].append(event)
+
+    def read(self, groups, after):
+        events = {}
+        truncated = False
+        with self._lock:
+            for group in groups:
+                buffer = self._buffers.get(group) or ()
+                if buffer and len(buffer) == buffer.maxlen and buffer[0]['event_id'] > after + 1:
+                    truncated = True
+                for event in buffer:
+                    if event['event_id'] > after:
+                        events[event['event_id']] = event
+        return [events[event_id] for event_id in sorted(events)], truncated
+
+    def clear(self):
+        with self._lock:
+            self._buffers.clear()
+
+
+class RedisEventStore:
+    """Ring buffers as Redis sorted sets, shared across processes"""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def next_id(self):
+        return self.connection.incr(SEQUENCE_KEY)
+
+    def append(self, groups, event):
+        member = json.dumps(event)
+        pipe = self.connection.pipeline(transaction=False)
+        for group in groups:
+            key = _buffer_key(group)
+            pipe.zadd(key, {member: event['event_id']})
+            pipe.zremrangebyrank(key, 0, -(_size() + 1))
+            pipe.expire(key, _ttl())
+        pipe.execute()
+
+    def read(self, groups, after):
+        pipe = self.connection.pipeline(transaction=False)
+        for group in groups:
+            key = _buffer_key(group)
+            pipe.zrangebyscore(key, f'({after}', '+inf')
+            pipe.zrange(key, 0, 0, withscores=True)
+            pipe.zcard(key)
+        replies = pipe.execute()
+
+        events = {}
+        truncated = False
+        for position in range(0, len(replies), 3):
+            members, oldest, count = replies[position:position + 3]
+            if count >= _size() and oldest and oldest[0][1] > after + 1:
+                truncated = True
+            for member in members:
+                event = json.loads(member)
+                events[event['event_id']] = event
+        return [events[event_id] for event_id in sorted(events)], truncated
+
+    def clear(self):
+        keys = list(self.connection.scan_iter(_buffer_key('*')))
+        if keys:
+            self.connection.delete(*keys)
+
+
+_store = None
+
+
+def get_store():
+    """Redis-backed store when the cache uses django-redis, else the in-process one"""
+    global _store
+    if _store is None:
+        if settings.CACHES['default']['BACKEND'].startswith('django_redis'):
+            from django_redis import get_redis_connection
+            _store = RedisEventStore(get_redis_connection('default'))
+        else:
+            _store = LocalEventStore()
+    return _store
+
+
+def is_replayed(event_type):
+    """Whether events of this type are numbered and kept for replay"""
+    return event_type in REPLAYED_EVENTS and getattr(settings, 'JOB_EVENT_REPLAY_ENABLED', True)
+
+
+def record(event, groups):
+    """Assign the next event ID to an event and keep it for replay in each group"""
+    if not is_replayed(event['type']):
+        return event
+    store = get_store()
+    event['event_id'] = store.next_id()
+    store.append(groups, event)
+    return event
+
+
+def read(groups, after):
+    """
+    Return ``(events, truncated)``: buffered events of the groups with an ID
+    greater than ``after``, oldest first and without duplicates.
+    """
+    return get_store().read(groups, after)
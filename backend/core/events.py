@@ -0,0 +1,190 @@
+"""
+Real-time job event helpers.
+
+Broadcasts job updates to the Channels groups that WebSocket consumers
+in core/consumers.py listen on.
+
+JobEventPublisher builds each event once from the Job instance the caller
+already holds and fans it out to every group interested in that job
+(``job_{id}``, ``user_{id}_jobs``, ``project_{id}_jobs``) concurrently inside a single
+``async_to_sync`` call. Publishers can also batch several events and send
+them in one flush, which is useful for loops that touch many jobs.
+Job state events are numbered and kept for replay in every group (see
+core/event_replay.py). Only the channel-layer send to groups nobody
+listens to is skipped (see core/presence.py).
+"""
+
+import asyncio
+from contextlib import contextmanager
+from datetime import datetime
+from channels.layers import get_channel_layer
+from asgiref.sync import async_to_sync
+from .models import Job
+from . import event_replay, presence
+
+
+channel_layer = get_channel_layer()
+
+
+def job_group(job_id):
+    """Channel group receiving events of one job"""
+    return f'job_{job_id}'
+
+
+def user_group(user_id):
+    """Channel group receiving events of every job a user created"""
+    return f'user_{user_id}_jobs'
+
+
+def project_group(project_id):
+    """Channel group receiving events of every job in a project"""
+    return f'project_{project_id}_jobs'
+
+
+# Event fields forwarded to clients, besides type, job_id, event_id and timestamp
+CLIENT_FIELDS = {
+    'job_update': ('job',),
+    'job_progress': ('progress', 'status'),
+    'job_status_change': ('status', 'previous_status'),
+    'job_log': ('first_line', 'lines'),
+}
+
+
+def client_message(event):
+    """The message sent to clients for a channel-layer job event"""
+    message = {'type': event['type'], 'job_id': event['job_id'], 'event_id': event.get('event_id')}
+    for field in CLIENT_FIELDS.get(event['type'], ()):
+        message[field] = event.get(field)
+    message['timestamp'] = event.get('timestamp')
+    return message
+
+
+class JobEventPublisher:
+    """
+    Publishes job events to Channels groups.
+
+    Usage:
+        publisher.publish(job, 'job_progress', progress=40, status=job.status)
+
+        with publisher.batch():
+            for job in jobs:
+                publisher.publish(job, 'job_status_change', status=job.status)
+        # all events are sent when the block exits
+    """
+
+    def __init__(self, layer=None):
+        self._layer = layer
+        self._pending = None
+
+    @property
+    def layer(self):
+        return self._layer if self._layer is not None else channel_layer
+
+    @staticmethod
+    def serialize_job(job):
+        """
+        Build the job payload embedded in every event.
+
+        Uses the related project/user already loaded on the instance, so
+        callers should fetch jobs with select_related('project', 'created_by').
+        """
+        return {
+            'id': job.id,
+            'type': job.type,
+            'status': job.status,
+            'progress': job.progress,
+            'input_url': job.input_url,
+            'project_id': job.project_id,
+            'project_name': job.project.name,
+            'created_by_id': job.created_by_id,
+            'created_by_username': job.created_by.username,
+            'created_at': job.created_at.isoformat() if job.created_at else None,
+        }
+
+    def get_groups(self, job):
+        """Return the channel groups an event for this job is fanned out to"""
+        return [
+            job_group(job.id),
+            user_group(job.created_by_id),
+            project_group(job.project_id),
+        ]
+
+    def build_event(self, job, update_type='job_update', **kwargs):
+        """Build the channel-layer message for a job event"""
+        return {
+            'type': update_type,
+            'job_id': job.id,
+            'job': self.serialize_job(job),
+            'timestamp': datetime.now().isoformat(),
+            **kwargs
+        }
+
+    def publish(self, job, update_type='job_update', groups=None, **kwargs):
+        """
+        Publish an event for a job to all of its groups, or only to ``groups``.
+
+        Replayed events are buffered for all groups, but only sent to
+        groups with listeners; an event that is neither replayed nor
+        listened to is not even built. Inside a ``batch()`` block the event
+        is queued and sent on exit.
+        """
+        if not self.layer:
+            return
+        groups = groups or self.get_groups(job)
+        listened = presence.watched(groups)
+        if not listened and not event_replay.is_replayed(update_type):
+            return
+        # Buffered even for unwatched groups: a client reconnecting after the
+        # presence grace period still replays it instead of missing it
+        event = event_replay.record(self.build_event(job, update_type, **kwargs), groups)
+        sends = [(group, event) for group in listened]
+        if self._pending is not None:
+            self._pending.extend(sends)
+        else:
+            self._send(sends)
+
+    @contextmanager
+    def batch(self):
+        """Queue events published inside the block and send them together on exit"""
+        if self._pending is not None:
+            # Nested batch: the outermost block flushes
+            yield self
+            return
+        self._pending = []
+        try:
+            yield self
+        finally:
+            sends, self._pending = self._pending, None
+            self._send(sends)
+
+    def _send(self, sends):
+        if sends:
+            async_to_sync(self._group_send_many)(sends)
+
+    async def _group_send_many(self, sends):
+        layer = self.layer
+        await asyncio.gather(*(layer.group_send(group, event) for group, event in sends))
+
+
+publisher = JobEventPublisher()
+
+
+def send_job_update(job, update_type='job_update', **kwargs):
+    """
+    Helper function to send job updates via WebSocket.
+
+    Args:
+        job: Job instance (preferred, avoids a query) or ID of the job
+        update_type: Type of update (job_update, job_progress, job_status_change)
+        **kwargs: Additional data to include in the update
+    """
+    if not publisher.layer:
+        return
+
+    if not isinstance(job, Job):
+        try:
+            job = Job.objects.select_related('project', 'created_by').get(id=job)
+        except Job.DoesNotExist:
+            return
+
+    publisher.publish(job, update_type, **kwargs)
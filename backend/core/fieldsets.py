@@ -0,0 +1,75 @@
+"""
+Sparse fieldsets for API responses.
+
+Clients pick the fields they need with ``?fields=id,status,progress``.
+They can nest related objects that are otherwise rendered as a string
+with ``?expand=project``. Both parameters apply to read requests only and
+take comma-separated field names. Unknown names are ignored.
+
+SparseFieldsSerializerMixin trims the serializer's fields. On list
+endpoints SparseFieldsViewSetMixin additionally narrows the queryset to
+the columns behind those fields with ``.only()``. Joins that no kept
+field needs are dropped as well, so a page of ``?fields=id,status``
+neither loads nor serializes users, projects or JSON metadata.
+"""
+
+from rest_framework.permissions import SAFE_METHODS
+
+
+def query_list(request, name):
+    """Comma-separated query parameter as a set of names (empty when missing)"""
+    if request is None:
+        return set()
+    value = request.query_params.get(name, '')
+    return {item.strip() for item in value.split(',') if item.strip()}
+
+
+class SparseFieldsSerializerMixin:
+    """Honours ?fields= and ?expand= on the top-level serializer of a read request"""
+
+    # Field name -> callable returning the nested serializer used for ?expand=<name>
+    expandable_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method not in SAFE_METHODS:
+            return
+        for name in query_list(request, 'expand') & set(self.expandable_fields):
+            self.fields[name] = self.expandable_fields[name]()
+        requested = query_list(request, 'fields')
+        if requested:
+            for name in set(self.fields) - requested:
+                self.fields.pop(name)
+
+
+class SparseFieldsViewSetMixin:
+    """Loads only the columns behind ?fields= on list requests"""
+
+    # Serializer field -> (columns, select_related paths) it reads; fields
+    # not listed here read the model field of the same name
+    field_columns = {}
+
+    def sparse_queryset(self, queryset):
+        requested = query_list(self.request, 'fields')
+        if not requested or self.action != 'list' or query_list(self.request, 'expand'):
+            return queryset
+        model_fields = {field.name for field in queryset.model._meta.concrete_fields}
+        columns = {queryset.model._meta.pk.name}
+        related = set()
+        # Keyset pagination encodes its cursor from the ordering column
+        ordering = getattr(self.paginator, 'ordering', None)
+        if isinstance(ordering, str):
+            columns.add(ordering.lstrip('-'))
+        for name in requested:
+            if name in self.field_columns:
+                field_columns, field_related = self.field_columns[name]
+                columns.update(field_columns)
+                related.update(field_related)
+            elif name in model_fields:
+                columns.add(name)
+        queryset = queryset.select_related(None)
+        if related:
+            # select_related() without arguments would follow every relation
+            queryset = queryset.select_related(*related)
+        return queryset.only(*columns)
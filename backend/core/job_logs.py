@@ -0,0 +1,223 @@
+"""
+Append-only, streaming job logs.
+
+Processors write log lines through a JobLog instead of collecting them in
+a list. Lines are buffered briefly and each flush is:
+- appended to the job's log on disk as a gzip member
+- broadcast as a ``job_log`` event to the ``job_{id}`` group, so
+  WebSocket clients can tail the log while the job runs
+
+A job's log is a directory of compressed segments under
+settings.JOB_LOG_ROOT. Segments roll over every
+settings.JOB_LOG_SEGMENT_LINES lines. Each segment file is named after
+the line number and uncompressed byte offset it starts at
+(``<first_line>_<first_byte>.log.gz``). A line or byte range read
+therefore only decompresses the segments it overlaps
+(see read_lines()/read_bytes() and GET /api/jobs/{id}/logs/).
+
+JobResult.logs keeps only a summary: the line count, a pointer to the
+logs endpoint and the last few lines (see JobLog.close()).
+"""
+
+import gzip
+import os
+import re
+import shutil
+import time
+from datetime import datetime
+from django.conf import settings
+from .events import publisher, job_group
+
+
+SEGMENT_PATTERN = re.compile(r'^(\d+)_(\d+)\.log\.gz$')
+
+
+def log_dir(job_id):
+    """Directory holding a job's log segments"""
+    return os.path.join(settings.JOB_LOG_ROOT, str(job_id))
+
+
+def _segments(job_id):
+    """Return ``(first_line, first_byte, path)`` for each segment, in order"""
+    directory = log_dir(job_id)
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    segments = []
+    for name in names:
+        match = SEGMENT_PATTERN.match(name)
+        if match:
+            segments.append((int(match.group(1)), int(match.group(2)), os.path.join(directory, name)))
+    return sorted(segments)
+
+
+def _read_segment(path):
+    with gzip.open(path, 'rb') as segment:
+        return segment.read()
+
+
+def _split_lines(data):
+    """Split newline-terminated log bytes into lines"""
+    return data.decode('utf-8', errors='replace').split('\n')[:-1]
+
+
+def log_size(job_id):
+    """Return ``(lines, bytes)`` written to a job's log so far"""
+    segments = _segments(job_id)
+    if not segments:
+        return 0, 0
+    first_line, first_byte, path = segments[-1]
+    data = _read_segment(path)
+    return first_line + data.count(b'\n'), first_byte + len(data)
+
+
+def read_lines(job_id, start=0, end=None):
+    """Return log lines ``[start, end)`` of a job (end=None reads to the end)"""
+    segments = _segments(job_id)
+    lines = []
+    for position, (first_line, _, path) in enumerate(segments):
+        next_first = segments[position + 1][0] if position + 1 < len(segments) else None
+        if next_first is not None and next_first <= start:
+            continue
+        if end is not None and first_line >= end:
+            break
+        segment_lines = _split_lines(_read_segment(path))
+        lo = max(0, start - first_line)
+        hi = None if end is None else max(0, end - first_line)
+        lines.extend(segment_lines[lo:hi])
+    return lines
+
+
+def read_bytes(job_id, start=0, end=None):
+    """Return uncompressed log bytes ``[start, end)`` of a job"""
+    segments = _segments(job_id)
+    chunks = []
+    for position, (_, first_byte, path) in enumerate(segments):
+        next_first = segments[position + 1][1] if position + 1 < len(segments) else None
+        if next_first is not None and next_first <= start:
+            continue
+        if end is not None and first_byte >= end:
+            break
+        data = _read_segment(path)
+        lo = max(0, start - first_byte)
+        hi = None if end is None else max(0, end - first_byte)
+        chunks.append(data[lo:hi])
+    return b''.join(chunks)
+
+
+def delete(job_id):
+    """Remove all log segments of a job"""
+    shutil.rmtree(log_dir(job_id), ignore_errors=True)
+
+
+class JobLog:
+    """
+    Append-only log writer for one job.
+
+    Usage:
+        log = JobLog(job)
+        log.append('Audio file loaded')   # timestamped, flushed in batches
+        ...
+        result['logs'] = log.close()      # flush and return the summary
+
+    A new JobLog for a job that already has log segments (e.g. the fan-in
+    task of a chord) continues after the existing lines.
+    """
+
+    def __init__(self, job, flush_lines=None, flush_interval=None, clock=time.monotonic):
+        self.job = job
+        self.flush_lines = (
+            flush_lines if flush_lines is not None
+            else getattr(settings, 'JOB_LOG_FLUSH_LINES', 50)
+        )
+        self.flush_interval = (
+            flush_interval if flush_interval is not None
+            else getattr(settings, 'JOB_LOG_FLUSH_INTERVAL', 1.0)
+        )
+        self.segment_lines = getattr(settings, 'JOB_LOG_SEGMENT_LINES', 1000)
+        self.summary_lines = getattr(settings, 'JOB_LOG_SUMMARY_LINES', 20)
+        self.clock = clock
+        self._buffer = []
+        self._tail = []
+        self._flushed_at = clock()
+
+        segments = _segments(job.pk)
+        if segments:
+            first_line, first_byte, path = segments[-1]
+            data = _read_segment(path)
+            self._segment_path = path
+            self._segment_line_count = data.count(b'\n')
+            self.line_count = first_line + self._segment_line_count
+            self.byte_count = first_byte + len(data)
+            self._tail = _split_lines(data)[-self.summary_lines:]
+        else:
+            self._segment_path = None
+            self._segment_line_count = 0
+            self.line_count = 0
+            self.byte_count = 0
+
+    def append(self, message, timestamp=True):
+        """
+        Add a log line (multi-line messages become several lines).
+
+        Lines are timestamped unless ``timestamp`` is False, e.g. for lines
+        that already carry one.
+        """
+        prefix = f"[{datetime.now().isoformat()}] " if timestamp else ''
+        for line in str(message).replace('\r\n', '\n').split('\n'):
+            self._buffer.append(prefix + line)
+        if len(self._buffer) >= self.flush_lines or self.clock() - self._flushed_at >= self.flush_interval:
+            self.flush()
+
+    def extend(self, lines, timestamp=False):
+        """Add several lines; by default they are assumed to be timestamped already"""
+        for line in lines:
+            self.append(line, timestamp=timestamp)
+
+    def flush(self):
+        """Persist buffered lines as a gzip member and broadcast them"""
+        self._flushed_at = self.clock()
+        if not self._buffer:
+            return
+        lines, self._buffer = self._buffer, []
+        first_line = self.line_count
+        flushed = lines
+
+        while lines:
+            if self._segment_path is None or self._segment_line_count >= self.segment_lines:
+                os.makedirs(log_dir(self.job.pk), exist_ok=True)
+                self._segment_path = os.path.join(
+                    log_dir(self.job.pk), f'{self.line_count:010d}_{self.byte_count:014d}.log.gz'
+                )
+                self._segment_line_count = 0
+            room = self.segment_lines - self._segment_line_count
+            batch, lines = lines[:room], lines[room:]
+            data = ''.join(line + '\n' for line in batch).encode('utf-8')
+            with open(self._segment_path, 'ab') as segment:
+                segment.write(gzip.compress(data))
+            self._segment_line_count += len(batch)
+            self.line_count += len(batch)
+            self.byte_count += len(data)
+        self._tail = (self._tail + flushed)[-self.summary_lines:]
+
+        publisher.publish(
+            self.job,
+            'job_log',
+            groups=[job_group(self.job.pk)],
+            first_line=first_line,
+            lines=flushed,
+        )
+
+    def summary(self):
+        """Short text stored in JobResult.logs: line count, pointer, last lines"""
+        header = (
+            f"{self.line_count} log lines ({self.byte_count} bytes); "
+            f"full log at /api/jobs/{self.job.pk}/logs/"
+        )
+        return '\n'.join([header] + self._tail)
+
+    def close(self):
+        """Flush remaining lines and return the summary"""
+        self.flush()
+        return self.summary()
@@ -0,0 +1,230 @@
+"""
+Job statistics per project and per user, maintained incrementally.
+
+Dashboards want totals, success rates and average durations. Aggregating
+Job and JobResult rows on every request does not scale, so JobStats keeps
+one row of counters per project and per user:
+- jobs per status
+- summed duration and count of completed jobs with a result, where the
+  duration runs from job creation to JobResult.finished_at
+
+Every job creation, deletion and status change applies its delta with
+``UPDATE ... SET n = n + 1`` in the same transaction as the job write:
+- creation: JobViewSet.perform_create and bulk
+- updates and deletes: JobViewSet.perform_update/perform_destroy and
+  ProjectViewSet.perform_destroy
+- status changes: process_job, ProgressReporter.finish, cancel and
+  update_job_progress
+
+Rows are updated in a fixed order so concurrent transactions cannot
+deadlock.
+
+Changes made behind the API's back drift the counters, e.g. deleting a
+user in the admin, raw SQL, or a crash between two writes.
+reconcile() runs periodically (CELERY_BEAT_SCHEDULE). It compares every
+row with aggregates over the jobs and recomputes drifted rows while
+holding their row lock, so increments racing with the repair are not
+lost. ``python manage.py rebuild_job_stats`` recreates all rows from
+scratch.
+"""
+
+import math
+from collections import Counter, defaultdict
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Sum
+from django.utils import timezone
+from .models import Job, JobResult, JobStats, JobStatus, StatsScope
+
+
+COUNTERS = tuple(JobStatus.values) + ('duration_seconds', 'duration_count')
+
+# Job field holding the ID of each scope
+SCOPE_FIELDS = {StatsScope.PROJECT: 'project_id', StatsScope.USER: 'created_by_id'}
+
+# Tolerated difference between incrementally summed and aggregated durations
+DURATION_TOLERANCE = 0.01
+
+
+def _count(deltas, job, sign, duration=None, status=None):
+    """Add (sign=1) or remove (sign=-1) one job's contribution to both of its scopes"""
+    for scope, field in SCOPE_FIELDS.items():
+        changes = deltas[(scope, getattr(job, field))]
+        changes[status or job.status] += sign
+        if duration is not None:
+            changes['duration_seconds'] += sign * duration
+            changes['duration_count'] += sign
+
+
+def _apply(deltas):
+    now = timezone.now()
+    # A fixed lock order keeps concurrent transactions from deadlocking
+    for (scope, scope_id), changes in sorted(deltas.items()):
+        changes = {field: value for field, value in changes.items() if value}
+        if not changes or scope_id is None:
+            continue
+        updates = {field: F(field) + value for field, value in changes.items()}
+        rows = JobStats.objects.filter(scope=scope, scope_id=scope_id)
+        if rows.update(updated_at=now, **updates):
+            continue
+        try:
+            # First job of this scope: the deltas are the initial values
+            with transaction.atomic():
+                JobStats.objects.create(scope=scope, scope_id=scope_id, updated_at=now, **changes)
+        except IntegrityError:
+            # Created concurrently; the row exists now
+            rows.update(updated_at=now, **updates)
+
+
+def _durations(jobs):
+    """Creation-to-finish seconds of the completed jobs among ``jobs`` that have a result"""
+    completed = {job.pk: job for job in jobs if job.status == JobStatus.COMPLETED}
+    if not completed:
+        return {}
+    finished = JobResult.objects.filter(job_id__in=completed).values_list('job_id', 'finished_at')
+    return {
+        job_id: (finished_at - completed[job_id].created_at).total_seconds()
+        for job_id, finished_at in finished
+    }
+
+
+def record_created(jobs):
+    """Count newly created jobs; call in the transaction that inserts them"""
+    deltas = defaultdict(Counter)
+    durations = _durations(jobs)
+    for job in jobs:
+        _count(deltas, job, 1, durations.get(job.pk))
+    _apply(deltas)
+
+
+def record_deleted(jobs):
+    """Uncount jobs about to be deleted; call in the deleting transaction, before the delete"""
+    deltas = defaultdict(Counter)
+    durations = _durations(jobs)
+    for job in jobs:
+        _count(deltas, job, -1, durations.get(job.pk))
+    _apply(deltas)
+
+
+def record_status_change(job, previous_status):
+    """Move a job from previous_status to job.status; call in the transaction that updates it"""
+    if previous_status == job.status:
+        return
+    deltas = defaultdict(Counter)
+    _count(deltas, job, -1, status=previous_status)
+    _count(deltas, job, 1, _durations([job]).get(job.pk))
+    _apply(deltas)
+
+
+def record_update(before, job):
+    """Account for an edited job (status, project or creator); ``before`` is a copy from before the save"""
+    if (before.status, before.project_id, before.created_by_id) == (job.status, job.project_id, job.created_by_id):
+        return
+    deltas = defaultdict(Counter)
+    durations = _durations([job])
+    _count(deltas, before, -1, durations.get(job.pk) if before.status == JobStatus.COMPLETED else None)
+    _count(deltas, job, 1, durations.get(job.pk))
+    _apply(deltas)
+
+
+def record_project_deleted(project):
+    """Uncount a project's jobs from their creators and drop its row; call before deleting it"""
+    deltas = defaultdict(Counter)
+    for user_id, values in _aggregate(Job.objects.filter(project=project), 'created_by_id').items():
+        deltas[(StatsScope.USER, user_id)].update({field: -value for field, value in values.items()})
+    _apply(deltas)
+    JobStats.objects.filter(scope=StatsScope.PROJECT, scope_id=project.pk).delete()
+
+
+def _aggregate(jobs, field):
+    """Exact counters per value of ``field`` (project_id or created_by_id) over ``jobs``"""
+    result = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    for scope_id, status, total in jobs.order_by().values_list(field, 'status').annotate(total=Count('id')):
+        result[scope_id][status] = total
+    durations = (
+        jobs.filter(status=JobStatus.COMPLETED, result__isnull=False)
+        .order_by()
+        .values_list(field)
+        .annotate(
+            seconds=Sum(ExpressionWrapper(F('result__finished_at') - F('created_at'), output_field=DurationField())),
+            total=Count('id'),
+        )
+    )
+    for scope_id, seconds, total in durations:
+        result[scope_id]['duration_seconds'] = seconds.total_seconds() if seconds else 0.0
+        result[scope_id]['duration_count'] = total
+    return result
+
+
+def _expected():
+    return {
+        (scope, scope_id): values
+        for scope, field in SCOPE_FIELDS.items()
+        for scope_id, values in _aggregate(Job.objects.all(), field).items()
+    }
+
+
+def _drifted(current, expected):
+    for field in COUNTERS:
+        if field == 'duration_seconds':
+            if not math.isclose(current[field], expected[field], abs_tol=DURATION_TOLERANCE):
+                return True
+        elif current[field] != expected[field]:
+            return True
+    return False
+
+
+def reconcile():
+    """
+    Repair counters that drifted from the jobs; returns the number of rows fixed.
+
+    Drift is detected from a few grouped queries. Each drifted row is then
+    locked and recomputed from its own jobs, so increments committed
+    meanwhile are included and increments still in flight apply on top.
+    """
+    expected = _expected()
+    current = {
+        (row['scope'], row['scope_id']): row
+        for row in JobStats.objects.values('scope', 'scope_id', *COUNTERS)
+    }
+    zero = dict.fromkeys(COUNTERS, 0)
+    repaired = 0
+    for key in sorted(set(expected) | set(current)):
+        if key[1] is None or not _drifted(current.get(key, zero), expected.get(key, zero)):
+            continue
+        scope, scope_id = key
+        field = SCOPE_FIELDS[scope]
+        with transaction.atomic():
+            JobStats.objects.get_or_create(scope=scope, scope_id=scope_id)
+            JobStats.objects.select_for_update().filter(scope=scope, scope_id=scope_id).get()
+            values = _aggregate(Job.objects.filter(**{field: scope_id}), field).get(scope_id, zero)
+            JobStats.objects.filter(scope=scope, scope_id=scope_id).update(updated_at=timezone.now(), **values)
+        repaired += 1
+    return repaired
+
+
+def rebuild():
+    """Recreate every row from the jobs; returns the number of rows written"""
+    now = timezone.now()
+    with transaction.atomic():
+        JobStats.objects.all().delete()
+        rows = JobStats.objects.bulk_create(
+            JobStats(scope=scope, scope_id=scope_id, updated_at=now, **values)
+            for (scope, scope_id), values in _expected().items()
+            if scope_id is not None
+        )
+    return len(rows)
+
+
+def summary(scope, scope_id):
+    """Dashboard numbers for one project or user, read from its counters row"""
+    row = JobStats.objects.filter(scope=scope, scope_id=scope_id).first()
+    counts = {status: getattr(row, status, 0) for status in JobStatus.values}
+    finished = counts[JobStatus.COMPLETED] + counts[JobStatus.FAILED]
+    return {
+        'total': sum(counts.values()),
+        **counts,
+        # Share of finished jobs that completed; cancelled jobs are not failures
+        'success_rate': counts[JobStatus.COMPLETED] / finished if finished else None,
+        'average_duration_seconds': row.duration_seconds / row.duration_count if row and row.duration_count else None,
+        'updated_at': row.updated_at if row else None,
+    }
@@ -0,0 +1,131 @@
+"""
+Management command to compare channel layer backends for job event fan-out.
+
+Benchmarks UnixSocketChannelLayer (core/channel_layers.py) against the
+Redis layer the way the platform uses them. A receiving layer instance
+stands in for an ASGI process and joins ``--members`` channels to each of
+``--groups`` groups. A second instance stands in for a Celery worker and
+publishes ``--messages`` messages per group from a thread through
+async_to_sync(group_send), exactly like JobEventPublisher. Reported per
+backend:
+- publish latency of one group_send as seen by the worker
+- end-to-end latency from group_send to receive()
+- deliveries per second
+
+The Redis layer uses settings.REDIS_HOST/REDIS_PORT and is skipped when
+Redis cannot be reached.
+
+Usage:
+    python manage.py channel_layer_benchmark --groups 10 --members 20 --messages 500
+"""
+
+import asyncio
+import atexit
+import shutil
+import statistics
+import tempfile
+import time
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from core.channel_layers import UnixSocketChannelLayer
+
+
+class Command(BaseCommand):
+    help = 'Compare group_send latency of the Unix socket and Redis channel layers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--groups', type=int, default=10, help='Groups to publish to')
+        parser.add_argument('--members', type=int, default=20, help='Channels joined to every group')
+        parser.add_argument('--messages', type=int, default=500, help='Messages published to every group')
+        parser.add_argument(
+            '--backends', default='unix,redis', help='Comma-separated backends to run (unix, redis)'
+        )
+
+    def handle(self, *args, **options):
+        factories = {'unix': self.unix_layer, 'redis': self.redis_layer}
+        for name in options['backends'].split(','):
+            if name not in factories:
+                raise CommandError(f'Unknown backend: {name}')
+            factory = factories[name]()
+            if factory is None:
+                self.stdout.write(f'{name:>6}: skipped, Redis is not reachable')
+                continue
+            self.report(name, *async_to_sync(self.run)(factory, options))
+
+    def unix_layer(self):
+        path = tempfile.mkdtemp(prefix='channels-bench-')
+        atexit.register(shutil.rmtree, path, True)
+        return lambda capacity: UnixSocketChannelLayer(path=path, capacity=capacity)
+
+    def redis_layer(self):
+        import redis
+        from channels_redis.core import RedisChannelLayer
+        host, port = settings.REDIS_HOST, int(settings.REDIS_PORT)
+        try:
+            redis.Redis(host=host, port=port, password=settings.REDIS_PASSWORD or None, socket_timeout=1).ping()
+        except redis.RedisError:
+            return None
+        hosts = settings.CHANNEL_LAYERS['default'].get('CONFIG', {}).get('hosts') or [(host, port)]
+        return lambda capacity: RedisChannelLayer(hosts=hosts, capacity=capacity)
+
+    async def run(self, factory, options):
+        groups = [f'channel_benchmark_{index}' for index in range(options['groups'])]
+        messages = options['messages']
+        # Large enough that nothing is dropped; the benchmark measures transport cost
+        receiver = factory(messages * len(groups))
+        publisher = factory(messages * len(groups))
+
+        memberships = []
+        for group in groups:
+            for _ in range(options['members']):
+                channel = await receiver.new_channel()
+                await receiver.group_add(group, channel)
+                memberships.append((group, channel))
+
+        latencies = []
+
+        async def read(channel):
+            for _ in range(messages):
+                message = await receiver.receive(channel)
+                latencies.append(time.perf_counter() - message['sent'])
+
+        def publish():
+            send = async_to_sync(publisher.group_send)
+            timings = []
+            for sequence in range(messages):
+                for group in groups:
+                    started = time.perf_counter()
+                    send(group, {'type': 'job_progress', 'progress': sequence, 'sent': started})
+                    timings.append(time.perf_counter() - started)
+            return timings
+
+        readers = [asyncio.ensure_future(read(channel)) for _, channel in memberships]
+        started = time.perf_counter()
+        publish_timings = await sync_to_async(publish, thread_sensitive=False)()
+        await asyncio.wait_for(asyncio.gather(*readers), timeout=120)
+        wall = time.perf_counter() - started
+
+        for group, channel in memberships:
+            await receiver.group_discard(group, channel)
+        if hasattr(receiver, 'close'):
+            await receiver.close()
+        return publish_timings, latencies, wall
+
+    def report(self, name, publish_timings, latencies, wall):
+        def summary(values):
+            ordered = sorted(values)
+
+            def percentile(fraction):
+                return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000
+
+            return (
+                f'p50={percentile(0.5):.3f} p95={percentile(0.95):.3f} '
+                f'p99={percentile(0.99):.3f} mean={statistics.mean(ordered) * 1000:.3f}'
+            )
+
+        self.stdout.write(
+            f'{name:>6}: {len(latencies)} deliveries in {wall:.3f}s ({len(latencies) / wall:.0f}/s)\n'
+            f'        group_send ms {summary(publish_timings)}\n'
+            f'        end-to-end ms {summary(latencies)}'
+        )
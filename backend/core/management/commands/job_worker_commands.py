@@ -0,0 +1,27 @@
+"""
+Management command to print Celery worker commands for each job queue.
+
+Each job type is routed to its own queue (see core/processors.py). This
+command prints one worker command per queue, sized with the concurrency
+and prefetch registered for it, so separate pools can be started per workload.
+
+Usage:
+    python manage.py job_worker_commands
+"""
+
+from django.core.management.base import BaseCommand
+from core import tasks  # noqa: F401  (registers processors)
+from core.processors import registered_processors
+
+
+class Command(BaseCommand):
+    help = 'Print Celery worker commands for each job-type queue'
+
+    def handle(self, *args, **options):
+        seen = set()
+        for spec in registered_processors():
+            if spec.queue in seen:
+                continue
+            seen.add(spec.queue)
+            self.stdout.write(f'# {spec.job_type or "default"}')
+            self.stdout.write(spec.worker_command())
@@ -0,0 +1,28 @@
+"""
+Management command to rebuild the job statistics counters from scratch.
+
+Recomputes every project and user row of JobStats from the Job and
+JobResult tables (see core/job_stats.py), e.g. after deploying the
+counters onto existing data. Jobs changing while the rebuild runs can
+leave small drift, which the periodic reconcile_job_stats task repairs; pass
+--reconcile to run one right away.
+
+Usage:
+    python manage.py rebuild_job_stats [--reconcile]
+"""
+
+from django.core.management.base import BaseCommand
+from core import job_stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-project and per-user job statistics counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reconcile', action='store_true', help='Repair drift once the rebuild is done')
+
+    def handle(self, *args, **options):
+        written = job_stats.rebuild()
+        self.stdout.write(f'Rebuilt {written} job statistics rows')
+        if options['reconcile']:
+            self.stdout.write(f'Repaired {job_stats.reconcile()} drifted rows')
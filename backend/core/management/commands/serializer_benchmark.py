@@ -0,0 +1,91 @@
+"""
+Management command to measure job list serialization with sparse fieldsets.
+
+Builds ``--rows`` job rows through JobViewSet exactly as a list request
+would: permission filter, ordering, the queryset narrowed by ?fields=
+(core/fieldsets.py), then JobSerializer. Each variant is compared with
+the full default representation. Reported per variant, as medians over
+``--repeat`` runs:
+- query time (fetching the rows)
+- serialization CPU time
+- rendered JSON size
+
+Benchmark jobs belong to the user ``serializer-bench``, which is created
+with ``--rows`` jobs if missing; pass --cleanup to delete it afterwards.
+
+Usage:
+    python manage.py serializer_benchmark --rows 500 --repeat 20
+"""
+
+import statistics
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from core.models import Job, JobResult, JobType, Project
+from core.views import JobViewSet
+
+
+VARIANTS = [
+    ('full', {}),
+    ('fields=id,status,progress', {'fields': 'id,status,progress'}),
+    ('fields=id,type,status,progress,project,has_result',
+     {'fields': 'id,type,status,progress,project,has_result'}),
+]
+
+
+class Command(BaseCommand):
+    help = 'Compare job list serialization cost of full and sparse fieldsets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500, help='Job rows per list')
+        parser.add_argument('--repeat', type=int, default=20, help='Runs per variant')
+        parser.add_argument('--cleanup', action='store_true', help='Delete the benchmark user afterwards')
+
+    def handle(self, *args, **options):
+        user = self.benchmark_user(options['rows'])
+        baseline = None
+        for label, params in VARIANTS:
+            fetch, serialize, size = self.measure(user, params, options['rows'], options['repeat'])
+            if baseline is None:
+                baseline = serialize
+            self.stdout.write(
+                f'{label:>52}: query {fetch * 1000:7.2f} ms, serialize {serialize * 1000:7.2f} ms CPU '
+                f'({(serialize - baseline) / baseline * 100:+.0f}%), {size / 1024:7.1f} KiB JSON'
+            )
+        if options['cleanup']:
+            Project.objects.filter(owner=user).delete()
+            user.delete()
+
+    def benchmark_user(self, rows):
+        user, _ = User.objects.get_or_create(username='serializer-bench')
+        project, _ = Project.objects.get_or_create(name='Serializer benchmark', owner=user)
+        missing = rows - Job.objects.filter(project=project).count()
+        if missing > 0:
+            jobs = Job.objects.bulk_create(
+                Job(project=project, type=JobType.TTS, created_by=user, progress=100,
+                    input_url='https://example.com/input.txt', meta={'voice': 'en-US', 'speed': 1.0})
+                for _ in range(missing)
+            )
+            JobResult.objects.bulk_create(
+                JobResult(job=job, result_url='https://example.com/output.mp3', logs='done') for job in jobs[::2]
+            )
+        return user
+
+    def measure(self, user, params, rows, repeat):
+        factory = APIRequestFactory()
+        fetches, serializations, size = [], [], 0
+        for _ in range(repeat):
+            request = Request(factory.get('/api/jobs/', params))
+            request.user = user
+            view = JobViewSet(action='list', request=request, format_kwarg=None, kwargs={})
+            started = time.perf_counter()
+            jobs = list(view.filter_queryset(view.get_queryset())[:rows])
+            fetches.append(time.perf_counter() - started)
+            started = time.process_time()
+            data = view.get_serializer(jobs, many=True).data
+            serializations.append(time.process_time() - started)
+            size = len(JSONRenderer().render(data))
+        return statistics.median(fetches), statistics.median(serializations), size
@@ -0,0 +1,93 @@
+"""
+Management command to load-test the Server-Sent Events job streams in one process.
+
+Opens ``--streams`` SSE event streams (core/sse.py) spread over ``--users``
+user groups on the configured channel layer. Publishes ``--events`` job
+progress events to every group and reports:
+- memory held per open stream
+- delivery latency percentiles
+- events delivered per second
+
+Usage:
+    python manage.py sse_benchmark --streams 5000 --users 100 --events 20
+"""
+
+import asyncio
+import statistics
+import time
+import tracemalloc
+from datetime import datetime
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.management.base import BaseCommand, CommandError
+from core.sse import event_stream
+
+
+class Command(BaseCommand):
+    help = 'Load-test concurrent Server-Sent Events job streams in one process'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--streams', type=int, default=2000, help='Concurrent streams to open')
+        parser.add_argument('--users', type=int, default=50, help='User groups the streams are spread over')
+        parser.add_argument('--events', type=int, default=20, help='Events published to every group')
+
+    def handle(self, *args, **options):
+        if get_channel_layer() is None:
+            raise CommandError('No channel layer configured')
+        result = async_to_sync(self.run)(options['streams'], options['users'], options['events'])
+        self.report(options['streams'], *result)
+
+    async def run(self, streams, users, events):
+        layer = get_channel_layer()
+        groups = [f'sse_benchmark_{index}' for index in range(users)]
+
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        opened = [event_stream([groups[index % users]], keepalive=3600) for index in range(streams)]
+        # The first message is sent once the stream has joined its group
+        await asyncio.gather(*(stream.__anext__() for stream in opened))
+        per_stream = (tracemalloc.get_traced_memory()[0] - baseline) / streams
+        tracemalloc.stop()
+
+        published = {}
+        latencies = []
+
+        async def consume(stream):
+            for _ in range(events):
+                message = await stream.__anext__()
+                event_id = int(message.split('\n', 1)[0][len('id: '):])
+                latencies.append(time.perf_counter() - published[event_id])
+            await stream.aclose()
+
+        consumers = [asyncio.ensure_future(consume(stream)) for stream in opened]
+        started = time.perf_counter()
+        event_id = 0
+        for sequence in range(events):
+            for group in groups:
+                event_id += 1
+                published[event_id] = time.perf_counter()
+                await layer.group_send(group, {
+                    'type': 'job_progress',
+                    'job_id': sequence,
+                    'event_id': event_id,
+                    'progress': sequence,
+                    'status': 'running',
+                    'timestamp': datetime.now().isoformat(),
+                })
+            await asyncio.sleep(0)
+        await asyncio.gather(*consumers)
+        return per_stream, latencies, time.perf_counter() - started
+
+    def report(self, streams, per_stream, latencies, wall):
+        ordered = sorted(latencies)
+
+        def percentile(fraction):
+            return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000
+
+        self.stdout.write(
+            f'{streams} streams, {per_stream / 1024:.1f} KiB per open stream; '
+            f'{len(latencies)} events delivered in {wall:.3f}s ({len(latencies) / wall:.0f}/s), '
+            f'latency ms p50={percentile(0.5):.2f} p95={percentile(0.95):.2f} '
+            f'p99={percentile(0.99):.2f} max={ordered[-1] * 1000:.2f} '
+            f'mean={statistics.mean(latencies) * 1000:.2f}'
+        )
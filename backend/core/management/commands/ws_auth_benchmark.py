@@ -0,0 +1,124 @@
+"""
+Management command to benchmark WebSocket connect authentication under a reconnect storm.
+
+Simulates ``--connections`` WebSocket connects spread over ``--users``
+users, all arriving at once (as after a deploy), and runs them through
+JWTAuthMiddleware. Reports connect latency percentiles and how many user
+lookups hit the database. For comparison, the ``uncached`` mode repeats the
+previous per-consumer authentication: two token decodes and one
+User query per connect.
+
+Benchmark users (``ws-bench-<n>``) are created if missing; pass
+--cleanup to delete them afterwards.
+
+Usage:
+    python manage.py ws_auth_benchmark --connections 5000 --users 200
+"""
+
+import asyncio
+import statistics
+import time
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from jwt import decode as jwt_decode
+from rest_framework_simplejwt.tokens import AccessToken, UntypedToken
+from core.middleware import JWTAuthMiddleware, UserCache
+
+
+class Command(BaseCommand):
+    help = 'Benchmark WebSocket JWT authentication under a simulated reconnect storm'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=2000, help='Concurrent connects to simulate')
+        parser.add_argument('--users', type=int, default=100, help='Distinct users the connects belong to')
+        parser.add_argument(
+            '--mode', choices=['cached', 'uncached', 'both'], default='both',
+            help='Middleware with user cache, previous per-connect lookups, or both'
+        )
+        parser.add_argument('--cleanup', action='store_true', help='Delete benchmark users afterwards')
+
+    def handle(self, *args, **options):
+        users = self.benchmark_users(options['users'])
+        tokens = [str(AccessToken.for_user(users[index % len(users)])) for index in range(options['connections'])]
+        scopes = [
+            {'type': 'websocket', 'query_string': f'token={token}'.encode(), 'headers': []}
+            for token in tokens
+        ]
+
+        modes = ['cached', 'uncached'] if options['mode'] == 'both' else [options['mode']]
+        for mode in modes:
+            latencies, wall, lookups = async_to_sync(self.run_storm)(scopes, mode)
+            self.report(mode, latencies, wall, lookups)
+
+        if options['cleanup']:
+            User.objects.filter(username__startswith='ws-bench-').delete()
+
+    def benchmark_users(self, count):
+        existing = {user.username: user for user in User.objects.filter(username__startswith='ws-bench-')}
+        users = []
+        for index in range(count):
+            username = f'ws-bench-{index}'
+            user = existing.get(username)
+            if user is None:
+                user = User.objects.create_user(username=username, password=None)
+            users.append(user)
+        return users
+
+    async def run_storm(self, scopes, mode):
+        authenticated = []
+
+        async def inner(scope, receive, send):
+            authenticated.append(scope['user'].is_authenticated)
+
+        if mode == 'cached':
+            cache = UserCache()
+            app = JWTAuthMiddleware(inner, cache=cache)
+        else:
+            cache = None
+            app = self.uncached_app(inner)
+
+        latencies = []
+
+        async def connect(scope):
+            started = time.perf_counter()
+            await app(scope, None, None)
+            latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(connect(scope) for scope in scopes))
+        wall = time.perf_counter() - started
+
+        if not all(authenticated):
+            raise RuntimeError('Some benchmark connections were not authenticated')
+        lookups = cache.loads if cache else len(scopes)
+        return latencies, wall, lookups
+
+    def uncached_app(self, inner):
+        """Authentication as previously done in each consumer's connect()"""
+        get_user = database_sync_to_async(User.objects.get)
+
+        async def app(scope, receive, send):
+            token = scope['query_string'].decode().split('token=')[1]
+            UntypedToken(token)
+            decoded = jwt_decode(token, settings.SECRET_KEY, algorithms=['HS256'])
+            scope = dict(scope, user=await get_user(id=decoded['user_id']))
+            return await inner(scope, receive, send)
+
+        return app
+
+    def report(self, mode, latencies, wall, lookups):
+        ordered = sorted(latencies)
+
+        def percentile(fraction):
+            return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000
+
+        self.stdout.write(
+            f'{mode:>9}: {len(latencies)} connects in {wall:.3f}s '
+            f'({len(latencies) / wall:.0f}/s), user DB lookups: {lookups}, '
+            f'latency ms p50={percentile(0.5):.2f} p95={percentile(0.95):.2f} '
+            f'p99={percentile(0.99):.2f} max={ordered[-1] * 1000:.2f} '
+            f'mean={statistics.mean(latencies) * 1000:.2f}'
+        )
@@ -0,0 +1,206 @@
+"""
+Management command to load-test WebSocket job event fan-out in-process.
+
+Drives the real ``ai_platform.asgi.application`` (origin validation, JWT
+middleware, routing, consumers) with ``--clients`` simulated,
+authenticated WebSocket clients spread over ``--users`` users. Every
+user owns one job. Half of each user's clients watch /ws/jobs/ and half
+watch /ws/jobs/<job_id>/. The command then pushes ``--events`` progress
+updates per job through send_job_update(), followed by a final status
+change, and reports:
+- connect rate
+- memory per open connection (tracemalloc during the connect phase)
+- end-to-end latency percentiles from send_job_update() to the client
+- CPU time per delivered message (publisher, layer and consumers together)
+
+The configured channel layer is used unless ``--layer inmemory`` is given
+(a local Redis works as the Redis stand-in). Each run is appended as one
+JSON line to ``--output``. The previous run with the same parameters is
+printed next to it, so regressions show up run over run.
+
+Benchmark users (``ws-load-<n>``) are created if missing; pass --cleanup
+to delete them and their projects afterwards.
+
+Usage:
+    python manage.py ws_load_test --clients 10000 --users 500 --events 20
+"""
+
+import asyncio
+import json
+import os
+import statistics
+import time
+import tracemalloc
+from datetime import datetime
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import InMemoryChannelLayer, channel_layers
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from rest_framework_simplejwt.tokens import AccessToken
+from core import events
+from core.events import send_job_update
+from core.models import Job, JobStatus, JobType, Project
+
+
+class Command(BaseCommand):
+    help = 'Load-test WebSocket job event fan-out through the ASGI application'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=2000, help='WebSocket clients to connect')
+        parser.add_argument('--users', type=int, default=200, help='Users (and jobs) the clients belong to')
+        parser.add_argument('--events', type=int, default=20, help='Progress updates per job')
+        parser.add_argument(
+            '--layer', choices=['configured', 'inmemory'], default='configured',
+            help='Use the configured channel layer or a fresh InMemoryChannelLayer'
+        )
+        parser.add_argument('--timeout', type=float, default=60, help='Seconds to wait for deliveries')
+        parser.add_argument(
+            '--output', default=os.path.join(settings.BASE_DIR, 'benchmarks', 'ws_load_test.jsonl'),
+            help='JSON lines file the results are appended to'
+        )
+        parser.add_argument('--cleanup', action='store_true', help='Delete benchmark users afterwards')
+
+    def handle(self, *args, **options):
+        if options['layer'] == 'inmemory':
+            layer = InMemoryChannelLayer(capacity=max(100, options['events'] * 2))
+            channel_layers.backends['default'] = layer
+            events.channel_layer = layer
+
+        jobs = self.benchmark_jobs(options['users'])
+        tokens = {job.created_by_id: str(AccessToken.for_user(job.created_by)) for job in jobs}
+
+        from ai_platform.asgi import application
+        metrics = async_to_sync(self.run)(application, jobs, tokens, options)
+
+        result = {
+            'timestamp': datetime.now().isoformat(),
+            'params': {key: options[key] for key in ('clients', 'users', 'events', 'layer')},
+            'metrics': metrics,
+        }
+        self.report(result, self.previous_run(options['output'], result['params']))
+        os.makedirs(os.path.dirname(options['output']), exist_ok=True)
+        with open(options['output'], 'a') as output:
+            output.write(json.dumps(result) + '\n')
+
+        if options['cleanup']:
+            Project.objects.filter(owner__username__startswith='ws-load-').delete()
+            User.objects.filter(username__startswith='ws-load-').delete()
+
+    def benchmark_jobs(self, count):
+        jobs = []
+        for index in range(count):
+            user, _ = User.objects.get_or_create(username=f'ws-load-{index}')
+            project, _ = Project.objects.get_or_create(name='WebSocket load test', owner=user)
+            job = Job.objects.filter(project=project).first() or Job.objects.create(
+                project=project, type=JobType.TTS, created_by=user
+            )
+            jobs.append(Job.objects.select_related('project', 'created_by').get(pk=job.pk))
+        return jobs
+
+    async def run(self, application, jobs, tokens, options):
+        host = (settings.ALLOWED_HOSTS or ['localhost'])[0]
+        headers = [(b'origin', f'http://{host}'.encode()), (b'host', host.encode())]
+        clients = []
+        for index in range(options['clients']):
+            job = jobs[index % len(jobs)]
+            path = '/ws/jobs/' if (index // len(jobs)) % 2 == 0 else f'/ws/jobs/{job.id}/'
+            communicator = WebsocketCommunicator(
+                application, f'{path}?token={tokens[job.created_by_id]}', headers=headers
+            )
+            clients.append(communicator)
+
+        # Connect phase
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        results = await asyncio.gather(*(communicator.connect(timeout=options['timeout']) for communicator in clients))
+        connect_wall = time.perf_counter() - started
+        await asyncio.gather(*(communicator.receive_output(timeout=options['timeout']) for communicator in clients))
+        per_connection = (tracemalloc.get_traced_memory()[0] - baseline) / len(clients)
+        tracemalloc.stop()
+        if not all(connected for connected, _ in results):
+            raise RuntimeError('Some benchmark clients could not connect')
+
+        # Traffic phase
+        sent_at = {}
+        latencies = []
+        delivered = [0]
+
+        async def read(communicator):
+            while True:
+                message = json.loads((await communicator.receive_output(timeout=options['timeout']))['text'])
+                frames = message['events'] if message['type'] == 'batch' else [message]
+                for frame in frames:
+                    delivered[0] += 1
+                    if frame['type'] == 'job_progress':
+                        latencies.append(time.perf_counter() - sent_at[(frame['job_id'], frame['progress'])])
+                    elif frame['type'] == 'job_status_change':
+                        return
+
+        readers = [asyncio.ensure_future(read(communicator)) for communicator in clients]
+        publish = sync_to_async(send_job_update, thread_sensitive=False)
+        cpu_started = time.process_time()
+        started = time.perf_counter()
+        for step in range(1, options['events'] + 1):
+            for job in jobs:
+                sent_at[(job.id, step)] = time.perf_counter()
+                await publish(job, 'job_progress', progress=step, status=JobStatus.RUNNING)
+        for job in jobs:
+            await publish(job, 'job_status_change', status=JobStatus.COMPLETED, previous_status=JobStatus.RUNNING)
+        await asyncio.gather(*readers)
+        traffic_wall = time.perf_counter() - started
+        cpu = time.process_time() - cpu_started
+
+        await asyncio.gather(*(communicator.disconnect() for communicator in clients))
+
+        ordered = sorted(latencies) or [0.0]
+
+        def percentile(fraction):
+            return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000, 3)
+
+        return {
+            'connect_seconds': round(connect_wall, 3),
+            'connects_per_second': round(len(clients) / connect_wall, 1),
+            'memory_per_connection_kib': round(per_connection / 1024, 2),
+            'delivered': delivered[0],
+            'deliveries_per_second': round(delivered[0] / traffic_wall, 1),
+            'latency_ms': {
+                'p50': percentile(0.5),
+                'p95': percentile(0.95),
+                'p99': percentile(0.99),
+                'max': round(ordered[-1] * 1000, 3),
+                'mean': round(statistics.mean(ordered) * 1000, 3),
+            },
+            'cpu_us_per_delivery': round(cpu / max(delivered[0], 1) * 1e6, 2),
+        }
+
+    def previous_run(self, path, params):
+        try:
+            with open(path) as output:
+                runs = [json.loads(line) for line in output if line.strip()]
+        except FileNotFoundError:
+            return None
+        matching = [run for run in runs if run['params'] == params]
+        return matching[-1] if matching else None
+
+    def report(self, result, previous):
+        metrics = result['metrics']
+        rows = [
+            ('connects/s', metrics['connects_per_second'], lambda run: run['connects_per_second']),
+            ('KiB/connection', metrics['memory_per_connection_kib'], lambda run: run['memory_per_connection_kib']),
+            ('deliveries/s', metrics['deliveries_per_second'], lambda run: run['deliveries_per_second']),
+            ('latency p50 ms', metrics['latency_ms']['p50'], lambda run: run['latency_ms']['p50']),
+            ('latency p95 ms', metrics['latency_ms']['p95'], lambda run: run['latency_ms']['p95']),
+            ('latency p99 ms', metrics['latency_ms']['p99'], lambda run: run['latency_ms']['p99']),
+            ('CPU us/delivery', metrics['cpu_us_per_delivery'], lambda run: run['cpu_us_per_delivery']),
+        ]
+        self.stdout.write(f"{result['params']}, {metrics['delivered']} messages delivered")
+        for label, value, previous_value in rows:
+            line = f'{label:>16}: {value:>10}'
+            if previous:
+                before = previous_value(previous['metrics'])
+                change = (value - before) / before * 100 if before else 0.0
+                line += f'   previous {before:>10} ({change:+.1f}%)'
+            self.stdout.write(line)
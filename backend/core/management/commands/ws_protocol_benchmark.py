@@ -0,0 +1,93 @@
+"""
+Management command to compare the JSON and compact MessagePack WebSocket encodings.
+
+Builds a realistic mix of job events (mostly job_progress, plus status
+changes, full job_update payloads and log lines) and encodes every event
+once per subscriber, as each consumer does for its own socket. Reports
+bytes on the wire and encode CPU time for both encodings. No database or
+channel layer is needed.
+
+Usage:
+    python manage.py ws_protocol_benchmark --events 2000 --fanout 500
+"""
+
+import random
+import time
+from datetime import datetime
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from core.events import JobEventPublisher, client_message
+from core.models import Job, JobStatus, JobType, Project
+from core.ws_protocol import JSON_SUBPROTOCOL, MSGPACK_SUBPROTOCOL, encode
+
+
+class Command(BaseCommand):
+    help = 'Compare bytes on the wire and encode CPU of the JSON and MessagePack WebSocket encodings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=1000, help='Distinct events to publish')
+        parser.add_argument('--fanout', type=int, default=200, help='Subscribers each event is encoded for')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed for the event mix')
+
+    def handle(self, *args, **options):
+        events = self.sample_events(options['events'], random.Random(options['seed']))
+        fanout = options['fanout']
+
+        results = {}
+        for subprotocol in (JSON_SUBPROTOCOL, MSGPACK_SUBPROTOCOL):
+            total_bytes = 0
+            started = time.process_time()
+            for event in events:
+                for _ in range(fanout):
+                    text_data, bytes_data = encode(event, subprotocol)
+                    total_bytes += len(text_data.encode()) if text_data is not None else len(bytes_data)
+            results[subprotocol] = (total_bytes, time.process_time() - started)
+
+        frames = len(events) * fanout
+        for subprotocol, (total_bytes, cpu) in results.items():
+            self.stdout.write(
+                f'{subprotocol:>24}: {frames} frames, {total_bytes / 1e6:.2f} MB '
+                f'({total_bytes / frames:.0f} B/frame), encode CPU {cpu:.3f}s '
+                f'({cpu / frames * 1e6:.2f} us/frame)'
+            )
+        json_bytes, json_cpu = results[JSON_SUBPROTOCOL]
+        msgpack_bytes, msgpack_cpu = results[MSGPACK_SUBPROTOCOL]
+        self.stdout.write(
+            f'msgpack vs json: {msgpack_bytes / json_bytes:.0%} of the bytes, '
+            f'{msgpack_cpu / json_cpu:.0%} of the encode CPU'
+        )
+
+    def sample_events(self, count, rng):
+        user = User(id=7, username='benchmark-user')
+        project = Project(id=3, name='Benchmark project', owner=user)
+        publisher = JobEventPublisher()
+        events = []
+        for index in range(count):
+            job = Job(
+                id=1000 + index % 50,
+                project=project,
+                created_by=user,
+                type=rng.choice(JobType.values),
+                status=JobStatus.RUNNING,
+                progress=rng.randint(0, 100),
+                input_url='https://example.com/media/input.wav',
+                created_at=timezone.now(),
+            )
+            roll = rng.random()
+            if roll < 0.7:
+                event = publisher.build_event(job, 'job_progress', progress=job.progress, status=job.status)
+            elif roll < 0.8:
+                event = publisher.build_event(
+                    job, 'job_status_change', status=JobStatus.COMPLETED, previous_status=JobStatus.RUNNING
+                )
+            elif roll < 0.9:
+                event = publisher.build_event(job, 'job_update')
+            else:
+                event = publisher.build_event(
+                    job, 'job_log', first_line=index,
+                    lines=[f'[{datetime.now().isoformat()}] Processing chunk {index}'],
+                )
+            event['event_id'] = index + 1
+            events.append(client_message(event))
+        return events
@@ -0,0 +1,182 @@
+"""
+JWT authentication middleware for WebSocket connections.
+
+JWTAuthMiddleware authenticates every WebSocket connection once, before
+the consumer runs:
+- reads the access token from ``?token=`` or an ``Authorization: Bearer``
+  header
+- validates it with a single decode
+- puts the user in ``scope['user']`` and their profile role in
+  ``scope['role']``
+
+JWTAuthMiddlewareStack nests it inside Channels' AuthMiddlewareStack, so
+a connection without a token is still authenticated by its Django session
+cookie (e.g. the admin or browsable API in the same browser). A token, when
+present, takes precedence over the session.
+
+Consumers only check ``scope['user']``.
+
+Users are resolved through UserCache, a bounded in-process LRU with a
+TTL. Concurrent lookups of the same user share one database query. When
+thousands of dashboards reconnect after a deploy, each ASGI process
+therefore queries each distinct user at most once per TTL instead of once
+per connection. Changes to a user or their role take up to
+settings.WS_AUTH_CACHE_TTL seconds to reach new connections.
+
+See ``python manage.py ws_auth_benchmark`` for connect latency under a
+simulated reconnect storm.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs
+from channels.auth import AuthMiddlewareStack
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from .models import Profile
+
+
+def get_token(scope):
+    """Extract a raw JWT from the query string or Authorization header"""
+    query = parse_qs(scope.get('query_string', b'').decode())
+    if query.get('token'):
+        return query['token'][0]
+    for name, value in scope.get('headers', []):
+        if name == b'authorization':
+            value = value.decode()
+            if value.startswith('Bearer '):
+                return value[len('Bearer '):]
+    return None
+
+
+def load_user(user_id):
+    """Fetch an active user and their profile role in one query, or (None, None)"""
+    User = get_user_model()
+    user = (
+        User.objects.filter(pk=user_id, is_active=True)
+        .select_related('profile')
+        .first()
+    )
+    if user is None:
+        return None, None
+    try:
+        role = user.profile.role
+    except Profile.DoesNotExist:
+        role = None
+    return user, role
+
+
+class UserCache:
+    """
+    Bounded LRU cache of (user, role) by user ID with a TTL.
+
+    Concurrent misses for the same user wait on a single load.
+    """
+
+    def __init__(self, max_size=None, ttl=None, loader=None, clock=time.monotonic):
+        self.max_size = max_size if max_size is not None else getattr(settings, 'WS_AUTH_CACHE_SIZE', 10000)
+        self.ttl = ttl if ttl is not None else getattr(settings, 'WS_AUTH_CACHE_TTL', 60)
+        self.loader = database_sync_to_async(loader or load_user)
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._pending = {}
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+
+    async def get(self, user_id):
+        """Return (user, role) for a user ID; user is None if it does not exist"""
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[0] > self.clock():
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        pending = self._pending.get(user_id)
+        if pending is None:
+            pending = asyncio.ensure_future(self._load(user_id))
+            self._pending[user_id] = pending
+        return await asyncio.shield(pending)
+
+    async def _load(self, user_id):
+        try:
+            self.loads += 1
+            value = await self.loader(user_id)
+            if value[0] is not None and self.max_size > 0:
+                self._entries[user_id] = (self.clock() + self.ttl, value)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+            return value
+        finally:
+            self._pending.pop(user_id, None)
+
+    def invalidate(self, user_id=None):
+        """Drop one user, or every user when no ID is given"""
+        if user_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(user_id, None)
+
+
+user_cache = UserCache()
+
+
+async def authenticate_token(token, cache=None):
+    """
+    Resolve a raw JWT access token to ``(user, role)`` through the user cache.
+
+    Returns ``(AnonymousUser(), None)`` for a missing or invalid token or an
+    unknown/inactive user.
+    """
+    if not token:
+        return AnonymousUser(), None
+    try:
+        user_id = AccessToken(token)[api_settings.USER_ID_CLAIM]
+    except (TokenError, KeyError):
+        return AnonymousUser(), None
+    user, role = await (cache or user_cache).get(user_id)
+    if user is None:
+        return AnonymousUser(), None
+    return user, role
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """
+    ASGI middleware that authenticates WebSocket connections with a JWT access token.
+
+    Sets ``scope['user']`` (AnonymousUser when the token is missing or
+    invalid) and ``scope['role']`` (the user's Profile role or None).
+    """
+
+    def __init__(self, inner, cache=None):
+        super().__init__(inner)
+        self.cache = cache
+
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope)
+        scope['user'], scope['role'] = await self.authenticate(scope)
+        return await super().__call__(scope, receive, send)
+
+    async def authenticate(self, scope):
+        token = get_token(scope)
+        session_user = scope.get('user')
+        if not token and session_user is not None and session_user.is_authenticated:
+            # No token: keep the user AuthMiddleware resolved from the session
+            user, role = await (self.cache or user_cache).get(session_user.pk)
+            if user is not None:
+                return user, role
+        return await authenticate_token(token, self.cache)
+
+
+def JWTAuthMiddlewareStack(inner):
+    """Wrap a WebSocket router with JWT authentication, falling back to the session"""
+    return AuthMiddlewareStack(JWTAuthMiddleware(inner))
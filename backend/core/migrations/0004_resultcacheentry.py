@@ -0,0 +1,118 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:16
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0003_job_meta"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ResultCacheEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "key",
+                    models.CharField(
+                        help_text="SHA-256 of job type, input, normalized parameters and processor version",
+                        max_length=64,
+                        unique=True,
+                    ),
+                ),
+                (
+                    "job_type",
+                    models.CharField(
+                        choices=[
+                            ("stt", "Speech-to-Text"),
+                            ("tts", "Text-to-Speech"),
+                            ("voice_cloning", "Voice Cloning"),
+                            ("dubbing", "Dubbing"),
+                            ("ai_stories", "AI Stories"),
+                        ],
+                        help_text="Job type",
+                        max_length=50,
+                    ),
+                ),
+                (
+                    "result_url",
+                    models.URLField(
+                        blank=True,
+                        help_text="URL to job result/output",
+                        max_length=500,
+                        null=True,
+                    ),
+                ),
+                (
+                    "result_file",
+                    models.FileField(
+                        blank=True,
+                        help_text="Result file shared with the job results cloned from this entry",
+                        null=True,
+                        upload_to="jobs/results/%Y/%m/%d/",
+                    ),
+                ),
+                (
+                    "logs",
+                    models.TextField(
+                        blank=True,
+                        help_text="Execution logs of the job that produced this entry",
+                        null=True,
+                    ),
+                ),
+                (
+                    "meta",
+                    models.JSONField(
+                        blank=True, default=dict, help_text="Result metadata"
+                    ),
+                ),
+                (
+                    "size_bytes",
+                    models.BigIntegerField(
+                        default=0,
+                        help_text="Approximate size of the cached result (file, logs and metadata)",
+                    ),
+                ),
+                (
+                    "hit_count",
+                    models.IntegerField(
+                        default=0, help_text="Number of jobs served from this entry"
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, help_text="Entry creation timestamp"
+                    ),
+                ),
+                (
+                    "last_used_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        help_text="Last time this entry was stored or hit",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Result Cache Entry",
+                "verbose_name_plural": "Result Cache Entries",
+                "ordering": ["-last_used_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["last_used_at"], name="core_resultcache_lru_idx"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0004_resultcacheentry"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="job",
+            name="dispatched_at",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="When the scheduler released the job to Celery",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="job",
+            name="priority",
+            field=models.IntegerField(
+                default=0,
+                help_text="Scheduling priority, higher runs first (set from meta.priority)",
+            ),
+        ),
+        migrations.AddField(
+            model_name="job",
+            name="schedule_key",
+            field=models.FloatField(
+                blank=True,
+                help_text="Fair-share virtual start time; lower runs first within a priority",
+                null=True,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="job",
+            index=models.Index(
+                models.OrderBy(models.F("priority"), descending=True),
+                models.F("schedule_key"),
+                models.F("id"),
+                condition=models.Q(
+                    ("dispatched_at__isnull", True),
+                    ("schedule_key__isnull", False),
+                    ("status", "pending"),
+                ),
+                name="core_job_schedule_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="job",
+            index=models.Index(
+                condition=models.Q(
+                    ("dispatched_at__isnull", False),
+                    ("status__in", ["pending", "running"]),
+                ),
+                fields=["created_by", "project", "type"],
+                name="core_job_inflight_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="job",
+            index=models.Index(
+                fields=["created_by", "-schedule_key"], name="core_job_user_key_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="job",
+            index=models.Index(
+                fields=["project", "-schedule_key"], name="core_job_project_key_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0005_job_scheduling"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="job",
+            index=models.Index(
+                fields=["-created_at", "-id"], name="core_job_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="job",
+            index=models.Index(
+                fields=["project", "-created_at", "-id"],
+                name="core_job_project_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="job",
+            index=models.Index(
+                fields=["created_by", "-created_at", "-id"],
+                name="core_job_creator_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="job",
+            index=models.Index(
+                condition=models.Q(("status__in", ["pending", "running"])),
+                fields=["status", "-created_at", "-id"],
+                name="core_job_active_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="jobresult",
+            index=models.Index(
+                fields=["-finished_at", "-id"], name="core_jobresult_finished_idx"
+            ),
+        ),
+    ]
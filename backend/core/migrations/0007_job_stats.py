@@ -0,0 +1,83 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:02
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0006_job_list_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="JobStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "scope",
+                    models.CharField(
+                        choices=[("project", "Project"), ("user", "User")],
+                        help_text="What scope_id refers to",
+                        max_length=10,
+                    ),
+                ),
+                ("scope_id", models.BigIntegerField(help_text="Project or user ID")),
+                (
+                    "pending",
+                    models.BigIntegerField(default=0, help_text="Pending jobs"),
+                ),
+                (
+                    "running",
+                    models.BigIntegerField(default=0, help_text="Running jobs"),
+                ),
+                (
+                    "completed",
+                    models.BigIntegerField(default=0, help_text="Completed jobs"),
+                ),
+                ("failed", models.BigIntegerField(default=0, help_text="Failed jobs")),
+                (
+                    "cancelled",
+                    models.BigIntegerField(default=0, help_text="Cancelled jobs"),
+                ),
+                (
+                    "duration_seconds",
+                    models.FloatField(
+                        default=0,
+                        help_text="Summed creation-to-completion time of the completed jobs counted in duration_count",
+                    ),
+                ),
+                (
+                    "duration_count",
+                    models.BigIntegerField(
+                        default=0, help_text="Completed jobs with a known duration"
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        help_text="Last counter change",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Job Statistics",
+                "verbose_name_plural": "Job Statistics",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("scope", "scope_id"), name="core_jobstats_scope_uniq"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0007_job_stats"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="resultcacheentry",
+            name="logs",
+        ),
+        migrations.AddField(
+            model_name="resultcacheentry",
+            name="source_job",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Job whose processing produced this entry",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="core.job",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="resultcacheentry",
+            name="size_bytes",
+            field=models.BigIntegerField(
+                default=0,
+                help_text="Approximate size of the cached result (file and metadata)",
+            ),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import F, Q
 from django.contrib.auth.models import User
 from django.utils import timezone
 
@@ -95,12 +96,53 @@ class Job(models.Model):
         null=True,
         help_text="Additional metadata in JSON format (job configuration, parameters, etc.)"
     )
+    priority = models.IntegerField(
+        default=0,
+        help_text="Scheduling priority, higher runs first (set from meta.priority)"
+    )
+    schedule_key = models.FloatField(
+        blank=True,
+        null=True,
+        help_text="Fair-share virtual start time; lower runs first within a priority"
+    )
+    dispatched_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        help_text="When the scheduler released the job to Celery"
+    )
     created_at = models.DateTimeField(auto_now_add=True, help_text="Job creation timestamp")
     
     class Meta:
         ordering = ['-created_at']
         verbose_name = "Job"
         verbose_name_plural = "Jobs"
+        indexes = [
+            # Scheduler run queue: pending jobs not yet released, in dispatch order
+            models.Index(
+                F('priority').desc(), 'schedule_key', 'id',
+                name='core_job_schedule_idx',
+                condition=Q(status=JobStatus.PENDING, dispatched_at__isnull=True, schedule_key__isnull=False),
+            ),
+            # Jobs holding scheduler capacity (released but not finished)
+            models.Index(
+                fields=['created_by', 'project', 'type'],
+                name='core_job_inflight_idx',
+                condition=Q(status__in=[JobStatus.PENDING, JobStatus.RUNNING], dispatched_at__isnull=False),
+            ),
+            # Latest fair-share tag per user and per project
+            models.Index(fields=['created_by', '-schedule_key'], name='core_job_user_key_idx'),
+            models.Index(fields=['project', '-schedule_key'], name='core_job_project_key_idx'),
+            # Job lists, paged newest first on (created_at, id) (see core/pagination.py):
+            # all jobs, per project, per creator, and active jobs by status
+            models.Index(fields=['-created_at', '-id'], name='core_job_created_idx'),
+            models.Index(fields=['project', '-created_at', '-id'], name='core_job_project_created_idx'),
+            models.Index(fields=['created_by', '-created_at', '-id'], name='core_job_creator_created_idx'),
+            models.Index(
+                fields=['status', '-created_at', '-id'],
+                name='core_job_active_created_idx',
+                condition=Q(status__in=[JobStatus.PENDING, JobStatus.RUNNING]),
+            ),
+        ]
     
     def __str__(self):
         return f"{self.type} - {self.status} (Project: {self.project.name})"
@@ -148,6 +190,10 @@ class JobResult(models.Model):
         ordering = ['-finished_at']
         verbose_name = "Job Result"
         verbose_name_plural = "Job Results"
+        indexes = [
+            # Result lists, paged on (finished_at, id) (see core/pagination.py)
+            models.Index(fields=['-finished_at', '-id'], name='core_jobresult_finished_idx'),
+        ]
     
     def __str__(self):
         return f"Result for {self.job.type} job (Finished: {self.finished_at})"
@@ -239,3 +285,107 @@ class Settings(models.Model):
     def __str__(self):
         scope = f"User: {self.user.username}" if self.user else "Global"
         return f"{scope} - {self.key}: {self.value}"
+
+
+class ResultCacheEntry(models.Model):
+    """
+    Cached result of a job, keyed by a content hash of its inputs.
+    
+    The key covers the job type, input file bytes (or input URL), the
+    job's normalized meta parameters and the processor version, so a
+    resubmitted job with identical inputs can be completed by cloning
+    this entry instead of re-running the processor. The result file is
+    shared with the job that produced it, not copied.
+    """
+    key = models.CharField(
+        max_length=64,
+        unique=True,
+        help_text="SHA-256 of job type, input, normalized parameters and processor version"
+    )
+    job_type = models.CharField(
+        max_length=50,
+        choices=JobType.choices,
+        help_text="Job type"
+    )
+    result_url = models.URLField(
+        max_length=500,
+        blank=True,
+        null=True,
+        help_text="URL to job result/output"
+    )
+    result_file = models.FileField(
+        upload_to='jobs/results/%Y/%m/%d/',
+        blank=True,
+        null=True,
+        help_text="Result file shared with the job results cloned from this entry"
+    )
+    source_job = models.ForeignKey(
+        Job,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        blank=True,
+        null=True,
+        help_text="Job whose processing produced this entry"
+    )
+    meta = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Result metadata"
+    )
+    size_bytes = models.BigIntegerField(
+        default=0,
+        help_text="Approximate size of the cached result (file and metadata)"
+    )
+    hit_count = models.IntegerField(default=0, help_text="Number of jobs served from this entry")
+    created_at = models.DateTimeField(auto_now_add=True, help_text="Entry creation timestamp")
+    last_used_at = models.DateTimeField(default=timezone.now, help_text="Last time this entry was stored or hit")
+    
+    class Meta:
+        ordering = ['-last_used_at']
+        verbose_name = "Result Cache Entry"
+        verbose_name_plural = "Result Cache Entries"
+        indexes = [
+            models.Index(fields=['last_used_at'], name='core_resultcache_lru_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.job_type} result {self.key[:12]} ({self.hit_count} hits)"
+
+
+class StatsScope(models.TextChoices):
+    """Enum for what a JobStats row counts"""
+    PROJECT = 'project', 'Project'
+    USER = 'user', 'User'
+
+
+class JobStats(models.Model):
+    """
+    Job counters per project or per user, maintained incrementally.
+    
+    Updated in the same transaction as every job creation, deletion and
+    status change, and repaired by a periodic reconciliation (see
+    core/job_stats.py). Dashboards read one row instead of aggregating jobs.
+    """
+    scope = models.CharField(max_length=10, choices=StatsScope.choices, help_text="What scope_id refers to")
+    scope_id = models.BigIntegerField(help_text="Project or user ID")
+    pending = models.BigIntegerField(default=0, help_text="Pending jobs")
+    running = models.BigIntegerField(default=0, help_text="Running jobs")
+    completed = models.BigIntegerField(default=0, help_text="Completed jobs")
+    failed = models.BigIntegerField(default=0, help_text="Failed jobs")
+    cancelled = models.BigIntegerField(default=0, help_text="Cancelled jobs")
+    duration_seconds = models.FloatField(
+        default=0,
+        help_text="Summed creation-to-completion time of the completed jobs counted in duration_count"
+    )
+    duration_count = models.BigIntegerField(default=0, help_text="Completed jobs with a known duration")
+    updated_at = models.DateTimeField(default=timezone.now, help_text="Last counter change")
+    
+    class Meta:
+        verbose_name = "Job Statistics"
+        verbose_name_plural = "Job Statistics"
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'scope_id'], name='core_jobstats_scope_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.scope} {self.scope_id} job statistics"
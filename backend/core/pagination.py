@@ -0,0 +1,169 @@
+"""
+Keyset (cursor) pagination for large, append-mostly tables.
+
+Page number pagination makes the database skip ``OFFSET`` rows and count
+the whole permission-filtered result on every request, so deep pages get
+slower as the table grows. KeysetPagination instead continues after the
+last row of the previous page:
+
+    WHERE created_at <= <last created_at>
+      AND (created_at < <last created_at> OR (created_at = <last created_at> AND id < <last id>))
+    ORDER BY created_at DESC, id DESC LIMIT <page_size + 1>
+
+The ``id`` tie-breaker makes the ordering total. The OR alone cannot
+bound an index scan, so the leading ``created_at <=`` conjunct is what
+lets the database start the scan of the ``(created_at, id)`` index at
+the cursor. Every page then costs the same, however deep the client
+pages.
+
+Responses keep the usual DRF shape, ``{next, previous, results}``, with
+opaque ``?cursor=`` links. The total is a COUNT(*) over the whole
+filtered result, so it is only included when asked for with
+``?count=true``. Requests with ``?page=`` or a custom ``?ordering=`` fall
+back to page number pagination, so existing clients keep working.
+"""
+
+import base64
+import json
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination on ``(ordering field, id)``; subclasses set ``ordering``"""
+
+    ordering = '-created_at'
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    # Query parameters that select page number pagination instead
+    fallback_query_params = ('page', 'ordering')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.fallback = None
+        if any(param in request.query_params for param in self.fallback_query_params):
+            self.fallback = PageNumberPagination()
+            return self.fallback.paginate_queryset(queryset, request, view)
+
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        field = self.ordering.lstrip('-')
+        descending = self.ordering.startswith('-')
+        cursor = self.decode_cursor(request)
+        reverse = cursor is not None and cursor['reverse']
+
+        self.count = None
+        if request.query_params.get(self.count_query_param, '').lower() in ('true', '1'):
+            self.count = queryset.order_by().count()
+
+        # Walking backwards flips the order; the page is reversed again below
+        forward_descending = descending != reverse
+        prefix = '-' if forward_descending else ''
+        queryset = queryset.order_by(f'{prefix}{field}', f'{prefix}id')
+        if cursor is not None:
+            value = queryset.model._meta.get_field(field).to_python(cursor['value'])
+            lookup = 'lt' if forward_descending else 'gt'
+            # The first conjunct bounds the index scan; the OR only breaks ties
+            queryset = queryset.filter(
+                Q(**{f'{field}__{lookup}e': value}),
+                Q(**{f'{field}__{lookup}': value}) | Q(**{field: value, f'id__{lookup}': cursor['id']}),
+            )
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.field = field
+        self.page = rows
+        self.has_next = has_more if not reverse else True
+        self.has_previous = (cursor is not None) if not reverse else has_more
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            return {'value': cursor['v'], 'id': int(cursor['id']), 'reverse': bool(cursor.get('r'))}
+        except (TypeError, ValueError, KeyError):
+            raise NotFound('Invalid cursor')
+
+    def encode_cursor(self, row, reverse):
+        value = getattr(row, self.field)
+        cursor = {'v': value.isoformat() if hasattr(value, 'isoformat') else value, 'id': row.pk}
+        if reverse:
+            cursor['r'] = 1
+        encoded = base64.urlsafe_b64encode(json.dumps(cursor, separators=(',', ':')).encode()).decode()
+        url = remove_query_param(self.base_url, self.cursor_query_param)
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if self.fallback is not None:
+            return self.fallback.get_next_link()
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if self.fallback is not None:
+            return self.fallback.get_previous_link()
+        if not self.has_previous:
+            return None
+        if not self.page:
+            # Walked past the end; the first page is the way back
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        if self.fallback is not None:
+            return self.fallback.get_paginated_response(data)
+        payload = {}
+        if self.count is not None:
+            payload['count'] = self.count
+        payload.update({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['next', 'previous', 'results'],
+            'properties': {
+                'count': {'type': 'integer', 'example': 123},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class JobPagination(KeysetPagination):
+    """Jobs, newest first"""
+
+    ordering = '-created_at'
+
+
+class JobResultPagination(KeysetPagination):
+    """Job results, most recently finished first"""
+
+    ordering = '-finished_at'
@@ -0,0 +1,183 @@
+"""
+Subscriber presence for job event groups.
+
+Most jobs have nobody watching them. Consumers and SSE streams therefore
+register every group they join. The publisher asks which of an event's
+groups have listeners and skips sending the event to the others (see
+JobEventPublisher.publish()). Job state events are still recorded in the
+replay buffers of every group, so a client that comes back later replays
+them; only events that are not replayed, like log lines, are never built.
+
+Presence is kept in Redis, one sorted set per group (``presence:<group>``)
+with channel names scored by expiry time:
+- PresenceTracker refreshes every registration of its process in one
+  pipeline every settings.PRESENCE_TTL / 2 seconds, so registrations of
+  crashed processes expire on their own
+- leaving a group keeps the registration for settings.PRESENCE_GRACE more
+  seconds, so publishers that cached the group as watched keep sending
+  to a client that reconnects after a blip
+
+Publishers cache the answer per group for settings.PRESENCE_CACHE_SECONDS,
+so a progress tick rarely costs a Redis round trip. A new listener
+therefore receives events at most that much later.
+
+Presence needs a store shared by ASGI processes and Celery workers, i.e.
+django-redis as the cache backend. Without it every group counts as
+watched and events are always sent. Set
+settings.JOB_EVENTS_SKIP_UNWATCHED = False to always send as well.
+"""
+
+import asyncio
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+
+def _key(group):
+    return f'presence:{group}'
+
+
+def _ttl():
+    return getattr(settings, 'PRESENCE_TTL', 60)
+
+
+def _grace():
+    return getattr(settings, 'PRESENCE_GRACE', 120)
+
+
+class LocalPresenceStore:
+    """In-process presence; only meaningful when publishers share the process"""
+
+    def __init__(self):
+        self._groups = {}
+
+    def add(self, entries, expires):
+        for group, member in entries:
+            self._groups.setdefault(group, {})[member] = expires
+
+    def count(self, groups, now):
+        counts = []
+        for group in groups:
+            members = self._groups.get(group, {})
+            for member, expires in list(members.items()):
+                if expires <= now:
+                    del members[member]
+            counts.append(len(members))
+        return counts
+
+
+class RedisPresenceStore:
+    """Presence as Redis sorted sets of channel names scored by expiry"""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def add(self, entries, expires):
+        pipe = self.connection.pipeline(transaction=False)
+        for group, member in entries:
+            key = _key(group)
+            pipe.zadd(key, {member: expires})
+            pipe.zremrangebyscore(key, '-inf', time.time())
+            pipe.expire(key, int(_ttl() + _grace()) + 1)
+        pipe.execute()
+
+    def count(self, groups, now):
+        pipe = self.connection.pipeline(transaction=False)
+        for group in groups:
+            pipe.zcount(_key(group), f'({now}', '+inf')
+        return pipe.execute()
+
+
+_store = None
+
+
+def get_store():
+    """Redis-backed store when the cache uses django-redis, else None (presence disabled)"""
+    global _store
+    if _store is None and settings.CACHES['default']['BACKEND'].startswith('django_redis'):
+        from django_redis import get_redis_connection
+        _store = RedisPresenceStore(get_redis_connection('default'))
+    return _store
+
+
+_watched_cache = {}
+# Bound on groups remembered by a publisher process
+WATCHED_CACHE_SIZE = 10000
+
+
+def watched(groups):
+    """Return the groups that currently have at least one listener"""
+    store = get_store()
+    if store is None or not getattr(settings, 'JOB_EVENTS_SKIP_UNWATCHED', True):
+        return list(groups)
+
+    now = time.time()
+    answers = {}
+    unknown = []
+    for group in groups:
+        cached = _watched_cache.get(group)
+        if cached is not None and cached[0] > now:
+            answers[group] = cached[1]
+        else:
+            unknown.append(group)
+    if unknown:
+        if len(_watched_cache) >= WATCHED_CACHE_SIZE:
+            _watched_cache.clear()
+        expires = now + getattr(settings, 'PRESENCE_CACHE_SECONDS', 1.0)
+        for group, count in zip(unknown, store.count(unknown, now)):
+            answers[group] = count > 0
+            _watched_cache[group] = (expires, count > 0)
+    return [group for group in groups if answers[group]]
+
+
+class PresenceTracker:
+    """
+    Registers the groups joined in this process and keeps them alive.
+
+    One heartbeat task per process refreshes all registrations together.
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._members = set()
+        self._heartbeat = None
+
+    def _bind(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # The heartbeat task is tied to the loop that started it
+            self._loop, self._members, self._heartbeat = loop, set(), None
+
+    async def join(self, group, member):
+        store = get_store()
+        if store is None:
+            return
+        self._bind()
+        self._members.add((group, member))
+        await sync_to_async(store.add, thread_sensitive=False)([(group, member)], time.time() + _ttl())
+        if self._heartbeat is None:
+            self._heartbeat = asyncio.ensure_future(self._refresh())
+
+    async def leave(self, group, member):
+        store = get_store()
+        if store is None:
+            return
+        self._bind()
+        self._members.discard((group, member))
+        await sync_to_async(store.add, thread_sensitive=False)([(group, member)], time.time() + _grace())
+
+    async def _refresh(self):
+        try:
+            while self._members:
+                await asyncio.sleep(_ttl() / 2)
+                entries = list(self._members)
+                try:
+                    await sync_to_async(get_store().add, thread_sensitive=False)(entries, time.time() + _ttl())
+                except Exception:
+                    # Redis unavailable; registrations are retried on the next beat
+                    continue
+        finally:
+            self._heartbeat = None
+
+
+tracker = PresenceTracker()
@@ -0,0 +1,99 @@
+"""
+Processor registry for job types.
+
+Each JobType registers the function that processes it together with its
+routing metadata: the Celery queue it runs on, soft/hard time limits,
+and the concurrency/prefetch its worker pool should be started with. The
+processor version is part of the result cache key (core/result_cache.py).
+process_job looks handlers up here instead of branching on job.type, and
+dispatch_jobs in core/tasks.py (called by core/scheduler.py when it
+releases jobs) uses the metadata to route each task.
+
+Register a processor with the decorator:
+
+    @register_processor(JobType.TTS, queue='jobs.tts', soft_time_limit=240,
+                        time_limit=300, max_concurrency=8, prefetch_multiplier=4)
+    def process_tts_job(job, reporter):
+        ...
+"""
+
+from dataclasses import dataclass
+from typing import Callable, Optional
+from django.conf import settings
+
+
+DEFAULT_QUEUE = 'celery'
+
+
+@dataclass(frozen=True)
+class ProcessorSpec:
+    """Handler and routing metadata for one job type"""
+    job_type: Optional[str]
+    handler: Callable
+    queue: str = DEFAULT_QUEUE
+    soft_time_limit: Optional[int] = None
+    time_limit: Optional[int] = None
+    max_concurrency: int = 4
+    prefetch_multiplier: int = 1
+    # Bump when the processor's output changes so cached results are not reused
+    version: str = '1'
+    # Whether identical resubmissions may be served from the result cache
+    cacheable: bool = True
+
+    def task_options(self):
+        """Options passed to apply_async when dispatching process_job"""
+        options = {'queue': self.queue}
+        if self.soft_time_limit:
+            options['soft_time_limit'] = self.soft_time_limit
+        if self.time_limit:
+            options['time_limit'] = self.time_limit
+        return options
+
+    def worker_command(self):
+        """Celery worker command line for a pool dedicated to this queue"""
+        return (
+            f'celery -A ai_platform worker -Q {self.queue} '
+            f'-c {self.max_concurrency} --prefetch-multiplier {self.prefetch_multiplier} '
+            f'-n {self.queue}@%h --loglevel=info'
+        )
+
+
+_registry = {}
+_fallback = None
+
+
+def register_processor(job_type, **options):
+    """
+    Decorator registering a processor for a job type.
+
+    Pass job_type=None to register the fallback used for unknown types.
+    Routing options can be overridden per deployment through
+    settings.JOB_PROCESSOR_OVERRIDES, e.g. {'dubbing': {'max_concurrency': 2}}.
+    """
+    def decorator(handler):
+        global _fallback
+        key = str(job_type) if job_type is not None else None
+        overrides = getattr(settings, 'JOB_PROCESSOR_OVERRIDES', {}).get(key or 'default', {})
+        spec = ProcessorSpec(job_type=key, handler=handler, **{**options, **overrides})
+        if key is None:
+            _fallback = spec
+        else:
+            _registry[key] = spec
+        return handler
+    return decorator
+
+
+def get_processor(job_type):
+    """Return the ProcessorSpec for a job type, or the fallback spec"""
+    spec = _registry.get(str(job_type), _fallback)
+    if spec is None:
+        raise LookupError(f'No processor registered for job type {job_type!r}')
+    return spec
+
+
+def registered_processors():
+    """Return all registered specs, fallback last"""
+    specs = list(_registry.values())
+    if _fallback is not None:
+        specs.append(_fallback)
+    return specs
@@ -0,0 +1,166 @@
+"""
+Throttled progress reporting for job processors.
+
+Processors in core/tasks.py report progress through a ProgressReporter
+instead of saving the job and broadcasting on every step. The reporter
+only emits when progress moved by at least ``min_delta`` points or
+``min_interval`` seconds passed since the last emit, and always emits on
+stage boundaries and terminal states. Each emit is a single UPDATE
+statement followed by a single broadcast built from the job instance
+the processor already holds. Terminal states also update the job
+statistics counters (core/job_stats.py) in the same transaction, and
+are broadcast only after the caller's transaction commits.
+
+Every reporter carries a CancellationToken (core/cancellation.py):
+update() and stage() raise JobCancelled once the job has been cancelled,
+and terminal states are only written while the job is still PENDING or
+RUNNING, so a cancelled job is never moved to COMPLETED.
+"""
+
+import time
+from django.conf import settings
+from django.db import transaction
+from .models import Job, JobStatus
+from .events import publisher
+from .cancellation import CancellationToken
+from . import job_stats
+
+
+class ProgressReporter:
+    """
+    Reports job progress with throttling.
+
+    Usage:
+        reporter = ProgressReporter(job)
+        reporter.update(35)                  # emitted only if throttle allows
+        reporter.stage(40, 'Transcribing')   # always emitted
+        reporter.finish(JobStatus.COMPLETED) # terminal, always emitted
+    """
+
+    def __init__(self, job, min_delta=None, min_interval=None, clock=time.monotonic, monotonic=False,
+                 token=None):
+        self.job = job
+        self.token = token if token is not None else CancellationToken(job.pk, clock=clock)
+        # When several workers report for the same job (e.g. parallel segments),
+        # monotonic=True never lets an out-of-order update move progress back
+        self.monotonic = monotonic
+        self.min_delta = (
+            min_delta if min_delta is not None
+            else getattr(settings, 'JOB_PROGRESS_MIN_DELTA', 10)
+        )
+        self.min_interval = (
+            min_interval if min_interval is not None
+            else getattr(settings, 'JOB_PROGRESS_MIN_INTERVAL', 2.0)
+        )
+        self.clock = clock
+        self.progress = job.progress or 0
+        self.stage_name = None
+        self.emit_count = 0
+        # The job's current progress is already persisted, so treat it as emitted
+        self._emitted_progress = self.progress
+        self._emitted_at = clock()
+
+    def update(self, progress):
+        """
+        Record new progress and emit it if the throttle allows.
+
+        Returns True if the update was emitted. Raises JobCancelled if the
+        job has been cancelled.
+        """
+        self.token.check()
+        self.progress = max(0, min(100, int(progress)))
+        if self._should_emit():
+            self.flush()
+            return True
+        return False
+
+    def stage(self, progress, name=None):
+        """Mark a stage boundary. Stage boundaries are always emitted."""
+        self.token.check(force=True)
+        self.progress = max(0, min(100, int(progress)))
+        self.stage_name = name
+        self.flush()
+
+    def flush(self):
+        """
+        Persist and broadcast the current progress if it has not been emitted yet.
+        """
+        if self.progress == self._emitted_progress:
+            return
+        self._emit(progress=self.progress)
+
+    def finish(self, status, **kwargs):
+        """
+        Emit a terminal state (COMPLETED, FAILED or CANCELLED).
+
+        Status and progress are written in one UPDATE, which only applies
+        while the job is PENDING or RUNNING. Extra keyword arguments
+        (e.g. ``error``) are included in the broadcast.
+        
+        Returns False if the job had already reached a final state (e.g.
+        it was cancelled), in which case nothing is written or broadcast.
+        """
+        if status == JobStatus.COMPLETED:
+            self.progress = 100
+        previous_status = self.job.status
+        return self._emit(progress=self.progress, status=status, previous_status=previous_status, **kwargs)
+
+    def _should_emit(self):
+        if self.progress == self._emitted_progress:
+            return False
+        if abs(self.progress - self._emitted_progress) >= self.min_delta:
+            return True
+        return self.clock() - self._emitted_at >= self.min_interval
+
+    def _emit(self, progress, status=None, previous_status=None, **kwargs):
+        fields = {'progress': progress}
+        if status is not None:
+            fields['status'] = status
+        queryset = Job.objects.filter(pk=self.job.pk)
+        if self.monotonic and status is None:
+            queryset = queryset.filter(progress__lt=progress)
+        if status is None:
+            updated = queryset.update(**fields)
+        else:
+            with transaction.atomic():
+                updated = queryset.filter(status__in=[JobStatus.PENDING, JobStatus.RUNNING]).update(**fields)
+                if updated:
+                    self.job.status = status
+                    job_stats.record_status_change(self.job, previous_status)
+        if not updated and (self.monotonic or status is not None):
+            return False
+        for name, value in fields.items():
+            setattr(self.job, name, value)
+
+        if status is None:
+            publisher.publish(
+                self.job,
+                'job_progress',
+                progress=progress,
+                status=self.job.status,
+                **kwargs
+            )
+        elif status == JobStatus.COMPLETED:
+            # Terminal states are broadcast once the caller's transaction
+            # commits, so clients never see a state that is rolled back
+            transaction.on_commit(lambda: publisher.publish(
+                self.job,
+                'job_progress',
+                progress=progress,
+                status=status,
+                **kwargs
+            ))
+        else:
+            transaction.on_commit(lambda: publisher.publish(
+                self.job,
+                'job_status_change',
+                status=status,
+                previous_status=previous_status,
+                progress=progress,
+                **kwargs
+            ))
+
+        self._emitted_progress = progress
+        self._emitted_at = self.clock()
+        self.emit_count += 1
+        return True
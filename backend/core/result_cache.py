@@ -0,0 +1,195 @@
+"""
+Content-addressed result cache for repeated jobs.
+
+A job's cache key is a SHA-256 over its type, input file bytes (or input
+URL), normalized Job.meta parameters and the registered processor
+version. When a job with a known key is processed, process_job completes
+it immediately by cloning the cached ResultCacheEntry into its JobResult;
+the result file is shared, not copied. Only the result payload is cached:
+the new job's log gets a single line naming the source job, since the
+source job's log summary points at that job's own log.
+
+Set ``{"cache": false}`` in Job.meta to bypass the lookup for a job.
+Entries expire after settings.RESULT_CACHE_TTL_SECONDS and the least
+recently used entries are evicted once the cache grows past
+settings.RESULT_CACHE_MAX_BYTES (see the evict_result_cache task).
+Hit/miss counters are kept in the Django cache and exposed by stats().
+"""
+
+import hashlib
+import json
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Sum
+from django.utils import timezone
+from .models import ResultCacheEntry
+from .processors import get_processor
+
+
+# Job.meta keys that do not change a processor's output
+IGNORED_META_KEYS = {'cache', 'priority'}
+
+HITS_KEY = 'result_cache_hits'
+MISSES_KEY = 'result_cache_misses'
+
+
+def is_enabled(job):
+    """Whether the result cache may be used for this job"""
+    if not getattr(settings, 'RESULT_CACHE_ENABLED', True):
+        return False
+    if (job.meta or {}).get('cache') is False:
+        return False
+    return get_processor(job.type).cacheable
+
+
+def compute_key(job):
+    """
+    Return the cache key for a job.
+
+    The digest is memoized on the instance since hashing large input files
+    is the expensive part.
+    """
+    cached_key = getattr(job, '_result_cache_key', None)
+    if cached_key:
+        return cached_key
+
+    digest = hashlib.sha256()
+    digest.update(f'type:{job.type}\n'.encode())
+    digest.update(f'version:{get_processor(job.type).version}\n'.encode())
+    if job.input_file:
+        digest.update(b'file:')
+        job.input_file.open('rb')
+        try:
+            for chunk in job.input_file.chunks():
+                digest.update(chunk)
+        finally:
+            job.input_file.close()
+        digest.update(b'\n')
+    else:
+        digest.update(f'url:{job.input_url or ""}\n'.encode())
+    params = {
+        key: value for key, value in (job.meta or {}).items()
+        if key not in IGNORED_META_KEYS
+    }
+    digest.update(b'meta:')
+    digest.update(json.dumps(params, sort_keys=True, separators=(',', ':'), default=str).encode())
+
+    job._result_cache_key = digest.hexdigest()
+    return job._result_cache_key
+
+
+def lookup(job):
+    """
+    Return a processor result dict cloned from the cache, or None on a miss.
+    """
+    if not is_enabled(job):
+        return None
+
+    ttl = timedelta(seconds=settings.RESULT_CACHE_TTL_SECONDS)
+    entry = ResultCacheEntry.objects.filter(
+        key=compute_key(job),
+        last_used_at__gte=timezone.now() - ttl,
+    ).first()
+    if entry is None:
+        _incr(MISSES_KEY)
+        return None
+
+    ResultCacheEntry.objects.filter(pk=entry.pk).update(
+        hit_count=F('hit_count') + 1,
+        last_used_at=timezone.now(),
+    )
+    _incr(HITS_KEY)
+    return {
+        'success': True,
+        'result_url': entry.result_url,
+        'result_file': entry.result_file.name or None,
+        'meta': {**entry.meta, 'cache_hit': True},
+        'cached': True,
+        'cache_key': entry.key,
+        'source_job_id': entry.source_job_id,
+    }
+
+
+def store(job, result):
+    """Store a successful processor result for future identical jobs"""
+    if not result.get('success') or result.get('cached'):
+        return None
+    if not getattr(settings, 'RESULT_CACHE_ENABLED', True) or not get_processor(job.type).cacheable:
+        return None
+
+    result_file = result.get('result_file')
+    result_file_name = getattr(result_file, 'name', result_file) or None
+    meta = result.get('meta') or {}
+    size = len(json.dumps(meta, default=str).encode())
+    if result_file_name:
+        try:
+            size += ResultCacheEntry._meta.get_field('result_file').storage.size(result_file_name)
+        except (OSError, NotImplementedError):
+            pass
+
+    entry, _ = ResultCacheEntry.objects.update_or_create(
+        key=compute_key(job),
+        defaults={
+            'job_type': job.type,
+            'result_url': result.get('result_url'),
+            'result_file': result_file_name,
+            'source_job': job,
+            'meta': meta,
+            'size_bytes': size,
+            'last_used_at': timezone.now(),
+        }
+    )
+    return entry
+
+
+def evict(now=None):
+    """
+    Delete expired entries, then least recently used entries until the
+    cache fits in settings.RESULT_CACHE_MAX_BYTES.
+
+    Result files are never deleted since job results still reference them.
+
+    Returns the number of entries deleted.
+    """
+    now = now or timezone.now()
+    ttl = timedelta(seconds=settings.RESULT_CACHE_TTL_SECONDS)
+    deleted, _ = ResultCacheEntry.objects.filter(last_used_at__lt=now - ttl).delete()
+
+    total = ResultCacheEntry.objects.aggregate(total=Sum('size_bytes'))['total'] or 0
+    excess = total - settings.RESULT_CACHE_MAX_BYTES
+    if excess > 0:
+        victims = []
+        for pk, size in ResultCacheEntry.objects.order_by('last_used_at').values_list('pk', 'size_bytes').iterator():
+            if excess <= 0:
+                break
+            victims.append(pk)
+            excess -= size
+        deleted += ResultCacheEntry.objects.filter(pk__in=victims).delete()[0]
+    return deleted
+
+
+def stats():
+    """Hit/miss counters and current cache size"""
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    totals = ResultCacheEntry.objects.aggregate(total=Sum('size_bytes'), saved=Sum('hit_count'))
+    lookups = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+        'entries': ResultCacheEntry.objects.count(),
+        'total_bytes': totals['total'] or 0,
+        'max_bytes': settings.RESULT_CACHE_MAX_BYTES,
+        'jobs_served_from_cache': totals['saved'] or 0,
+    }
+
+
+def _incr(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Counter missing or expired; add() avoids clobbering a concurrent incr
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
@@ -0,0 +1,297 @@
+"""
+Fair-share, priority-aware scheduler in front of process_job.
+
+New jobs are not sent to Celery straight away. submit() gives each job a
+priority (from ``Job.meta['priority']``, see job_priority() for who may
+raise it) and a fair-share schedule key, and schedule() releases pending jobs to their processor queues only
+while there is free capacity.
+
+Ordering is (priority desc, schedule_key asc, id): a partial index over
+pending, unreleased jobs, so picking the next job is an index seek
+however many jobs are waiting.
+
+The schedule key is a virtual start time (start-time fair queuing). A
+job's key is the largest of:
+
+- the current virtual time (the key of the last released job)
+- the user's previous key + 1 / user weight
+- the project's previous key + 1 / project weight
+
+A user who submits 5,000 jobs spreads them out in virtual time. Another
+user's next job slots in right behind the head of the queue instead of
+behind all 5,000.
+
+Capacity limits applied by schedule():
+- per processor queue: sum of the registered max_concurrency
+- per user: settings.SCHEDULER_MAX_RUNNING_PER_USER
+- per project: settings.SCHEDULER_MAX_RUNNING_PER_PROJECT
+
+Weights come from settings.SCHEDULER_USER_WEIGHTS and
+settings.SCHEDULER_PROJECT_WEIGHTS, keyed by ID. A job holds capacity from
+release until it reaches a terminal state; finish_job/cancel_job in
+core/tasks.py call schedule() again, and a periodic task catches anything
+missed. The hold is a lease of settings.SCHEDULER_DISPATCH_LEASE seconds:
+a job whose worker died or ran out of retries stays PENDING or RUNNING,
+and once its lease has expired it no longer counts against the limits.
+"""
+
+from collections import Counter
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q
+from django.utils import timezone
+from .models import Job, JobStatus
+from .processors import get_processor, registered_processors
+
+
+MAX_PRIORITY = 100
+
+# Reasons a pending job has not been released yet
+WAIT_QUEUE_FULL = 'queue_capacity'
+WAIT_USER_LIMIT = 'user_concurrency_limit'
+WAIT_PROJECT_LIMIT = 'project_concurrency_limit'
+WAIT_SCHEDULING = 'waiting_for_turn'
+
+VTIME_KEY = 'scheduler_virtual_time'
+LOCK_KEY = 'scheduler_lock'
+RERUN_KEY = 'scheduler_rerun'
+LOCK_TIMEOUT = 60
+
+
+def job_priority(job):
+    """
+    Priority from Job.meta, clamped to +/- MAX_PRIORITY.
+
+    Priority is ordered before fair share, so only staff can raise it up
+    to MAX_PRIORITY. Other users are capped at
+    settings.SCHEDULER_MAX_USER_PRIORITY (0 by default): they can lower
+    the priority of their own jobs but not jump ahead of other users.
+    """
+    try:
+        priority = int((job.meta or {}).get('priority', 0))
+    except (TypeError, ValueError):
+        return 0
+    if job.created_by.is_staff:
+        ceiling = MAX_PRIORITY
+    else:
+        ceiling = min(MAX_PRIORITY, getattr(settings, 'SCHEDULER_MAX_USER_PRIORITY', 0))
+    return max(-MAX_PRIORITY, min(ceiling, priority))
+
+
+def _weight(setting, key):
+    weights = getattr(settings, setting, {})
+    return max(0.001, float(weights.get(str(key), weights.get(key, 1))))
+
+
+def _latest_keys(field, ids):
+    """Latest schedule key per user or project ID, in one grouped query (served by *_key_idx)"""
+    return dict(
+        Job.objects.filter(schedule_key__isnull=False, **{f'{field}__in': ids})
+        .order_by()
+        .values_list(field)
+        .annotate(latest=Max('schedule_key'))
+    )
+
+
+def virtual_time():
+    """Schedule key of the most recently released job"""
+    vtime = cache.get(VTIME_KEY)
+    if vtime is None:
+        # Cache was cleared: the smallest pending key is a close lower bound
+        # (not the head of the run queue, which is ordered by priority first)
+        vtime = pending_jobs().aggregate(lowest=Min('schedule_key'))['lowest'] or 0.0
+    return vtime
+
+
+def assign_schedule(jobs):
+    """
+    Set priority and schedule_key on job instances (saved or not).
+
+    Jobs are keyed in list order, so a batch from one user is spread out
+    relative to other users' jobs. Does not save the instances.
+    """
+    vtime = virtual_time()
+    user_keys = _latest_keys('created_by_id', {job.created_by_id for job in jobs})
+    project_keys = _latest_keys('project_id', {job.project_id for job in jobs})
+    for job in jobs:
+        user_key = user_keys.get(job.created_by_id)
+        project_key = project_keys.get(job.project_id)
+
+        key = vtime
+        if user_key is not None:
+            key = max(key, user_key + 1.0 / _weight('SCHEDULER_USER_WEIGHTS', job.created_by_id))
+        if project_key is not None:
+            key = max(key, project_key + 1.0 / _weight('SCHEDULER_PROJECT_WEIGHTS', job.project_id))
+
+        job.priority = job_priority(job)
+        job.schedule_key = key
+        user_keys[job.created_by_id] = key
+        project_keys[job.project_id] = key
+    return jobs
+
+
+def submit(job):
+    """
+    Queue a newly created job for scheduling and run a scheduling pass.
+
+    Returns the number of jobs released by the pass.
+    """
+    assign_schedule([job])
+    job.save(update_fields=['priority', 'schedule_key'])
+    return schedule()
+
+
+def pending_jobs():
+    """Pending, unreleased jobs in dispatch order (served by core_job_schedule_idx)"""
+    return Job.objects.filter(
+        status=JobStatus.PENDING,
+        dispatched_at__isnull=True,
+        schedule_key__isnull=False,
+    ).order_by('-priority', 'schedule_key', 'id')
+
+
+def in_flight_jobs(now=None):
+    """Released jobs that still hold capacity (served by core_job_inflight_idx)"""
+    lease = timedelta(seconds=getattr(settings, 'SCHEDULER_DISPATCH_LEASE', 4 * 3600))
+    return Job.objects.filter(
+        status__in=[JobStatus.PENDING, JobStatus.RUNNING],
+        dispatched_at__isnull=False,
+        dispatched_at__gt=(now or timezone.now()) - lease,
+    )
+
+
+class Capacity:
+    """Running counts per user, project and queue against their limits"""
+
+    def __init__(self):
+        self.max_per_user = getattr(settings, 'SCHEDULER_MAX_RUNNING_PER_USER', 4)
+        self.max_per_project = getattr(settings, 'SCHEDULER_MAX_RUNNING_PER_PROJECT', 8)
+        self.queue_limits = Counter()
+        for spec in registered_processors():
+            self.queue_limits[spec.queue] += spec.max_concurrency
+        if not self.queue_limits:
+            # An empty registry would read as "every queue is full" and release nothing
+            raise ImproperlyConfigured('No job processors are registered; core.tasks has not been imported')
+        self.users = Counter()
+        self.projects = Counter()
+        self.queues = Counter()
+
+    @classmethod
+    def load(cls, now=None):
+        """Current usage from one grouped query over in-flight jobs"""
+        capacity = cls()
+        rows = in_flight_jobs(now).values('created_by_id', 'project_id', 'type').annotate(count=Count('id'))
+        for row in rows:
+            capacity.users[row['created_by_id']] += row['count']
+            capacity.projects[row['project_id']] += row['count']
+            capacity.queues[get_processor(row['type']).queue] += row['count']
+        return capacity
+
+    def blocked_by(self, job):
+        """Return the reason this job cannot be released now, or None"""
+        queue = get_processor(job.type).queue
+        if self.queues[queue] >= self.queue_limits[queue]:
+            return WAIT_QUEUE_FULL
+        if self.users[job.created_by_id] >= self.max_per_user:
+            return WAIT_USER_LIMIT
+        if self.projects[job.project_id] >= self.max_per_project:
+            return WAIT_PROJECT_LIMIT
+        return None
+
+    def take(self, job):
+        self.users[job.created_by_id] += 1
+        self.projects[job.project_id] += 1
+        self.queues[get_processor(job.type).queue] += 1
+
+    def is_full(self):
+        return all(self.queues[queue] >= limit for queue, limit in self.queue_limits.items())
+
+
+def schedule(now=None):
+    """
+    Release as many pending jobs as capacity allows, in priority/fair-share order.
+
+    Only one pass runs at a time; a call made while another pass holds the
+    lock asks that pass to run again instead of waiting. Returns the number
+    of jobs released by this call.
+    """
+    if not cache.add(LOCK_KEY, 1, timeout=LOCK_TIMEOUT):
+        cache.set(RERUN_KEY, 1, timeout=LOCK_TIMEOUT)
+        return 0
+    released = 0
+    try:
+        while True:
+            released += _schedule_pass(now or timezone.now())
+            if not cache.delete(RERUN_KEY):
+                break
+    finally:
+        cache.delete(LOCK_KEY)
+    return released
+
+
+def _schedule_pass(now):
+    capacity = Capacity.load(now)
+    if capacity.is_full():
+        return 0
+
+    scan_limit = getattr(settings, 'SCHEDULER_SCAN_LIMIT', 1000)
+    candidates = pending_jobs().only(
+        'id', 'type', 'project_id', 'created_by_id', 'schedule_key'
+    )[:scan_limit]
+    selected = []
+    for job in candidates:
+        if capacity.blocked_by(job) is None:
+            capacity.take(job)
+            selected.append(job)
+            if capacity.is_full():
+                break
+    if not selected:
+        return 0
+
+    with transaction.atomic():
+        Job.objects.filter(
+            pk__in=[job.pk for job in selected],
+            status=JobStatus.PENDING,
+            dispatched_at__isnull=True,
+        ).update(dispatched_at=now)
+        cache.set(VTIME_KEY, max(job.schedule_key for job in selected), timeout=None)
+        # Imported here: core.tasks imports this module
+        from .tasks import dispatch_jobs
+        transaction.on_commit(lambda: dispatch_jobs(selected))
+    return len(selected)
+
+
+def queue_info(job):
+    """
+    Scheduling state of a job for the API.
+
+    ``position`` counts jobs on the same processor queue that will be
+    released before this one. ``wait_reason`` says why the job has not
+    been released yet: queue capacity, user or project concurrency limit,
+    or waiting for its turn. Both are None once the job has been released.
+    """
+    info = {
+        'priority': job.priority,
+        'schedule_key': job.schedule_key,
+        'dispatched_at': job.dispatched_at,
+        'position': None,
+        'wait_reason': None,
+    }
+    if job.status != JobStatus.PENDING or job.dispatched_at or job.schedule_key is None:
+        return info
+
+    queue = get_processor(job.type).queue
+    queue_types = [spec.job_type for spec in registered_processors() if spec.queue == queue]
+    ahead = pending_jobs().filter(
+        Q(priority__gt=job.priority)
+        | Q(priority=job.priority, schedule_key__lt=job.schedule_key)
+        | Q(priority=job.priority, schedule_key=job.schedule_key, id__lt=job.id)
+    )
+    if None not in queue_types:
+        ahead = ahead.filter(type__in=queue_types)
+    info['position'] = ahead.count()
+    info['wait_reason'] = Capacity.load().blocked_by(job) or WAIT_SCHEDULING
+    return info
@@ -1,8 +1,11 @@
 from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
-from .models import Project, Job, JobResult, Profile, Settings
+from django.db.models import Count
+from .models import Project, Job, JobResult, Profile, Settings, JobStatus
+from .fieldsets import SparseFieldsSerializerMixin
 
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
@@ -99,7 +102,36 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class ProjectSerializer(serializers.ModelSerializer):
+class ProjectSummarySerializer(serializers.ModelSerializer):
+    """Compact read-only project (nested in jobs with ?expand=project)"""
+    class Meta:
+        model = Project
+        fields = ['id', 'name', 'owner_id', 'created_at']
+        read_only_fields = fields
+
+
+def attach_job_counts(projects):
+    """
+    Set ``job_counts`` ({status: count}) on each project with one grouped query.
+    
+    Used per page of projects so listings never load job rows.
+    """
+    projects = list(projects)
+    counts = {project.pk: dict.fromkeys(JobStatus.values, 0) for project in projects}
+    rows = (
+        Job.objects.filter(project_id__in=counts)
+        .order_by()
+        .values_list('project_id', 'status')
+        .annotate(total=Count('id'))
+    )
+    for project_id, status, total in rows:
+        counts[project_id][status] = total
+    for project in projects:
+        project.job_counts = counts[project.pk]
+    return projects
+
+
+class ProjectSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for Project model.
     Includes nested owner information for better API responses.
@@ -112,6 +144,7 @@ class ProjectSerializer(serializers.ModelSerializer):
         help_text="ID of the project owner"
     )
     jobs_count = serializers.SerializerMethodField(help_text="Number of jobs in this project")
+    jobs_by_status = serializers.SerializerMethodField(help_text="Number of jobs in this project per status")
     
     class Meta:
         model = Project
@@ -122,19 +155,31 @@ class ProjectSerializer(serializers.ModelSerializer):
             'owner',
             'owner_id',
             'created_at',
-            'jobs_count'
+            'jobs_count',
+            'jobs_by_status'
         ]
         read_only_fields = ['id', 'created_at']
     
+    def job_counts(self, obj):
+        """Per-status counts attached by attach_job_counts(), computed here when missing"""
+        if not hasattr(obj, 'job_counts'):
+            attach_job_counts([obj])
+        return obj.job_counts
+    
     def get_jobs_count(self, obj):
         """Return the count of jobs associated with this project"""
-        return obj.jobs.count()
+        return sum(self.job_counts(obj).values())
+    
+    def get_jobs_by_status(self, obj):
+        """Return the count of jobs associated with this project per status"""
+        return self.job_counts(obj)
 
 
-class JobSerializer(serializers.ModelSerializer):
+class JobSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for Job model.
     Includes nested project and created_by information.
+    Supports ?fields= and ?expand=project (see core/fieldsets.py).
     """
     project = serializers.StringRelatedField(read_only=True)
     project_id = serializers.PrimaryKeyRelatedField(
@@ -151,6 +196,7 @@ class JobSerializer(serializers.ModelSerializer):
         help_text="ID of the user creating the job"
     )
     has_result = serializers.SerializerMethodField(help_text="Whether this job has a result")
+    expandable_fields = {'project': lambda: ProjectSummarySerializer(read_only=True)}
     
     class Meta:
         model = Job
@@ -172,7 +218,9 @@ class JobSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
     
     def get_has_result(self, obj):
-        """Check if job has an associated result"""
+        """Check if job has an associated result (annotated as result_exists by JobViewSet)"""
+        if hasattr(obj, 'result_exists'):
+            return obj.result_exists
         return hasattr(obj, 'result')
     
     def validate_progress(self, value):
@@ -182,10 +230,73 @@ class JobSerializer(serializers.ModelSerializer):
         return value
 
 
-class JobResultSerializer(serializers.ModelSerializer):
+class BulkJobItemSerializer(serializers.ModelSerializer):
+    """
+    Serializer for one job spec in a bulk submission.
+    The project ID is a plain integer here; BulkJobSerializer resolves the
+    project IDs of the whole batch with one query instead of per item. Jobs
+    are always created by the requesting user, as in single creation.
+    """
+    project_id = serializers.IntegerField(help_text="ID of the parent project")
+    
+    class Meta:
+        model = Job
+        fields = ['project_id', 'type', 'input_url', 'meta']
+
+
+class BulkJobSerializer(serializers.Serializer):
+    """
+    Serializer for POST /api/jobs/bulk/.
+    Validates every job spec, collecting per-item errors instead of failing
+    the whole batch. Valid specs are available as ``valid_items`` (index,
+    data) pairs and invalid ones as ``item_errors`` (index, errors) pairs
+    after is_valid().
+    """
+    jobs = serializers.ListField(
+        allow_empty=False,
+        help_text="Job specs to create"
+    )
+    
+    def validate_jobs(self, value):
+        """Limit the batch size"""
+        limit = getattr(settings, 'JOB_BULK_MAX_ITEMS', 10000)
+        if len(value) > limit:
+            raise serializers.ValidationError(f"At most {limit} jobs can be submitted at once")
+        return value
+    
+    def validate(self, data):
+        """Validate each spec and resolve project IDs in one query"""
+        self.valid_items = []
+        self.item_errors = []
+    
+        # One child serializer validates every spec, so its fields are built once
+        child = BulkJobItemSerializer()
+        candidates = []
+        for index, spec in enumerate(data['jobs']):
+            try:
+                candidates.append((index, child.run_validation(spec)))
+            except serializers.ValidationError as exc:
+                self.item_errors.append((index, exc.detail))
+    
+        project_ids = {item['project_id'] for _, item in candidates}
+        projects = set(Project.objects.filter(id__in=project_ids).values_list('id', flat=True))
+    
+        for index, item in candidates:
+            if item['project_id'] not in projects:
+                errors = {'project_id': [f'Invalid pk "{item["project_id"]}" - object does not exist.']}
+                self.item_errors.append((index, errors))
+            else:
+                self.valid_items.append((index, item))
+    
+        self.item_errors.sort(key=lambda pair: pair[0])
+        return data
+
+
+class JobResultSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for JobResult model.
     Includes nested job information.
+    Supports ?fields= and ?expand=job (see core/fieldsets.py).
     """
     job = serializers.StringRelatedField(read_only=True)
     job_id = serializers.PrimaryKeyRelatedField(
@@ -198,6 +309,7 @@ class JobResultSerializer(serializers.ModelSerializer):
     job_status = serializers.SerializerMethodField(help_text="Status of the associated job")
     
     result_file_url = serializers.SerializerMethodField(help_text="URL to download result file")
+    expandable_fields = {'job': lambda: JobSerializer(read_only=True)}
     
     class Meta:
         model = JobResult
@@ -234,7 +346,7 @@ class JobResultSerializer(serializers.ModelSerializer):
         return obj.job.status if obj.job else None
 
 
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for Profile model.
     Includes nested user information.
@@ -260,7 +372,7 @@ class ProfileSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
-class SettingsSerializer(serializers.ModelSerializer):
+class SettingsSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for Settings model.
     Supports both global and user-specific settings.
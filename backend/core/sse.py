@@ -0,0 +1,231 @@
+"""
+Server-Sent Events streams of job events.
+
+For scripts and thin clients that only need one-way updates:
+- GET /api/jobs/<id>/events/ streams the events of one job
+- GET /api/jobs/events/ streams the events of every job the user created
+
+Both are async views served by the ASGI app. They read from the same
+channel-layer groups as the WebSocket consumers (``job_{id}`` and
+``user_{id}_jobs``). Each message is sent as
+
+    id: <event_id>
+    event: <job_progress|job_status_change|job_update|job_log>
+    data: <JSON, the same fields as the WebSocket frames>
+
+A reconnecting EventSource sends ``Last-Event-ID``; a client may also pass
+``?last_event_id=``. Missed events are replayed from the buffers in
+core/event_replay.py before the stream goes live. If the buffers may have
+lost some of them, a ``replay_truncated`` event is sent.
+
+Authentication uses the JWT access token from an ``Authorization: Bearer``
+header or ``?token=`` (EventSource cannot set headers), resolved through
+the same user cache as WebSocket connections.
+
+Streams do not get their own channel-layer channel. StreamHub joins each
+group once per process and fans its events out to the local queues of the
+streams reading it. A stream therefore only holds a bounded queue, its
+group names and the last replayed event ID. Thousands of streams on the
+same groups cost one layer subscription per group, and group_send does not
+grow with the number of streams. Comments are sent every
+settings.SSE_KEEPALIVE_INTERVAL seconds to keep proxies from timing out
+idle streams.
+
+See ``python manage.py sse_benchmark`` for a load test with thousands of
+streams in one process.
+"""
+
+import asyncio
+import json
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db.models import Q
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from .events import job_group, user_group, client_message
+from .middleware import authenticate_token
+from .models import Job
+from . import event_replay, presence
+
+
+# Reconnect delay suggested to EventSource clients, in milliseconds
+RETRY_MS = 3000
+# Events buffered per stream; a stream this far behind drops new events
+STREAM_QUEUE_SIZE = 100
+# Hub channels re-join their group this often, so the membership never expires
+GROUP_REFRESH_INTERVAL = 3600
+
+
+class StreamHub:
+    """
+    Per-process fan-out of channel-layer groups to SSE streams.
+
+    The first stream subscribing to a group starts a reader task that joins
+    the group with one channel; the last one leaving stops it.
+    """
+
+    def __init__(self, layer=None):
+        self._layer = layer
+        self._loop = None
+        self._groups = {}
+
+    @property
+    def layer(self):
+        return self._layer if self._layer is not None else get_channel_layer()
+
+    async def subscribe(self, group, queue):
+        """Deliver the group's events to ``queue`` once the group has been joined"""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Readers are tied to the loop that started them
+            self._loop, self._groups = loop, {}
+        entry = self._groups.get(group)
+        if entry is None:
+            entry = self._groups[group] = {'queues': set(), 'ready': asyncio.Event()}
+            entry['task'] = asyncio.ensure_future(self._read(group, entry))
+        entry['queues'].add(queue)
+        await entry['ready'].wait()
+        if entry.get('error') is not None:
+            # The reader could not join the group; _read() dropped the entry
+            entry['queues'].discard(queue)
+            raise entry['error']
+
+    async def unsubscribe(self, group, queue):
+        entry = self._groups.get(group)
+        if entry is None:
+            return
+        entry['queues'].discard(queue)
+        if not entry['queues']:
+            del self._groups[group]
+            entry['task'].cancel()
+            await asyncio.gather(entry['task'], return_exceptions=True)
+
+    async def _read(self, group, entry):
+        layer = self.layer
+        try:
+            channel = await layer.new_channel()
+            await layer.group_add(group, channel)
+            await presence.tracker.join(group, channel)
+        except Exception as exc:
+            # Fail the waiting subscribers instead of leaving them waiting forever
+            entry['error'] = exc
+            if self._groups.get(group) is entry:
+                del self._groups[group]
+            return
+        finally:
+            entry['ready'].set()
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(layer.receive(channel), timeout=GROUP_REFRESH_INTERVAL)
+                except asyncio.TimeoutError:
+                    await layer.group_add(group, channel)
+                    continue
+                for queue in list(entry['queues']):
+                    try:
+                        queue.put_nowait(message)
+                    except asyncio.QueueFull:
+                        pass
+        finally:
+            await layer.group_discard(group, channel)
+            await presence.tracker.leave(group, channel)
+
+
+stream_hub = StreamHub()
+
+
+def request_token(request):
+    """Raw JWT from the Authorization header or the ``token`` query parameter"""
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Bearer '):
+        return header[len('Bearer '):]
+    return request.GET.get('token')
+
+
+def last_event_id(request):
+    """Resume point from the Last-Event-ID header or ``?last_event_id=``, or None"""
+    value = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+def format_event(event):
+    """Serialize a channel-layer job event as an SSE message"""
+    message = client_message(event)
+    lines = []
+    if message['event_id'] is not None:
+        lines.append(f"id: {message['event_id']}")
+    lines.append(f"event: {message['type']}")
+    lines.append(f'data: {json.dumps(message)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+async def event_stream(groups, after=None, hub=None, keepalive=None):
+    """Yield SSE messages for the groups, replaying events newer than ``after`` first"""
+    hub = hub or stream_hub
+    keepalive = keepalive or getattr(settings, 'SSE_KEEPALIVE_INTERVAL', 15)
+    queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+    try:
+        # Inside the try: if joining one group fails, the others are left again
+        for group in groups:
+            await hub.subscribe(group, queue)
+        yield f'retry: {RETRY_MS}\n\n'
+        replayed_up_to = None
+        if after is not None:
+            events, truncated = await sync_to_async(event_replay.read)(groups, after)
+            if truncated:
+                yield 'event: replay_truncated\ndata: {}\n\n'
+            for event in events:
+                yield format_event(event)
+            replayed_up_to = events[-1]['event_id'] if events else after
+
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            event_id = event.get('event_id')
+            if replayed_up_to is not None and event_id is not None and event_id <= replayed_up_to:
+                # Already sent from the replay buffer
+                continue
+            yield format_event(event)
+    finally:
+        for group in groups:
+            await hub.unsubscribe(group, queue)
+
+
+def stream_response(groups, request):
+    response = StreamingHttpResponse(
+        event_stream(groups, last_event_id(request)), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Tell nginx not to buffer the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@require_GET
+async def job_events(request, job_id):
+    """Stream the events of one job the user can access"""
+    user, _ = await authenticate_token(request_token(request))
+    if not user.is_authenticated:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+    jobs = Job.objects.filter(pk=job_id)
+    if not user.is_superuser:
+        jobs = jobs.filter(Q(project__owner=user) | Q(created_by=user))
+    if not await jobs.aexists():
+        return JsonResponse({'detail': 'Not found.'}, status=404)
+    return stream_response([job_group(job_id)], request)
+
+
+@require_GET
+async def user_job_events(request):
+    """Stream the events of every job the user created"""
+    user, _ = await authenticate_token(request_token(request))
+    if not user.is_authenticated:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+    return stream_response([user_group(user.id)], request)
@@ -8,86 +8,45 @@ This module contains background tasks that:
 """
 
 import time
-import json
 from datetime import datetime
-from celery import shared_task
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+from celery import shared_task, chord, group
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
 from django.utils import timezone
 from .models import Job, JobResult, JobStatus, JobType
+from .events import send_job_update
+from .progress import ProgressReporter
+from .job_logs import JobLog
+from . import result_cache, scheduler, cancellation, job_stats
+from .cancellation import JobCancelled
+from .processors import register_processor, get_processor
+from .audio import (
+    LEVEL_WINDOW_SECONDS, fixed_segments, read_wav_levels, detect_silences,
+    speech_runs, plan_chunks, merge_transcripts, wav_duration,
+)
 
 
-channel_layer = get_channel_layer()
+def dispatch_jobs(jobs):
+    """
+    Enqueue process_job for many jobs over a single broker connection.
 
+    Each job is still routed to the queue registered for its type; the
+    producer is acquired once instead of once per message.
 
-def send_job_update(job_id, update_type='job_update', **kwargs):
-    """
-    Helper function to send job updates via WebSocket.
-    
     Args:
-        job_id: ID of the job
-        update_type: Type of update (job_update, job_progress, job_status_change)
-        **kwargs: Additional data to include in the update
+        jobs: Iterable of Job instances to dispatch
     """
-    if not channel_layer:
-        return
-    
-    # Get job data
-    try:
-        job = Job.objects.select_related('project', 'created_by').get(id=job_id)
-        job_data = {
-            'id': job.id,
-            'type': job.type,
-            'status': job.status,
-            'progress': job.progress,
-            'input_url': job.input_url,
-            'project_id': job.project.id,
-            'project_name': job.project.name,
-            'created_by_id': job.created_by.id,
-            'created_by_username': job.created_by.username,
-            'created_at': job.created_at.isoformat() if job.created_at else None,
-        }
-    except Job.DoesNotExist:
-        job_data = {'id': job_id, 'error': 'Job not found'}
-    
-    # Prepare message
-    message = {
-        'type': update_type,
-        'job_id': job_id,
-        'job': job_data,
-        'timestamp': datetime.now().isoformat(),
-        **kwargs
-    }
-    
-    # Send to job-specific channel
-    job_group = f'job_{job_id}'
-    async_to_sync(channel_layer.group_send)(
-        job_group,
-        {
-            'type': update_type,
-            'job': job_data,
-            'job_id': job_id,
-            'timestamp': datetime.now().isoformat(),
-            **kwargs
-        }
-    )
-    
-    # Send to user's jobs channel
-    try:
-        job = Job.objects.get(id=job_id)
-        user_group = f'user_{job.created_by.id}_jobs'
-        async_to_sync(channel_layer.group_send)(
-            user_group,
-            {
-                'type': update_type,
-                'job': job_data,
-                'job_id': job_id,
-                'timestamp': datetime.now().isoformat(),
-                **kwargs
-            }
-        )
-    except Job.DoesNotExist:
-        pass
+    with process_job.app.producer_or_acquire() as producer:
+        return [
+            process_job.apply_async(
+                args=[job.id],
+                task_id=cancellation.task_id_for(job.id),
+                producer=producer,
+                **get_processor(job.type).task_options()
+            )
+            for job in jobs
+        ]
 
 
 @shared_task(bind=True, max_retries=3)
@@ -106,46 +65,73 @@ def process_job(self, job_id):
         job_id: ID of the job to process
     """
     try:
-        # Get the job
-        job = Job.objects.select_for_update().get(id=job_id)
-        
-        # Check if job is already processed
-        if job.status in [JobStatus.COMPLETED, JobStatus.FAILED, JobStatus.CANCELLED]:
-            return f"Job {job_id} already in final state: {job.status}"
-        
-        # Update status to RUNNING
-        previous_status = job.status
-        job.status = JobStatus.RUNNING
-        job.save(update_fields=['status'])
+        # The row lock makes reading the status and moving to RUNNING one
+        # step, so a concurrent cancel either wins or sees RUNNING
+        with transaction.atomic():
+            job = Job.objects.select_for_update(of=('self',)).select_related(
+                'project', 'created_by'
+            ).get(id=job_id)
+            
+            # Check if job is already processed (or was cancelled meanwhile)
+            if job.status in [JobStatus.COMPLETED, JobStatus.FAILED, JobStatus.CANCELLED]:
+                return f"Job {job_id} already in final state: {job.status}"
+            
+            previous_status = job.status
+            Job.objects.filter(pk=job.pk).update(status=JobStatus.RUNNING)
+            job.status = JobStatus.RUNNING
+            job_stats.record_status_change(job, previous_status)
         
         # Send status change update
         send_job_update(
-            job_id,
+            job,
             'job_status_change',
             status=JobStatus.RUNNING,
             previous_status=previous_status
         )
         
-        # Process job based on type - matches client requirements
-        if job.type == JobType.STT:
-            result = process_stt_job(job)
-        elif job.type == JobType.TTS:
-            result = process_tts_job(job)
-        elif job.type == JobType.VOICE_CLONING:
-            result = process_voice_cloning_job(job)
-        elif job.type == JobType.DUBBING:
-            result = process_dubbing_job(job)
-        elif job.type == JobType.AI_STORIES:
-            result = process_ai_stories_job(job)
-        else:
-            result = process_generic_job(job)
+        reporter = ProgressReporter(job)
+        
+        # Identical inputs already processed: complete from the result cache
+        cached = result_cache.lookup(job)
+        if cached is not None:
+            # The source job's log describes that job, so it is not copied
+            source = cached['source_job_id'] or 'deleted'
+            logs = JobLog(job)
+            logs.append(f"Result served from cache (source job {source}, key {cached['cache_key'][:12]})")
+            cached['logs'] = logs.close()
+            return finish_job(job, reporter, cached)
+        
+        # Process job with the handler registered for its type
+        result = get_processor(job.type).handler(job, reporter)
+        
+        # Processors that fan out to sub-tasks complete the job themselves
+        if result.get('deferred'):
+            return f"Job {job_id} dispatched: {result['deferred']}"
         
         # Update job with result
-        if result['success']:
-            job.status = JobStatus.COMPLETED
-            job.progress = 100
-            job.save(update_fields=['status', 'progress'])
+        return finish_job(job, reporter, result)
             
+    except Job.DoesNotExist:
+        return f"Job {job_id} not found"
+    except JobCancelled:
+        # The processor stopped at a progress step after cancel_job
+        return f"Job {job_id} cancelled"
+    except Exception as exc:
+        # Retry on failure
+        raise self.retry(exc=exc, countdown=60)
+
+
+def finish_job(job, reporter, result):
+    """
+    Store a processor result and move the job to its terminal state.
+    
+    Args:
+        job: Job instance being processed
+        reporter: ProgressReporter for the job
+        result: Processor result dict (success, result_url, logs, meta, error)
+    """
+    if result['success']:
+        with transaction.atomic():
             # Create JobResult
             JobResult.objects.update_or_create(
                 job=job,
@@ -158,68 +144,69 @@ def process_job(self, job_id):
                 }
             )
             
-            # Send final update
-            send_job_update(
-                job_id,
-                'job_progress',
-                progress=100,
-                status=JobStatus.COMPLETED
-            )
-            
-            return f"Job {job_id} completed successfully"
-        else:
-            # Job failed
-            job.status = JobStatus.FAILED
-            job.save(update_fields=['status'])
+            # Persist final status/progress and send final update. A job
+            # cancelled while processing stays CANCELLED and its result is discarded.
+            if not reporter.finish(JobStatus.COMPLETED):
+                transaction.set_rollback(True)
+                return f"Job {job.id} was cancelled, result discarded"
             
-            send_job_update(
-                job_id,
-                'job_status_change',
-                status=JobStatus.FAILED,
-                previous_status=JobStatus.RUNNING,
-                error=result.get('error', 'Unknown error')
-            )
-            
-            return f"Job {job_id} failed: {result.get('error', 'Unknown error')}"
-            
-    except Job.DoesNotExist:
-        return f"Job {job_id} not found"
-    except Exception as exc:
-        # Retry on failure
-        raise self.retry(exc=exc, countdown=60)
+            # Make the result reusable for identical resubmissions
+            result_cache.store(job, result)
+        
+        # The job's scheduler capacity is free again: release waiting jobs
+        scheduler.schedule()
+        
+        return f"Job {job.id} completed successfully"
+    else:
+        # Job failed
+        reporter.finish(JobStatus.FAILED, error=result.get('error', 'Unknown error'))
+        scheduler.schedule()
+        
+        return f"Job {job.id} failed: {result.get('error', 'Unknown error')}"
 
 
-def process_stt_job(job):
+@register_processor(
+    JobType.STT, queue='jobs.stt',
+    soft_time_limit=1500, time_limit=1800, max_concurrency=4, prefetch_multiplier=2,
+)
+def process_stt_job(job, reporter):
     """
     Process a Speech-to-Text (STT) job.
     Converts audio input to text transcription.
+    
+    Long WAV inputs are transcribed in chunks in parallel (see
+    process_chunked_stt_job); everything else runs serially here.
     """
-    logs = []
-    logs.append(f"[{datetime.now().isoformat()}] Starting STT processing for job {job.id}")
+    if _use_chunked_stt(job):
+        return process_chunked_stt_job(job, reporter)
+    
+    logs = JobLog(job)
+    logs.append(f"Starting STT processing for job {job.id}")
     
     # Simulate STT processing with progress updates
     for progress in range(0, 101, 20):
-        job.progress = progress
-        job.save(update_fields=['progress'])
-        send_job_update(job.id, 'job_progress', progress=progress, status=JobStatus.RUNNING)
-        
         if progress == 20:
-            logs.append(f"[{datetime.now().isoformat()}] Audio file loaded and analyzed")
+            reporter.stage(progress, 'Audio file loaded and analyzed')
+            logs.append("Audio file loaded and analyzed")
         elif progress == 40:
-            logs.append(f"[{datetime.now().isoformat()}] Speech recognition in progress")
+            reporter.stage(progress, 'Speech recognition in progress')
+            logs.append("Speech recognition in progress")
         elif progress == 60:
-            logs.append(f"[{datetime.now().isoformat()}] Transcribing audio segments")
+            reporter.stage(progress, 'Transcribing audio segments')
+            logs.append("Transcribing audio segments")
         elif progress == 80:
-            logs.append(f"[{datetime.now().isoformat()}] Post-processing transcription")
+            reporter.stage(progress, 'Post-processing transcription')
+            logs.append("Post-processing transcription")
         
+        reporter.update(progress)
         time.sleep(0.4)  # Simulate work
     
-    logs.append(f"[{datetime.now().isoformat()}] STT processing completed successfully")
+    logs.append("STT processing completed successfully")
     
     return {
         'success': True,
         'result_url': f'https://example.com/results/{job.id}/transcription.txt',
-        'logs': '\n'.join(logs),
+        'logs': logs.close(),
         'meta': {
             'language': 'en',
             'duration_seconds': 120,
@@ -229,39 +216,187 @@ def process_stt_job(job):
     }
 
 
-def process_tts_job(job):
+def _use_chunked_stt(job):
+    """
+    Chunked mode is used when job.meta['stt_mode'] is 'chunked', or by default
+    for WAV inputs longer than settings.STT_CHUNKED_MIN_SECONDS.
+    """
+    mode = (job.meta or {}).get('stt_mode', 'auto')
+    if mode == 'serial' or not job.input_file:
+        return False
+    duration = wav_duration(job.input_file.path)
+    if duration is None:
+        return False
+    return mode == 'chunked' or duration >= settings.STT_CHUNKED_MIN_SECONDS
+
+
+def transcribe_audio(path, start, end):
+    """
+    Transcribe [start, end) seconds of a WAV file.
+    
+    Simulated recognizer: every contiguous run of speech becomes one
+    segment. Timestamps are relative to ``start``.
+    """
+    _, levels = read_wav_levels(path, LEVEL_WINDOW_SECONDS, start, end)
+    return [
+        {
+            'start': round(run_start, 3),
+            'end': round(run_end, 3),
+            'text': f'<speech {start + run_start:.2f}-{start + run_end:.2f}>',
+        }
+        for run_start, run_end in speech_runs(levels, LEVEL_WINDOW_SECONDS)
+    ]
+
+
+# Progress range covered by parallel STT chunk transcription
+STT_CHUNKS_START = 10
+STT_CHUNKS_END = 90
+
+
+def process_chunked_stt_job(job, reporter):
+    """
+    Transcribe a long recording as overlapping chunks in parallel.
+    
+    The audio is split at silence into chunks of about
+    job.meta['chunk_seconds'] (default settings.STT_CHUNK_SECONDS) that
+    overlap by job.meta['chunk_overlap_seconds'] (default
+    settings.STT_CHUNK_OVERLAP_SECONDS). Chunks are spread across
+    job.meta['parallelism'] (default settings.STT_PARALLELISM) sub-tasks,
+    and stt_merge joins the partial transcripts into one result.
+    """
+    meta = job.meta or {}
+    logs = JobLog(job)
+    logs.append(f"Starting chunked STT processing for job {job.id}")
+    
+    path = job.input_file.path
+    duration, levels = read_wav_levels(path, LEVEL_WINDOW_SECONDS)
+    silences = detect_silences(levels, LEVEL_WINDOW_SECONDS)
+    chunk_seconds = float(meta.get('chunk_seconds', settings.STT_CHUNK_SECONDS))
+    overlap = float(meta.get('chunk_overlap_seconds', settings.STT_CHUNK_OVERLAP_SECONDS))
+    parallelism = max(1, int(meta.get('parallelism', settings.STT_PARALLELISM)))
+    chunks = plan_chunks(duration, chunk_seconds, overlap, silences, resolution=LEVEL_WINDOW_SECONDS)
+    
+    reporter.stage(STT_CHUNKS_START, 'Audio file loaded and analyzed')
+    logs.append(
+        f"Split {duration:.1f}s of audio into {len(chunks)} chunks "
+        f"at {len(silences)} silence boundaries ({parallelism} parallel workers)"
+    )
+    # stt_merge continues the log after these lines
+    logs.flush()
+    
+    _start_fanout(job.id)
+    queue = get_processor(JobType.STT).queue
+    batches = [chunks[offset::parallelism] for offset in range(parallelism)]
+    chord(
+        group(
+            stt_transcribe_chunks.s(job.id, path, batch, len(chunks)).set(queue=queue)
+            for batch in batches if batch
+        ),
+        stt_merge.s(job.id, duration).set(queue=queue).on_error(
+            fanout_failed.si(job.id, 'One or more STT chunks failed').set(queue=queue)
+        ),
+    ).apply_async()
+    
+    return {'success': True, 'deferred': f'{len(chunks)} STT chunks'}
+
+
+@shared_task
+def stt_transcribe_chunks(job_id, path, chunks, total):
+    """
+    Transcribe a batch of chunks of a chunked STT job.
+    
+    Args:
+        chunks: list of (index, start, end, boundary) tuples from plan_chunks()
+        total: total number of chunks in the job, for progress
+    """
+    results = []
+    for index, start, end, boundary in chunks:
+        cancellation.check(job_id)
+        results.append({
+            'index': index,
+            'start': start,
+            'boundary': boundary,
+            'segments': transcribe_audio(path, start, end),
+        })
+        _report_fanout_progress(job_id, 1, total, STT_CHUNKS_START, STT_CHUNKS_END)
+    return results
+
+
+@shared_task
+def stt_merge(batch_results, job_id, duration):
+    """
+    Fan-in step for chunked STT: merge partial transcripts into one JobResult.
+    """
+    try:
+        job = Job.objects.select_related('project', 'created_by').get(id=job_id)
+    except Job.DoesNotExist:
+        return f"Job {job_id} not found"
+    cache.delete(_fanout_counter_key(job_id))
+    if job.status != JobStatus.RUNNING:
+        return f"Job {job_id} no longer running (status: {job.status})"
+    
+    reporter = ProgressReporter(job)
+    logs = JobLog(job)
+    chunk_results = [chunk for batch in batch_results for chunk in batch]
+    segments = merge_transcripts(chunk_results)
+    reporter.stage(STT_CHUNKS_END, 'Post-processing transcription')
+    logs.append(f"Merged {len(chunk_results)} chunks into {len(segments)} segments")
+    logs.append("STT processing completed successfully")
+    
+    return finish_job(job, reporter, {
+        'success': True,
+        'result_url': f'https://example.com/results/{job.id}/transcription.txt',
+        'logs': logs.close(),
+        'meta': {
+            'language': 'en',
+            'duration_seconds': round(duration, 3),
+            'chunks': len(chunk_results),
+            'segment_count': len(segments),
+            'segments': segments,
+            'transcript': ' '.join(segment['text'] for segment in segments),
+        }
+    })
+
+
+@register_processor(
+    JobType.TTS, queue='jobs.tts',
+    soft_time_limit=240, time_limit=300, max_concurrency=8, prefetch_multiplier=4,
+)
+def process_tts_job(job, reporter):
     """
     Process a Text-to-Speech (TTS) job.
     Converts text input to audio output.
     """
-    logs = []
-    logs.append(f"[{datetime.now().isoformat()}] Starting TTS processing for job {job.id}")
+    logs = JobLog(job)
+    logs.append(f"Starting TTS processing for job {job.id}")
     
     # Simulate TTS processing with progress updates
     for progress in range(0, 101, 15):
-        job.progress = progress
-        job.save(update_fields=['progress'])
-        send_job_update(job.id, 'job_progress', progress=progress, status=JobStatus.RUNNING)
-        
         if progress == 15:
-            logs.append(f"[{datetime.now().isoformat()}] Text input parsed and validated")
+            reporter.stage(progress, 'Text input parsed and validated')
+            logs.append("Text input parsed and validated")
         elif progress == 30:
-            logs.append(f"[{datetime.now().isoformat()}] Generating phonemes and prosody")
+            reporter.stage(progress, 'Generating phonemes and prosody')
+            logs.append("Generating phonemes and prosody")
         elif progress == 45:
-            logs.append(f"[{datetime.now().isoformat()}] Synthesizing audio waveform")
+            reporter.stage(progress, 'Synthesizing audio waveform')
+            logs.append("Synthesizing audio waveform")
         elif progress == 60:
-            logs.append(f"[{datetime.now().isoformat()}] Applying voice characteristics")
+            reporter.stage(progress, 'Applying voice characteristics')
+            logs.append("Applying voice characteristics")
         elif progress == 75:
-            logs.append(f"[{datetime.now().isoformat()}] Post-processing audio")
+            reporter.stage(progress, 'Post-processing audio')
+            logs.append("Post-processing audio")
         
+        reporter.update(progress)
         time.sleep(0.3)
     
-    logs.append(f"[{datetime.now().isoformat()}] TTS processing completed successfully")
+    logs.append("TTS processing completed successfully")
     
     return {
         'success': True,
         'result_url': f'https://example.com/results/{job.id}/output_audio.mp3',
-        'logs': '\n'.join(logs),
+        'logs': logs.close(),
         'meta': {
             'voice': 'en-US-Neural2-F',
             'format': 'MP3',
@@ -271,41 +406,48 @@ def process_tts_job(job):
     }
 
 
-def process_voice_cloning_job(job):
+@register_processor(
+    JobType.VOICE_CLONING, queue='jobs.voice_cloning',
+    soft_time_limit=1500, time_limit=1800, max_concurrency=2, prefetch_multiplier=1,
+)
+def process_voice_cloning_job(job, reporter):
     """
     Process a Voice Cloning job.
     Creates a voice model from reference audio and generates speech.
     """
-    logs = []
-    logs.append(f"[{datetime.now().isoformat()}] Starting Voice Cloning processing for job {job.id}")
+    logs = JobLog(job)
+    logs.append(f"Starting Voice Cloning processing for job {job.id}")
     
     # Simulate voice cloning processing
     for progress in range(0, 101, 10):
-        job.progress = progress
-        job.save(update_fields=['progress'])
-        send_job_update(job.id, 'job_progress', progress=progress, status=JobStatus.RUNNING)
-        
         if progress == 10:
-            logs.append(f"[{datetime.now().isoformat()}] Reference audio loaded and analyzed")
+            reporter.stage(progress, 'Reference audio loaded and analyzed')
+            logs.append("Reference audio loaded and analyzed")
         elif progress == 20:
-            logs.append(f"[{datetime.now().isoformat()}] Extracting voice characteristics")
+            reporter.stage(progress, 'Extracting voice characteristics')
+            logs.append("Extracting voice characteristics")
         elif progress == 30:
-            logs.append(f"[{datetime.now().isoformat()}] Building voice model")
+            reporter.stage(progress, 'Building voice model')
+            logs.append("Building voice model")
         elif progress == 50:
-            logs.append(f"[{datetime.now().isoformat()}] Training voice encoder")
+            reporter.stage(progress, 'Training voice encoder')
+            logs.append("Training voice encoder")
         elif progress == 70:
-            logs.append(f"[{datetime.now().isoformat()}] Generating cloned voice samples")
+            reporter.stage(progress, 'Generating cloned voice samples')
+            logs.append("Generating cloned voice samples")
         elif progress == 90:
-            logs.append(f"[{datetime.now().isoformat()}] Fine-tuning voice output")
+            reporter.stage(progress, 'Fine-tuning voice output')
+            logs.append("Fine-tuning voice output")
         
+        reporter.update(progress)
         time.sleep(0.5)
     
-    logs.append(f"[{datetime.now().isoformat()}] Voice cloning completed successfully")
+    logs.append("Voice cloning completed successfully")
     
     return {
         'success': True,
         'result_url': f'https://example.com/results/{job.id}/cloned_voice.mp3',
-        'logs': '\n'.join(logs),
+        'logs': logs.close(),
         'meta': {
             'model_id': f'voice_model_{job.id}',
             'similarity_score': 0.89,
@@ -315,88 +457,223 @@ def process_voice_cloning_job(job):
     }
 
 
-def process_dubbing_job(job):
+@register_processor(
+    JobType.DUBBING, queue='jobs.dubbing',
+    soft_time_limit=3300, time_limit=3600, max_concurrency=2, prefetch_multiplier=1,
+)
+def process_dubbing_job(job, reporter):
     """
     Process a Dubbing (AI Video Translation) job.
     Translates and dubs video content with synchronized audio.
+    
+    The video is analyzed and its audio track extracted here, then the
+    transcribe/translate/synthesize stages fan out across fixed-length
+    segments as a Celery chord (dub_segment), and dub_finalize reassembles
+    the segments in order, synchronizes and renders the final video.
+    Segment length comes from job.meta['segment_seconds'] (default
+    settings.DUBBING_SEGMENT_SECONDS).
+    """
+    logs = JobLog(job)
+    logs.append(f"Starting Dubbing processing for job {job.id}")
+    
+    # Simulate video analysis and audio extraction
+    reporter.stage(5, 'Video file loaded and analyzed')
+    logs.append("Video file loaded and analyzed")
+    time.sleep(0.4)
+    reporter.stage(DUBBING_SEGMENTS_START, 'Extracting audio track')
+    logs.append("Extracting audio track")
+    time.sleep(0.4)
+    
+    meta = job.meta or {}
+    duration = int(meta.get('duration_seconds', 180))
+    segment_seconds = int(meta.get('segment_seconds', settings.DUBBING_SEGMENT_SECONDS))
+    segments = fixed_segments(duration, segment_seconds)
+    logs.append(f"Split {duration}s of audio into {len(segments)} segments")
+    # dub_finalize continues the log after these lines
+    logs.flush()
+    
+    _start_fanout(job.id)
+    queue = get_processor(JobType.DUBBING).queue
+    chord(
+        group(
+            dub_segment.s(job.id, index, start, end, len(segments)).set(queue=queue)
+            for index, start, end in segments
+        ),
+        dub_finalize.s(job.id, duration).set(queue=queue).on_error(
+            fanout_failed.si(job.id, 'One or more dubbing segments failed').set(queue=queue)
+        ),
+    ).apply_async()
+    
+    return {'success': True, 'deferred': f'{len(segments)} dubbing segments'}
+
+
+# Progress range covered by the parallel segment stages
+DUBBING_SEGMENTS_START = 10
+DUBBING_SEGMENTS_END = 80
+
+
+def _fanout_counter_key(job_id):
+    return f'fanout_parts_done_{job_id}'
+
+
+def _start_fanout(job_id):
+    """Reset the finished-parts counter before dispatching a chord for a job"""
+    cache.set(_fanout_counter_key(job_id), 0, timeout=settings.CELERY_TASK_TIME_LIMIT * 2)
+
+
+def _report_fanout_progress(job_id, finished, total, start, end):
+    """
+    Record ``finished`` more parts of a fanned-out job as done and report
+    combined progress, scaled into the [start, end] progress range.
+    """
+    try:
+        done = cache.incr(_fanout_counter_key(job_id), finished)
+    except ValueError:
+        done = finished
+    progress = start + (end - start) * min(done, total) // total
+    
+    try:
+        job = Job.objects.select_related('project', 'created_by').get(id=job_id)
+    except Job.DoesNotExist:
+        return
+    if job.status == JobStatus.RUNNING:
+        # Parts finish out of order on different workers, so never move progress back
+        ProgressReporter(job, monotonic=True).update(progress)
+
+
+@shared_task
+def dub_segment(job_id, index, start, end, total):
+    """
+    Transcribe, translate and synthesize one segment of a dubbing job.
+    
+    Reports combined progress for the job as segments complete.
+    
+    Returns:
+        dict with the segment index, time range, and per-stage outputs
     """
     logs = []
-    logs.append(f"[{datetime.now().isoformat()}] Starting Dubbing processing for job {job.id}")
     
-    # Simulate dubbing processing
-    for progress in range(0, 101, 12):
-        job.progress = progress
-        job.save(update_fields=['progress'])
-        send_job_update(job.id, 'job_progress', progress=progress, status=JobStatus.RUNNING)
-        
-        if progress == 12:
-            logs.append(f"[{datetime.now().isoformat()}] Video file loaded and analyzed")
-        elif progress == 24:
-            logs.append(f"[{datetime.now().isoformat()}] Extracting audio track")
-        elif progress == 36:
-            logs.append(f"[{datetime.now().isoformat()}] Transcribing original audio (STT)")
-        elif progress == 48:
-            logs.append(f"[{datetime.now().isoformat()}] Translating transcript")
-        elif progress == 60:
-            logs.append(f"[{datetime.now().isoformat()}] Generating translated speech (TTS)")
-        elif progress == 72:
-            logs.append(f"[{datetime.now().isoformat()}] Synchronizing audio with video")
-        elif progress == 84:
-            logs.append(f"[{datetime.now().isoformat()}] Rendering final video")
-        
-        time.sleep(0.4)
+    # Simulate STT, translation and TTS for this segment
+    cancellation.check(job_id)
+    time.sleep(0.4)
+    logs.append(f"[{datetime.now().isoformat()}] Segment {index}: transcribed original audio ({start}s-{end}s)")
+    cancellation.check(job_id)
+    time.sleep(0.4)
+    logs.append(f"[{datetime.now().isoformat()}] Segment {index}: translated transcript")
+    cancellation.check(job_id)
+    time.sleep(0.4)
+    logs.append(f"[{datetime.now().isoformat()}] Segment {index}: generated translated speech")
     
-    logs.append(f"[{datetime.now().isoformat()}] Dubbing completed successfully")
+    _report_fanout_progress(job_id, 1, total, DUBBING_SEGMENTS_START, DUBBING_SEGMENTS_END)
     
     return {
+        'index': index,
+        'start': start,
+        'end': end,
+        'audio_url': f'https://example.com/results/{job_id}/segments/{index}.wav',
+        'logs': logs,
+    }
+
+
+@shared_task
+def dub_finalize(segment_results, job_id, duration):
+    """
+    Fan-in step for dubbing: reassemble segments in order and render the video.
+    """
+    try:
+        job = Job.objects.select_related('project', 'created_by').get(id=job_id)
+    except Job.DoesNotExist:
+        return f"Job {job_id} not found"
+    cache.delete(_fanout_counter_key(job_id))
+    if job.status != JobStatus.RUNNING:
+        return f"Job {job_id} no longer running (status: {job.status})"
+    
+    reporter = ProgressReporter(job)
+    logs = JobLog(job)
+    segments = sorted(segment_results, key=lambda segment: segment['index'])
+    for segment in segments:
+        logs.extend(segment['logs'])
+    
+    # Simulate synchronization and rendering of the reassembled track
+    reporter.stage(DUBBING_SEGMENTS_END, 'Synchronizing audio with video')
+    logs.append("Synchronizing audio with video")
+    time.sleep(0.4)
+    reporter.stage(90, 'Rendering final video')
+    logs.append("Rendering final video")
+    time.sleep(0.4)
+    
+    logs.append("Dubbing completed successfully")
+    
+    return finish_job(job, reporter, {
         'success': True,
         'result_url': f'https://example.com/results/{job.id}/dubbed_video.mp4',
-        'logs': '\n'.join(logs),
+        'logs': logs.close(),
         'meta': {
             'source_language': 'en',
             'target_language': 'es',
-            'video_duration_seconds': 180,
+            'video_duration_seconds': duration,
+            'segments': len(segments),
             'translation_accuracy': 0.94,
             'sync_quality': 'high'
         }
-    }
+    })
 
 
-def process_ai_stories_job(job):
+@shared_task
+def fanout_failed(job_id, error):
+    """Error callback for fanned-out jobs (dubbing, chunked STT): mark the job as failed"""
+    cache.delete(_fanout_counter_key(job_id))
+    try:
+        job = Job.objects.select_related('project', 'created_by').get(id=job_id)
+    except Job.DoesNotExist:
+        return f"Job {job_id} not found"
+    if job.status != JobStatus.RUNNING:
+        return f"Job {job_id} no longer running (status: {job.status})"
+    return finish_job(job, ProgressReporter(job), {'success': False, 'error': error})
+
+
+@register_processor(
+    JobType.AI_STORIES, queue='jobs.ai_stories',
+    soft_time_limit=3300, time_limit=3600, max_concurrency=2, prefetch_multiplier=1,
+)
+def process_ai_stories_job(job, reporter):
     """
     Process an AI Stories job.
     Generates animated talking heads or story content.
     """
-    logs = []
-    logs.append(f"[{datetime.now().isoformat()}] Starting AI Stories processing for job {job.id}")
+    logs = JobLog(job)
+    logs.append(f"Starting AI Stories processing for job {job.id}")
     
     # Simulate AI stories processing
     for progress in range(0, 101, 8):
-        job.progress = progress
-        job.save(update_fields=['progress'])
-        send_job_update(job.id, 'job_progress', progress=progress, status=JobStatus.RUNNING)
-        
         if progress == 8:
-            logs.append(f"[{datetime.now().isoformat()}] Story script loaded and parsed")
+            reporter.stage(progress, 'Story script loaded and parsed')
+            logs.append("Story script loaded and parsed")
         elif progress == 16:
-            logs.append(f"[{datetime.now().isoformat()}] Generating story structure")
+            reporter.stage(progress, 'Generating story structure')
+            logs.append("Generating story structure")
         elif progress == 32:
-            logs.append(f"[{datetime.now().isoformat()}] Creating character animations")
+            reporter.stage(progress, 'Creating character animations')
+            logs.append("Creating character animations")
         elif progress == 48:
-            logs.append(f"[{datetime.now().isoformat()}] Generating talking head animations")
+            reporter.stage(progress, 'Generating talking head animations')
+            logs.append("Generating talking head animations")
         elif progress == 64:
-            logs.append(f"[{datetime.now().isoformat()}] Synthesizing voice narration")
+            reporter.stage(progress, 'Synthesizing voice narration')
+            logs.append("Synthesizing voice narration")
         elif progress == 80:
-            logs.append(f"[{datetime.now().isoformat()}] Compositing final story video")
+            reporter.stage(progress, 'Compositing final story video')
+            logs.append("Compositing final story video")
         
+        reporter.update(progress)
         time.sleep(0.6)
     
-    logs.append(f"[{datetime.now().isoformat()}] AI Stories processing completed successfully")
+    logs.append("AI Stories processing completed successfully")
     
     return {
         'success': True,
         'result_url': f'https://example.com/results/{job.id}/story_video.mp4',
-        'logs': '\n'.join(logs),
+        'logs': logs.close(),
         'meta': {
             'story_length': 300,
             'characters': 2,
@@ -407,23 +684,22 @@ def process_ai_stories_job(job):
     }
 
 
-def process_generic_job(job):
+@register_processor(None)
+def process_generic_job(job, reporter):
     """Process a generic/unknown type job"""
-    logs = []
-    logs.append(f"[{datetime.now().isoformat()}] Processing generic job {job.id}")
+    logs = JobLog(job)
+    logs.append(f"Processing generic job {job.id}")
     
     for progress in range(0, 101, 10):
-        job.progress = progress
-        job.save(update_fields=['progress'])
-        send_job_update(job.id, 'job_progress', progress=progress, status=JobStatus.RUNNING)
+        reporter.update(progress)
         time.sleep(0.5)
     
-    logs.append(f"[{datetime.now().isoformat()}] Generic job processing completed")
+    logs.append("Generic job processing completed")
     
     return {
         'success': True,
         'result_url': f'https://example.com/results/{job.id}/output',
-        'logs': '\n'.join(logs),
+        'logs': logs.close(),
         'meta': {
             'processed': True
         }
@@ -441,14 +717,20 @@ def update_job_progress(job_id, progress, status=None):
         status: Optional status update
     """
     try:
-        job = Job.objects.get(id=job_id)
-        job.progress = max(0, min(100, progress))  # Clamp between 0-100
-        if status:
-            job.status = status
-        job.save(update_fields=['progress'] + (['status'] if status else []))
+        with transaction.atomic():
+            # Locked so the counters move from the status actually replaced
+            job = Job.objects.select_for_update(of=('self',)).select_related(
+                'project', 'created_by'
+            ).get(id=job_id)
+            previous_status = job.status
+            job.progress = max(0, min(100, progress))  # Clamp between 0-100
+            if status:
+                job.status = status
+            job.save(update_fields=['progress'] + (['status'] if status else []))
+            job_stats.record_status_change(job, previous_status)
         
         send_job_update(
-            job_id,
+            job,
             'job_progress',
             progress=job.progress,
             status=job.status
@@ -459,31 +741,51 @@ def update_job_progress(job_id, progress, status=None):
         return f"Job {job_id} not found"
 
 
+@shared_task
+def evict_result_cache():
+    """
+    Periodic task: drop expired and least recently used result cache entries.
+    """
+    deleted = result_cache.evict()
+    return f"Evicted {deleted} result cache entries"
+
+
+@shared_task
+def reconcile_job_stats():
+    """
+    Periodic task: repair job statistics counters that drifted from the jobs.
+    """
+    repaired = job_stats.reconcile()
+    return f"Repaired {repaired} job statistics rows"
+
+
+@shared_task
+def schedule_pending_jobs():
+    """
+    Periodic task: release pending jobs to Celery as scheduler capacity allows.
+    
+    Jobs are normally released when they are submitted or when another job
+    finishes; this catches anything those triggers missed.
+    """
+    released = scheduler.schedule()
+    return f"Released {released} pending jobs"
+
+
 @shared_task
 def cancel_job(job_id):
     """
-    Task to cancel a running job.
+    Task to cancel a pending or running job.
+    
+    Queued tasks are revoked and running processors stop at their next
+    progress step (see core/cancellation.py).
     
     Args:
         job_id: ID of the job to cancel
     """
     try:
-        job = Job.objects.get(id=job_id)
-        if job.status == JobStatus.RUNNING:
-            previous_status = job.status
-            job.status = JobStatus.CANCELLED
-            job.save(update_fields=['status'])
-            
-            send_job_update(
-                job_id,
-                'job_status_change',
-                status=JobStatus.CANCELLED,
-                previous_status=previous_status
-            )
-            
-            return f"Job {job_id} cancelled"
-        else:
-            return f"Job {job_id} cannot be cancelled (status: {job.status})"
+        job = Job.objects.select_related('project', 'created_by').get(id=job_id)
     except Job.DoesNotExist:
         return f"Job {job_id} not found"
-
+    if cancellation.cancel(job):
+        return f"Job {job_id} cancelled"
+    return f"Job {job_id} cannot be cancelled (status: {job.status})"
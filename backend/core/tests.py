@@ -5,12 +5,55 @@ Run tests with: pytest
 Run with coverage: pytest --cov=core
 """
 
+import os
 import pytest
 from django.contrib.auth.models import User
 from django.test import TestCase
 from rest_framework.test import APIClient
 from rest_framework import status
-from .models import Project, Job, JobResult, Profile, JobStatus, JobType, UserRole
+from .models import (
+    Project, Job, JobResult, Profile, JobStatus, JobType, UserRole, ResultCacheEntry, JobStats, StatsScope,
+)
+from .progress import ProgressReporter
+from .job_logs import JobLog
+from .middleware import JWTAuthMiddleware, UserCache
+from .events import JobEventPublisher
+from .processors import get_processor
+from . import tasks, result_cache, scheduler, cancellation, job_logs, event_replay, presence, ws_metrics, job_stats
+from .audio import fixed_segments, plan_chunks, read_wav_levels, detect_silences
+
+
+class RecordingChannelLayer:
+    """Channel layer stand-in that records group_send calls"""
+    
+    def __init__(self):
+        self.sent = []
+    
+    async def group_send(self, group, message):
+        self.sent.append((group, message))
+    
+    def messages_for(self, prefix):
+        """Messages sent to groups whose name starts with prefix"""
+        return [message for group, message in self.sent if group.startswith(prefix)]
+
+
+@pytest.fixture(autouse=True)
+def job_log_root(settings, tmp_path):
+    """Keep job log segments written by processors out of MEDIA_ROOT"""
+    settings.JOB_LOG_ROOT = str(tmp_path / 'job_logs')
+
+
+@pytest.fixture
+def eager_celery(monkeypatch):
+    """Run Celery tasks and chords inline and skip simulated work"""
+    monkeypatch.setattr(tasks.time, 'sleep', lambda seconds: None)
+    monkeypatch.setattr('core.events.channel_layer', RecordingChannelLayer())
+    conf = tasks.process_job.app.conf
+    previous = conf.task_always_eager
+    # Celery reads Django settings with the CELERY_ namespace
+    conf.update(CELERY_TASK_ALWAYS_EAGER=True)
+    yield
+    conf.update(CELERY_TASK_ALWAYS_EAGER=previous)
 
 
 @pytest.mark.django_db
@@ -252,3 +295,1878 @@ class TestPermissions:
         data = {'name': 'Viewer Project'}
         response = client.post('/api/projects/', data, format='json')
         assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.django_db
+class TestProgressReporter:
+    """Test throttled progress reporting"""
+    
+    @pytest.fixture
+    def job(self):
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        project = Project.objects.create(name='Test Project', owner=user)
+        return Job.objects.create(
+            project=project,
+            type=JobType.STT,
+            status=JobStatus.RUNNING,
+            created_by=user
+        )
+    
+    @pytest.fixture
+    def sent(self, monkeypatch):
+        """Capture job group broadcasts instead of sending them to the channel layer"""
+        layer = RecordingChannelLayer()
+        monkeypatch.setattr('core.events.channel_layer', layer)
+        return layer
+    
+    def test_update_throttled_by_delta_and_interval(self, job, sent):
+        """Small steps are skipped until delta or interval is reached"""
+        now = [0.0]
+        reporter = ProgressReporter(job, min_delta=10, min_interval=2.0, clock=lambda: now[0])
+        
+        assert reporter.update(5) is False
+        assert reporter.update(10) is True
+        now[0] = 1.0
+        assert reporter.update(15) is False
+        now[0] = 3.5
+        assert reporter.update(16) is True
+        
+        assert [event['progress'] for event in sent.messages_for('job_')] == [10, 16]
+        job.refresh_from_db()
+        assert job.progress == 16
+    
+    def test_stage_and_finish_always_emit(self, job, sent, django_capture_on_commit_callbacks):
+        """Stage boundaries and terminal states bypass the throttle"""
+        reporter = ProgressReporter(job, min_delta=50, min_interval=60, clock=lambda: 0.0)
+        reporter.stage(3, 'Loading')
+        with django_capture_on_commit_callbacks(execute=True):
+            reporter.finish(JobStatus.COMPLETED)
+        
+        assert [event['progress'] for event in sent.messages_for('job_')] == [3, 100]
+        job.refresh_from_db()
+        assert job.status == JobStatus.COMPLETED
+        assert job.progress == 100
+    
+    def test_completion_is_not_broadcast_when_rolled_back(self, job, sent, monkeypatch,
+                                                          django_capture_on_commit_callbacks):
+        """finish_job publishes COMPLETED only if its transaction commits"""
+        def fail(job, result):
+            raise RuntimeError('cache unavailable')
+        monkeypatch.setattr(result_cache, 'store', fail)
+        reporter = ProgressReporter(job, clock=lambda: 0.0)
+        
+        with django_capture_on_commit_callbacks(execute=True), pytest.raises(RuntimeError):
+            tasks.finish_job(job, reporter, {'success': True, 'result_url': 'https://example.com/out.txt'})
+        
+        assert sent.messages_for('job_') == []
+        job.refresh_from_db()
+        assert job.status == JobStatus.RUNNING
+    
+    def test_emit_is_single_write(self, job, sent, django_assert_num_queries):
+        """Each emit costs one UPDATE and no extra reads"""
+        reporter = ProgressReporter(job, min_delta=1, clock=lambda: 0.0)
+        with django_assert_num_queries(1):
+            reporter.update(50)
+
+
+@pytest.mark.django_db
+class TestJobEventPublisher:
+    """Test job event fan-out"""
+    
+    @pytest.fixture
+    def job(self):
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        project = Project.objects.create(name='Test Project', owner=user)
+        job = Job.objects.create(project=project, type=JobType.TTS, created_by=user)
+        return Job.objects.select_related('project', 'created_by').get(id=job.id)
+    
+    def test_publish_fans_out_without_queries(self, job, django_assert_num_queries):
+        """One event is built from the instance and sent to job, user and project groups"""
+        layer = RecordingChannelLayer()
+        publisher = JobEventPublisher(layer=layer)
+        with django_assert_num_queries(0):
+            publisher.publish(job, 'job_progress', progress=40)
+        
+        groups = [group for group, _ in layer.sent]
+        assert groups == [f'job_{job.id}', f'user_{job.created_by_id}_jobs', f'project_{job.project_id}_jobs']
+        first, second, third = (message for _, message in layer.sent)
+        assert first is second is third
+        assert first['job']['project_name'] == 'Test Project'
+        assert first['progress'] == 40
+    
+    def test_batch_flushes_on_exit(self, job):
+        """Events published inside batch() are sent together when the block exits"""
+        layer = RecordingChannelLayer()
+        publisher = JobEventPublisher(layer=layer)
+        with publisher.batch():
+            publisher.publish(job, 'job_progress', progress=10)
+            publisher.publish(job, 'job_progress', progress=20)
+            assert layer.sent == []
+        assert len(layer.sent) == 6
+
+
+@pytest.mark.django_db
+class TestProcessorRegistry:
+    """Test processor registry and queue routing"""
+    
+    def test_each_job_type_has_its_own_queue(self):
+        """Every JobType is registered with a dedicated queue and time limits"""
+        queues = set()
+        for job_type in JobType.values:
+            spec = get_processor(job_type)
+            assert spec.job_type == job_type
+            assert spec.time_limit and spec.soft_time_limit < spec.time_limit
+            queues.add(spec.queue)
+        assert len(queues) == len(JobType.values)
+        assert get_processor(JobType.TTS).handler is tasks.process_tts_job
+    
+    def test_unknown_type_uses_fallback(self):
+        """Unknown job types fall back to the generic processor"""
+        assert get_processor('unknown').handler is tasks.process_generic_job
+    
+    def test_create_routes_to_registered_queue(self, monkeypatch, django_capture_on_commit_callbacks):
+        """perform_create dispatches process_job to the job type's queue"""
+        calls = []
+        monkeypatch.setattr(tasks.process_job, 'apply_async', lambda **kwargs: calls.append(kwargs))
+        user = User.objects.create_user(username='editor', password='editor123')
+        Profile.objects.create(user=user, role=UserRole.EDITOR)
+        project = Project.objects.create(name='Test Project', owner=user)
+        client = APIClient()
+        client.force_authenticate(user=user)
+        
+        with django_capture_on_commit_callbacks(execute=True):
+            response = client.post('/api/jobs/', {
+                'project_id': project.id,
+                'created_by_id': user.id,
+                'type': JobType.DUBBING,
+            }, format='json')
+        
+        assert response.status_code == status.HTTP_201_CREATED
+        for call in calls:
+            call.pop('producer')
+        assert calls == [{
+            'args': [response.data['id']],
+            'task_id': f"process_job-{response.data['id']}",
+            'queue': 'jobs.dubbing',
+            'soft_time_limit': 3300,
+            'time_limit': 3600,
+        }]
+
+
+@pytest.mark.django_db
+class TestSegmentParallelDubbing:
+    """Test dubbing fan-out/fan-in over segments"""
+    
+    def test_fixed_segments_cover_duration(self):
+        """Segments are consecutive and the last one is truncated"""
+        assert fixed_segments(150, 60) == [(0, 0, 60), (1, 60, 120), (2, 120, 150)]
+        assert fixed_segments(0, 60) == []
+    
+    def test_dubbing_fans_out_and_reassembles(self, eager_celery):
+        """Each segment runs as a sub-task and the fan-in completes the job"""
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        project = Project.objects.create(name='Test Project', owner=user)
+        job = Job.objects.create(
+            project=project,
+            type=JobType.DUBBING,
+            created_by=user,
+            meta={'duration_seconds': 150, 'segment_seconds': 60}
+        )
+        
+        tasks.process_job.apply(args=[job.id])
+        
+        job.refresh_from_db()
+        assert job.status == JobStatus.COMPLETED
+        assert job.progress == 100
+        assert job.result.meta['segments'] == 3
+        logs = job.result.logs
+        assert logs.index('Segment 0:') < logs.index('Segment 1:') < logs.index('Segment 2:')
+
+
+def write_reference_clip(path, duration=30.0, rate=16000):
+    """Write a mono 16-bit WAV alternating tone bursts ("speech") and silence"""
+    import math
+    import struct
+    import wave
+    pattern = [(1.3, 0.5), (0.9, 0.7), (1.7, 0.4), (1.1, 0.9), (2.1, 0.6)]
+    frames = bytearray()
+    t = 0.0
+    step = 0
+    while t < duration:
+        speech, silence = pattern[step % len(pattern)]
+        for _ in range(int(speech * rate)):
+            frames += struct.pack('<h', int(12000 * math.sin(2 * math.pi * 220 * len(frames) / 2 / rate)))
+        frames += b'\x00\x00' * int(silence * rate)
+        t += speech + silence
+        step += 1
+    with wave.open(str(path), 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(bytes(frames[:int(duration * rate) * 2]))
+    return path
+
+
+@pytest.mark.django_db
+class TestChunkedSTT:
+    """Test chunked parallel STT"""
+    
+    def test_chunks_split_at_silence_with_overlap(self, tmp_path):
+        """Chunk boundaries fall inside silences and chunks overlap"""
+        path = write_reference_clip(tmp_path / 'clip.wav')
+        duration, levels = read_wav_levels(path)
+        silences = detect_silences(levels)
+        chunks = plan_chunks(duration, 5, 1.0, silences, resolution=0.05)
+        
+        assert len(chunks) > 4
+        for index, start, end, boundary in chunks[:-1]:
+            assert any(silence_start <= boundary <= silence_end for silence_start, silence_end in silences)
+            assert end == pytest.approx(boundary + 1.0)
+        assert chunks[-1][3] == duration
+    
+    def test_chunked_result_matches_serial_run(self, tmp_path, settings, eager_celery):
+        """Merged chunk transcripts equal a serial transcription of the clip"""
+        settings.MEDIA_ROOT = str(tmp_path)
+        path = write_reference_clip(tmp_path / 'clip.wav')
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        project = Project.objects.create(name='Test Project', owner=user)
+        job = Job.objects.create(
+            project=project,
+            type=JobType.STT,
+            created_by=user,
+            input_file='clip.wav',
+            meta={'stt_mode': 'chunked', 'chunk_seconds': 5, 'chunk_overlap_seconds': 1, 'parallelism': 3}
+        )
+        
+        tasks.process_job.apply(args=[job.id])
+        
+        job.refresh_from_db()
+        assert job.status == JobStatus.COMPLETED
+        duration, _ = read_wav_levels(path)
+        serial = tasks.transcribe_audio(str(path), 0, duration)
+        assert job.result.meta['chunks'] > 4
+        assert job.result.meta['segments'] == serial
+
+
+@pytest.mark.django_db
+class TestResultCache:
+    """Test content-addressed result cache"""
+    
+    @pytest.fixture(autouse=True)
+    def clear_counters(self):
+        from django.core.cache import cache
+        cache.delete_many([result_cache.HITS_KEY, result_cache.MISSES_KEY])
+    
+    @pytest.fixture
+    def project(self):
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        return Project.objects.create(name='Test Project', owner=user)
+    
+    def make_job(self, project, **meta):
+        return Job.objects.create(
+            project=project,
+            type=JobType.TTS,
+            created_by=project.owner,
+            input_url='https://example.com/script.txt',
+            meta={'voice': 'en-US', **meta}
+        )
+    
+    def test_resubmission_is_served_from_cache(self, project, eager_celery):
+        """An identical job is completed by cloning the cached result"""
+        first = self.make_job(project)
+        tasks.process_job.apply(args=[first.id])
+        JobResult.objects.filter(job=first).update(result_file='jobs/results/shared.mp3')
+        ResultCacheEntry.objects.update(result_file='jobs/results/shared.mp3')
+        
+        second = self.make_job(project)
+        tasks.process_job.apply(args=[second.id])
+        
+        second.refresh_from_db()
+        assert second.status == JobStatus.COMPLETED
+        assert second.result.meta['cache_hit'] is True
+        assert second.result.result_file.name == 'jobs/results/shared.mp3'
+        # The log names the source job but does not copy (or point at) its log
+        assert f'source job {first.id}' in second.result.logs
+        assert f'/api/jobs/{second.id}/logs/' in second.result.logs
+        assert f'/api/jobs/{first.id}/logs/' not in second.result.logs
+        lines = job_logs.read_lines(second.id)
+        assert len(lines) == 1 and 'served from cache' in lines[0]
+        stats = result_cache.stats()
+        assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+    
+    def test_key_depends_on_parameters_and_bypass_flag(self, project, eager_celery):
+        """Different parameters miss, and meta cache=false skips the lookup"""
+        tasks.process_job.apply(args=[self.make_job(project).id])
+        
+        assert result_cache.lookup(self.make_job(project, voice='fr-FR')) is None
+        assert result_cache.lookup(self.make_job(project, cache=False)) is None
+        assert result_cache.lookup(self.make_job(project, cache=True)) is not None
+    
+    def test_evict_by_ttl_and_size(self, settings):
+        """Expired entries go first, then least recently used over the size cap"""
+        from datetime import timedelta
+        from django.utils import timezone
+        settings.RESULT_CACHE_TTL_SECONDS = 3600
+        settings.RESULT_CACHE_MAX_BYTES = 250
+        now = timezone.now()
+        for index, age in enumerate([7200, 30, 20, 10]):
+            ResultCacheEntry.objects.create(
+                key=f'{index:064d}',
+                job_type=JobType.TTS,
+                size_bytes=100,
+                last_used_at=now - timedelta(seconds=age)
+            )
+        
+        assert result_cache.evict(now=now) == 2
+        assert sorted(ResultCacheEntry.objects.values_list('key', flat=True)) == [f'{2:064d}', f'{3:064d}']
+
+
+@pytest.mark.django_db
+class TestBulkJobSubmission:
+    """Test bulk job creation endpoint"""
+    
+    @pytest.fixture
+    def editor(self):
+        user = User.objects.create_user(username='editor', password='editor123')
+        Profile.objects.create(user=user, role=UserRole.EDITOR)
+        return user
+    
+    @pytest.fixture
+    def client(self, editor):
+        client = APIClient()
+        client.force_authenticate(user=editor)
+        return client
+    
+    def test_bulk_create_reports_per_item_errors(self, client, editor, monkeypatch, settings,
+                                                 django_capture_on_commit_callbacks,
+                                                 django_assert_max_num_queries):
+        """Valid specs are created and scheduled after commit, invalid ones reported by index"""
+        settings.SCHEDULER_MAX_RUNNING_PER_USER = 100
+        settings.SCHEDULER_MAX_RUNNING_PER_PROJECT = 100
+        calls = []
+        monkeypatch.setattr(tasks.process_job, 'apply_async', lambda **kwargs: calls.append(kwargs))
+        project = Project.objects.create(name='Test Project', owner=editor)
+        specs = [{'project_id': project.id, 'type': JobType.TTS, 'meta': {'n': n}} for n in range(50)]
+        specs.insert(3, {'project_id': 999999, 'type': JobType.TTS})
+        specs.insert(7, {'project_id': project.id, 'type': 'not_a_type'})
+        
+        with django_capture_on_commit_callbacks(execute=True):
+            with django_assert_max_num_queries(16):
+                response = client.post('/api/jobs/bulk/', {'jobs': specs}, format='json')
+        
+        assert response.status_code == status.HTTP_201_CREATED
+        assert (response.data['created'], response.data['failed']) == (50, 2)
+        results = response.data['results']
+        assert [item['index'] for item in results] == list(range(52))
+        assert 'project_id' in results[3]['errors']
+        assert 'type' in results[7]['errors']
+        assert Job.objects.filter(project=project, created_by=editor).count() == 50
+        # Only as many as the TTS queue can run are released
+        assert len(calls) == get_processor(JobType.TTS).max_concurrency
+        assert calls[0]['queue'] == 'jobs.tts'
+        assert calls[0]['args'] == [results[0]['id']]
+    
+    def test_bulk_jobs_are_created_by_the_requesting_user(self, client, editor, monkeypatch):
+        """A created_by_id in a spec cannot assign jobs to someone else"""
+        monkeypatch.setattr(tasks.process_job, 'apply_async', lambda **kwargs: None)
+        other = User.objects.create_user(username='other', password='other123')
+        project = Project.objects.create(name='Test Project', owner=editor)
+        
+        response = client.post('/api/jobs/bulk/', {'jobs': [
+            {'project_id': project.id, 'type': JobType.TTS, 'created_by_id': other.id},
+        ]}, format='json')
+        
+        assert response.status_code == status.HTTP_201_CREATED
+        assert Job.objects.get(pk=response.data['results'][0]['id']).created_by == editor
+    
+    def test_bulk_rejects_all_invalid_and_oversized(self, client, settings):
+        """A batch with no valid specs or over the limit creates nothing"""
+        response = client.post('/api/jobs/bulk/', {'jobs': [{'type': JobType.TTS}]}, format='json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['failed'] == 1
+        
+        settings.JOB_BULK_MAX_ITEMS = 2
+        response = client.post('/api/jobs/bulk/', {'jobs': [{}, {}, {}]}, format='json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert Job.objects.count() == 0
+
+
+@pytest.mark.django_db
+class TestScheduler:
+    """Test fair-share and priority scheduling in front of process_job"""
+    
+    @pytest.fixture(autouse=True)
+    def dispatched(self, monkeypatch, settings):
+        from django.core.cache import cache
+        cache.delete_many([scheduler.VTIME_KEY, scheduler.LOCK_KEY, scheduler.RERUN_KEY])
+        settings.SCHEDULER_MAX_RUNNING_PER_USER = 2
+        settings.SCHEDULER_MAX_RUNNING_PER_PROJECT = 100
+        calls = []
+        monkeypatch.setattr(tasks, 'dispatch_jobs', lambda jobs: calls.extend(job.id for job in jobs))
+        return calls
+    
+    def submit(self, user, project, count, **meta):
+        jobs = scheduler.assign_schedule([
+            Job(project=project, type=JobType.STT, created_by=user, meta=dict(meta))
+            for _ in range(count)
+        ])
+        return Job.objects.bulk_create(jobs)
+    
+    def test_fair_share_interleaves_users(self):
+        """A user with a large backlog does not hold back another user's jobs"""
+        heavy = User.objects.create_user(username='heavy', password='testpass123')
+        light = User.objects.create_user(username='light', password='testpass123')
+        heavy_jobs = self.submit(heavy, Project.objects.create(name='Heavy', owner=heavy), 20)
+        light_jobs = self.submit(light, Project.objects.create(name='Light', owner=light), 2)
+        
+        order = list(scheduler.pending_jobs().values_list('id', flat=True))
+        assert order[:4] == [heavy_jobs[0].id, light_jobs[0].id, heavy_jobs[1].id, light_jobs[1].id]
+    
+    def test_keys_for_many_users_and_projects_cost_fixed_queries(self, django_assert_num_queries):
+        """A batch spanning many users and projects reads their latest keys with one query per dimension"""
+        users = [User.objects.create_user(username=f'user-{index}', password='x') for index in range(5)]
+        projects = [Project.objects.create(name=f'Project {index}', owner=user) for index, user in enumerate(users)]
+        earlier = self.submit(users[0], projects[0], 1)
+        batch = [
+            Job(project=projects[index % 5], type=JobType.STT, created_by=users[(index * 2) % 5])
+            for index in range(20)
+        ]
+        
+        # Virtual time, latest user keys, latest project keys
+        with django_assert_num_queries(3):
+            scheduler.assign_schedule(batch)
+        
+        assert batch[0].schedule_key == earlier[0].schedule_key + 1
+        assert batch[5].schedule_key == batch[0].schedule_key + 1
+        assert batch[1].schedule_key == earlier[0].schedule_key
+    
+    def test_priority_comes_first(self):
+        """meta.priority set by staff overrides fair-share order"""
+        user = User.objects.create_user(username='testuser', password='testpass123', is_staff=True)
+        project = Project.objects.create(name='Test Project', owner=user)
+        normal = self.submit(user, project, 3)
+        urgent = self.submit(user, project, 1, priority=5)
+        
+        assert urgent[0].priority == 5
+        assert scheduler.pending_jobs().first() == urgent[0]
+        assert scheduler.queue_info(normal[0])['position'] == 1
+    
+    def test_non_staff_priority_is_capped(self):
+        """A non-staff user's high priority does not jump ahead of another user's jobs"""
+        other = User.objects.create_user(username='other', password='testpass123')
+        pushy = User.objects.create_user(username='pushy', password='testpass123')
+        waiting = self.submit(other, Project.objects.create(name='Other', owner=other), 1)
+        pushed = self.submit(pushy, Project.objects.create(name='Pushy', owner=pushy), 1, priority=100)
+        lowered = self.submit(pushy, Project.objects.create(name='Later', owner=pushy), 1, priority=-5)
+        
+        assert pushed[0].priority == 0
+        assert lowered[0].priority == -5
+        order = list(scheduler.pending_jobs().values_list('id', flat=True))
+        assert order == [waiting[0].id, pushed[0].id, lowered[0].id]
+    
+    def test_virtual_time_falls_back_to_lowest_pending_key(self):
+        """With the cache cleared, virtual time is the smallest key, not the highest-priority job's"""
+        from django.core.cache import cache
+        staff = User.objects.create_user(username='staff', password='testpass123', is_staff=True)
+        project = Project.objects.create(name='Test Project', owner=staff)
+        jobs = self.submit(staff, project, 3)
+        self.submit(staff, project, 1, priority=5)
+        
+        cache.delete(scheduler.VTIME_KEY)
+        assert scheduler.virtual_time() == jobs[0].schedule_key
+    
+    def test_caps_hold_jobs_until_capacity_frees(self, dispatched, django_capture_on_commit_callbacks):
+        """Per-user caps limit released jobs; finishing one releases the next"""
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        project = Project.objects.create(name='Test Project', owner=user)
+        jobs = self.submit(user, project, 4)
+        
+        with django_capture_on_commit_callbacks(execute=True):
+            assert scheduler.schedule() == 2
+        assert dispatched == [jobs[0].id, jobs[1].id]
+        info = scheduler.queue_info(Job.objects.get(pk=jobs[3].pk))
+        assert info['wait_reason'] == scheduler.WAIT_USER_LIMIT
+        assert info['position'] == 1
+        
+        Job.objects.filter(pk=jobs[0].pk).update(status=JobStatus.COMPLETED)
+        with django_capture_on_commit_callbacks(execute=True):
+            assert scheduler.schedule() == 1
+        assert dispatched[-1] == jobs[2].id
+        assert scheduler.queue_info(Job.objects.get(pk=jobs[2].pk))['wait_reason'] is None
+    
+    def test_queue_endpoint(self, dispatched, django_capture_on_commit_callbacks):
+        """The queue action exposes position and wait reason"""
+        user = User.objects.create_user(username='editor', password='editor123')
+        Profile.objects.create(user=user, role=UserRole.EDITOR)
+        project = Project.objects.create(name='Test Project', owner=user)
+        jobs = self.submit(user, project, 3)
+        with django_capture_on_commit_callbacks(execute=True):
+            scheduler.schedule()
+        client = APIClient()
+        client.force_authenticate(user=user)
+        
+        response = client.get(f'/api/jobs/{jobs[2].id}/queue/')
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['position'] == 0
+        assert response.data['wait_reason'] == scheduler.WAIT_USER_LIMIT
+    
+    def test_stale_dispatches_release_capacity(self, dispatched, django_capture_on_commit_callbacks, settings):
+        """Jobs released longer ago than the lease stop holding capacity"""
+        from datetime import timedelta
+        from django.utils import timezone
+        settings.SCHEDULER_DISPATCH_LEASE = 600
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        project = Project.objects.create(name='Test Project', owner=user)
+        jobs = self.submit(user, project, 4)
+        # Released, then their worker died: still PENDING/RUNNING
+        Job.objects.filter(pk=jobs[0].pk).update(dispatched_at=timezone.now() - timedelta(seconds=601))
+        Job.objects.filter(pk=jobs[1].pk).update(
+            status=JobStatus.RUNNING, dispatched_at=timezone.now() - timedelta(seconds=601)
+        )
+        
+        with django_capture_on_commit_callbacks(execute=True):
+            assert scheduler.schedule() == 2
+        assert dispatched == [jobs[2].id, jobs[3].id]
+    
+    def test_empty_registry_fails_loudly(self, monkeypatch):
+        """Without registered processors the scheduler raises instead of reporting full queues"""
+        from django.core.exceptions import ImproperlyConfigured
+        from . import processors
+        monkeypatch.setattr(processors, '_registry', {})
+        monkeypatch.setattr(processors, '_fallback', None)
+        
+        with pytest.raises(ImproperlyConfigured):
+            scheduler.Capacity()
+    
+    def test_processors_registered_without_importing_tasks(self):
+        """App start registers the processors, so web processes can schedule jobs"""
+        import subprocess
+        import sys
+        script = (
+            'import sys, django; django.setup()\n'
+            'from core import scheduler\n'
+            'from core.processors import get_processor\n'
+            'print(get_processor("tts").queue, scheduler.Capacity().is_full())\n'
+        )
+        output = subprocess.run(
+            [sys.executable, '-c', script], capture_output=True, text=True, check=True, timeout=60,
+        ).stdout
+        
+        assert output.split() == ['jobs.tts', 'False']
+
+
+@pytest.mark.django_db
+class TestCancellation:
+    """Test cooperative cancellation of pending and running jobs"""
+    
+    @pytest.fixture(autouse=True)
+    def clear_flags(self):
+        from django.core.cache import cache
+        yield
+        # Job IDs are reused between tests, so stale flags must not leak
+        cache.clear()
+    
+    @pytest.fixture
+    def job(self):
+        user = User.objects.create_user(username='editor', password='editor123')
+        Profile.objects.create(user=user, role=UserRole.EDITOR)
+        project = Project.objects.create(name='Test Project', owner=user)
+        return Job.objects.create(project=project, type=JobType.TTS, created_by=user)
+    
+    def test_running_processor_stops_at_next_step(self, job, eager_celery, monkeypatch):
+        """Cancelling mid-flight stops the loop and never completes the job"""
+        steps = []
+        
+        def sleep(seconds):
+            steps.append(seconds)
+            if len(steps) == 2:
+                cancellation.cancel(Job.objects.select_related('project', 'created_by').get(pk=job.pk))
+        monkeypatch.setattr(tasks.time, 'sleep', sleep)
+        
+        outcome = tasks.process_job.apply(args=[job.id]).get()
+        
+        assert outcome == f"Job {job.id} cancelled"
+        assert len(steps) == 2
+        job.refresh_from_db()
+        assert job.status == JobStatus.CANCELLED
+        assert not JobResult.objects.filter(job=job).exists()
+    
+    def test_late_result_is_discarded(self, job, eager_celery):
+        """A processor that finishes after cancellation cannot overwrite CANCELLED"""
+        Job.objects.filter(pk=job.pk).update(status=JobStatus.RUNNING)
+        job.refresh_from_db()
+        reporter = ProgressReporter(job)
+        cancellation.cancel(job)
+        
+        outcome = tasks.finish_job(job, reporter, {'success': True, 'result_url': 'https://example.com/r'})
+        
+        assert 'discarded' in outcome
+        job.refresh_from_db()
+        assert job.status == JobStatus.CANCELLED
+        assert not JobResult.objects.filter(job=job).exists()
+    
+    def test_token_polls_cache_with_throttle(self, job):
+        """The token reads the flag at most once per poll interval"""
+        now = [0.0]
+        token = cancellation.CancellationToken(job.id, poll_interval=1.0, clock=lambda: now[0])
+        token.check()
+        cancellation.cancel(job)
+        token.check()
+        now[0] = 1.5
+        with pytest.raises(cancellation.JobCancelled):
+            token.check()
+    
+    def test_cancel_endpoint_revokes_queued_task(self, job, monkeypatch):
+        """Cancelling a released but not yet started job revokes its task"""
+        from django.utils import timezone
+        revoked = []
+        monkeypatch.setattr(tasks.process_job.app.control, 'revoke', lambda task_id: revoked.append(task_id))
+        Job.objects.filter(pk=job.pk).update(dispatched_at=timezone.now())
+        client = APIClient()
+        client.force_authenticate(user=job.created_by)
+        
+        response = client.post(f'/api/jobs/{job.id}/cancel/')
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['status'] == JobStatus.CANCELLED
+        assert revoked == [f'process_job-{job.id}']
+        assert tasks.process_job.apply(args=[job.id]).get() == f"Job {job.id} already in final state: cancelled"
+        assert client.post(f'/api/jobs/{job.id}/cancel/').status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+class TestJobLogs:
+    """Test streaming job logs"""
+    
+    @pytest.fixture
+    def job(self):
+        user = User.objects.create_user(username='editor', password='editor123')
+        Profile.objects.create(user=user, role=UserRole.EDITOR)
+        project = Project.objects.create(name='Test Project', owner=user)
+        return Job.objects.create(project=project, type=JobType.TTS, created_by=user)
+    
+    def test_lines_are_flushed_to_segments_and_broadcast(self, job, settings, monkeypatch):
+        """Batches are persisted in rolling segments and published to the job group"""
+        settings.JOB_LOG_SEGMENT_LINES = 4
+        layer = RecordingChannelLayer()
+        monkeypatch.setattr('core.events.channel_layer', layer)
+        log = JobLog(job, flush_lines=3, flush_interval=60)
+        
+        for number in range(10):
+            log.append(f'line {number}', timestamp=False)
+        summary = log.close()
+        
+        assert len(os.listdir(job_logs.log_dir(job.id))) == 3
+        assert job_logs.log_size(job.id) == (10, sum(len(f'line {n}\n') for n in range(10)))
+        assert job_logs.read_lines(job.id, 3, 6) == ['line 3', 'line 4', 'line 5']
+        assert job_logs.read_bytes(job.id, 7, 20) == b'line 1\nline 2'
+        events = layer.messages_for(f'job_{job.id}')
+        assert [event['first_line'] for event in events] == [0, 3, 6, 9]
+        assert events[1]['lines'] == ['line 3', 'line 4', 'line 5']
+        assert layer.messages_for('user_') == []
+        assert summary.startswith('10 log lines') and summary.endswith('line 9')
+    
+    def test_new_writer_continues_existing_log(self, job, monkeypatch):
+        """A fan-in task appends after the lines its processor wrote"""
+        monkeypatch.setattr('core.events.channel_layer', RecordingChannelLayer())
+        first = JobLog(job)
+        first.append('before fan-out', timestamp=False)
+        first.flush()
+        
+        second = JobLog(job)
+        second.append('after fan-in', timestamp=False)
+        second.close()
+        
+        assert job_logs.read_lines(job.id) == ['before fan-out', 'after fan-in']
+    
+    def test_processor_log_summary_and_range_endpoint(self, job, eager_celery):
+        """JobResult.logs keeps a summary and the endpoint serves ranges"""
+        tasks.process_job.apply(args=[job.id])
+        job.refresh_from_db()
+        client = APIClient()
+        client.force_authenticate(user=job.created_by)
+        
+        total, _ = job_logs.log_size(job.id)
+        assert total == 7
+        assert job.result.logs.startswith(f'7 log lines')
+        assert f'/api/jobs/{job.id}/logs/' in job.result.logs
+        
+        response = client.get(f'/api/jobs/{job.id}/logs/?start_line=1&end_line=3')
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['total_lines'] == 7
+        assert (response.data['start_line'], response.data['end_line']) == (1, 3)
+        assert response.data['lines'][0].endswith('Text input parsed and validated')
+        
+        response = client.get(f'/api/jobs/{job.id}/logs/?start_byte=0&end_byte=10')
+        assert response.data['text'] == job_logs.read_bytes(job.id, 0, 10).decode()
+        assert client.get(f'/api/jobs/{job.id}/logs/?start_line=x').status_code == status.HTTP_400_BAD_REQUEST
+    
+    def test_project_deletion_removes_job_logs(self, job, monkeypatch, django_capture_on_commit_callbacks):
+        """Deleting a project removes the log segments of the jobs it cascades to"""
+        monkeypatch.setattr('core.events.channel_layer', RecordingChannelLayer())
+        other_project = Project.objects.create(name='Other Project', owner=job.created_by)
+        other = Job.objects.create(project=other_project, type=JobType.TTS, created_by=job.created_by)
+        for logged in (job, other):
+            log = JobLog(logged)
+            log.append('Processing')
+            log.close()
+        client = APIClient()
+        client.force_authenticate(user=job.created_by)
+        
+        with django_capture_on_commit_callbacks(execute=True):
+            response = client.delete(f'/api/projects/{job.project_id}/')
+        
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        assert not os.path.exists(job_logs.log_dir(job.id))
+        assert os.path.exists(job_logs.log_dir(other.id))
+
+
+@pytest.mark.django_db
+class TestJWTAuthMiddleware:
+    """Test WebSocket JWT authentication and the user cache"""
+    
+    def connect(self, middleware, query_string=b'', headers=()):
+        from asgiref.sync import async_to_sync
+        seen = {}
+        
+        async def inner(scope, receive, send):
+            seen.update(scope)
+        
+        async_to_sync(JWTAuthMiddleware(inner, cache=middleware))(
+            {'type': 'websocket', 'query_string': query_string, 'headers': list(headers)}, None, None
+        )
+        return seen
+    
+    def test_token_resolves_user_and_role_once(self):
+        """Repeated connects for one user are served from the cache"""
+        from rest_framework_simplejwt.tokens import AccessToken
+        user = User.objects.create_user(username='editor', password='editor123')
+        Profile.objects.create(user=user, role=UserRole.EDITOR)
+        token = str(AccessToken.for_user(user))
+        cache = UserCache(max_size=10, ttl=60)
+        
+        for _ in range(3):
+            scope = self.connect(cache, query_string=f'token={token}'.encode())
+        scope = self.connect(cache, headers=[(b'authorization', f'Bearer {token}'.encode())])
+        
+        assert scope['user'] == user
+        assert scope['role'] == UserRole.EDITOR
+        assert (cache.loads, cache.hits) == (1, 3)
+    
+    def test_invalid_or_missing_token_is_anonymous(self):
+        """Bad tokens and unknown users leave the connection unauthenticated"""
+        cache = UserCache(max_size=10, ttl=60)
+        
+        assert not self.connect(cache)['user'].is_authenticated
+        assert not self.connect(cache, query_string=b'token=not-a-jwt')['user'].is_authenticated
+        assert cache.loads == 0
+    
+    def test_session_cookie_still_authenticates(self, client):
+        """Without a token the stack falls back to the Django session; a token takes precedence"""
+        from asgiref.sync import async_to_sync
+        from rest_framework_simplejwt.tokens import AccessToken
+        from .middleware import JWTAuthMiddlewareStack, user_cache
+        user_cache.invalidate()
+        user = User.objects.create_user(username='editor', password='editor123')
+        Profile.objects.create(user=user, role=UserRole.EDITOR)
+        other = User.objects.create_user(username='other', password='other123')
+        client.force_login(user)
+        cookie = f'sessionid={client.cookies["sessionid"].value}'.encode()
+        
+        def connect(query_string=b''):
+            seen = {}
+            
+            async def inner(scope, receive, send):
+                seen.update(scope)
+            
+            async_to_sync(JWTAuthMiddlewareStack(inner))(
+                {'type': 'websocket', 'query_string': query_string, 'headers': [(b'cookie', cookie)]}, None, None
+            )
+            return seen
+        
+        scope = connect()
+        assert scope['user'] == user
+        assert scope['role'] == UserRole.EDITOR
+        assert connect(f'token={AccessToken.for_user(other)}'.encode())['user'] == other
+    
+    def test_cache_is_bounded_expires_and_coalesces(self):
+        """Entries expire after the TTL, the LRU entry is evicted, and concurrent misses share one load"""
+        import asyncio
+        from asgiref.sync import async_to_sync
+        now = [0.0]
+        loads = []
+        
+        def loader(user_id):
+            loads.append(user_id)
+            return f'user-{user_id}', None
+        cache = UserCache(max_size=2, ttl=10, loader=loader, clock=lambda: now[0])
+        
+        async def storm():
+            return await asyncio.gather(*(cache.get(user_id) for user_id in [1, 1, 1, 2, 2]))
+        
+        assert [user for user, _ in async_to_sync(storm)()] == ['user-1'] * 3 + ['user-2'] * 2
+        assert loads == [1, 2]
+        async_to_sync(cache.get)(3)
+        async_to_sync(cache.get)(2)
+        async_to_sync(cache.get)(1)
+        assert loads == [1, 2, 3, 1]
+        now[0] = 11
+        async_to_sync(cache.get)(1)
+        assert loads == [1, 2, 3, 1, 1]
+
+
+@pytest.mark.django_db
+class TestMultiplexedSubscriptions:
+    """Test subscribing one WebSocket to many jobs and projects"""
+    
+    @pytest.fixture
+    def owner(self):
+        return User.objects.create_user(username='owner', password='owner123')
+    
+    def run(self, user, steps):
+        """Connect as user, run steps(communicator, layer) and disconnect"""
+        from asgiref.sync import async_to_sync
+        from channels.layers import get_channel_layer
+        from channels.testing import WebsocketCommunicator
+        from .consumers import UserJobsConsumer
+        
+        async def session():
+            communicator = WebsocketCommunicator(UserJobsConsumer.as_asgi(), '/ws/jobs/user/')
+            communicator.scope['user'] = user
+            connected, _ = await communicator.connect()
+            assert connected
+            assert (await communicator.receive_json_from())['type'] == 'connection_established'
+            try:
+                return await steps(communicator, get_channel_layer())
+            finally:
+                await communicator.disconnect()
+        
+        return async_to_sync(session)()
+    
+    def test_subscribe_many_and_demultiplex(self, owner):
+        """One socket follows several jobs and a project; each event is tagged and delivered once"""
+        project = Project.objects.create(name='Mine', owner=owner)
+        first = Job.objects.create(project=project, type=JobType.TTS, created_by=owner)
+        second = Job.objects.create(project=project, type=JobType.STT, created_by=owner)
+        stranger = User.objects.create_user(username='stranger', password='stranger123')
+        foreign = Job.objects.create(
+            project=Project.objects.create(name='Theirs', owner=stranger), type=JobType.TTS, created_by=stranger
+        )
+        
+        async def steps(communicator, layer):
+            await communicator.send_json_to({
+                'type': 'subscribe', 'jobs': [first.id, second.id, foreign.id], 'projects': [project.id],
+            })
+            reply = await communicator.receive_json_from()
+            event = {'type': 'job_progress', 'job_id': second.id, 'progress': 10, 'timestamp': 't1'}
+            await layer.group_send(f'job_{second.id}', event)
+            await layer.group_send(f'project_{project.id}_jobs', event)
+            await layer.group_send(f'job_{first.id}', {**event, 'job_id': first.id})
+            received = [await communicator.receive_json_from(), await communicator.receive_json_from()]
+            assert await communicator.receive_nothing()
+            
+            await communicator.send_json_to({'type': 'unsubscribe', 'jobs': [first.id]})
+            unsubscribed = await communicator.receive_json_from()
+            await layer.group_send(f'job_{first.id}', {**event, 'job_id': first.id, 'timestamp': 't2'})
+            assert await communicator.receive_nothing()
+            return reply, received, unsubscribed
+        
+        reply, received, unsubscribed = self.run(owner, steps)
+        
+        assert reply['jobs'] == [first.id, second.id]
+        assert reply['projects'] == [project.id]
+        assert reply['rejected']['jobs'] == [{'id': foreign.id, 'reason': 'not_found'}]
+        assert [message['job_id'] for message in received] == [second.id, first.id]
+        assert unsubscribed['subscriptions'] == 3
+    
+    def test_job_route_checks_visibility(self, owner, monkeypatch):
+        """/ws/jobs/<id>/ closes with 4003 for a job the user may not see, before joining or replaying"""
+        from asgiref.sync import async_to_sync
+        from channels.routing import URLRouter
+        from channels.testing import WebsocketCommunicator
+        from .routing import websocket_urlpatterns
+        monkeypatch.setattr(event_replay, '_store', event_replay.LocalEventStore())
+        stranger = User.objects.create_user(username='stranger', password='stranger123')
+        foreign = Job.objects.create(
+            project=Project.objects.create(name='Theirs', owner=stranger), type=JobType.TTS, created_by=stranger
+        )
+        event_replay.record({'type': 'job_progress', 'job_id': foreign.id, 'progress': 50}, [f'job_{foreign.id}'])
+        
+        async def session():
+            path = f'/ws/jobs/{foreign.id}/?last_event_id=0'
+            communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), path)
+            communicator.scope['user'] = owner
+            connected, code = await communicator.connect()
+            if not connected:
+                return code, []
+            messages = [await communicator.receive_json_from() for _ in range(3)]
+            await communicator.disconnect()
+            return code, [message['type'] for message in messages]
+        
+        assert async_to_sync(session)() == (4003, [])
+        owner.is_superuser = True
+        _, received = async_to_sync(session)()
+        assert received == ['connection_established', 'job_progress', 'replay_complete']
+    
+    def test_subscription_cap(self, owner, settings):
+        """Subscriptions beyond WS_MAX_SUBSCRIPTIONS are rejected"""
+        settings.WS_MAX_SUBSCRIPTIONS = 3
+        project = Project.objects.create(name='Mine', owner=owner)
+        jobs = [Job.objects.create(project=project, type=JobType.TTS, created_by=owner) for _ in range(4)]
+        
+        async def steps(communicator, layer):
+            await communicator.send_json_to({'type': 'subscribe', 'jobs': [job.id for job in jobs]})
+            return await communicator.receive_json_from()
+        
+        reply = self.run(owner, steps)
+        
+        # The user's own jobs group counts towards the cap
+        assert reply['jobs'] == [jobs[0].id, jobs[1].id]
+        assert [item['reason'] for item in reply['rejected']['jobs']] == ['limit_reached'] * 2
+        assert reply['subscriptions'] == 3
+
+
+@pytest.mark.django_db
+class TestEventCoalescing:
+    """Test the per-connection coalescing window of job event consumers"""
+    
+    def test_progress_is_coalesced_and_status_kept(self):
+        """Superseded progress is dropped, status changes are kept, and one batch frame is sent"""
+        from asgiref.sync import async_to_sync
+        from channels.layers import get_channel_layer
+        from channels.testing import WebsocketCommunicator
+        from .consumers import UserJobsConsumer
+        user = User.objects.create_user(username='owner', password='owner123')
+        group = f'user_{user.id}_jobs'
+        
+        async def session():
+            layer = get_channel_layer()
+            communicator = WebsocketCommunicator(UserJobsConsumer.as_asgi(), '/ws/jobs/user/?coalesce=50')
+            communicator.scope['user'] = user
+            await communicator.connect()
+            await communicator.receive_json_from()
+            for progress in (10, 20, 30):
+                await layer.group_send(group, {
+                    'type': 'job_progress', 'job_id': 1, 'progress': progress, 'timestamp': f'p{progress}',
+                })
+            await layer.group_send(group, {
+                'type': 'job_status_change', 'job_id': 1, 'status': 'COMPLETED', 'timestamp': 's1',
+            })
+            await layer.group_send(group, {'type': 'job_progress', 'job_id': 2, 'progress': 5, 'timestamp': 'p5'})
+            frames = [await communicator.receive_json_from()]
+            assert await communicator.receive_nothing()
+            await communicator.disconnect()
+            return frames
+        
+        frames = async_to_sync(session)()
+        
+        assert len(frames) == 1 and frames[0]['type'] == 'batch'
+        assert [(event['type'], event['job_id'], event.get('progress')) for event in frames[0]['events']] == [
+            ('job_progress', 1, 30),
+            ('job_status_change', 1, None),
+            ('job_progress', 2, 5),
+        ]
+
+
+@pytest.mark.django_db
+class TestEventReplay:
+    """Test numbered job events and replay after reconnects"""
+    
+    @pytest.fixture
+    def job(self, monkeypatch):
+        monkeypatch.setattr(event_replay, '_store', event_replay.LocalEventStore())
+        user = User.objects.create_user(username='owner', password='owner123')
+        project = Project.objects.create(name='Mine', owner=user)
+        job = Job.objects.create(project=project, type=JobType.TTS, created_by=user)
+        return Job.objects.select_related('project', 'created_by').get(id=job.id)
+    
+    def test_reconnect_replays_missed_events(self, job):
+        """Events after last_event_id are sent once, in order, before replay_complete"""
+        from asgiref.sync import async_to_sync
+        from channels.testing import WebsocketCommunicator
+        from .consumers import UserJobsConsumer
+        publisher = JobEventPublisher(layer=RecordingChannelLayer())
+        for progress in (10, 20):
+            publisher.publish(job, 'job_progress', progress=progress, status=job.status)
+        publisher.publish(job, 'job_status_change', status=JobStatus.COMPLETED, previous_status=JobStatus.RUNNING)
+        publisher.publish(job, 'job_log', groups=[f'job_{job.id}'], first_line=0, lines=['x'])
+        first_id = publisher.layer.sent[0][1]['event_id']
+        
+        async def session():
+            communicator = WebsocketCommunicator(
+                UserJobsConsumer.as_asgi(), f'/ws/jobs/user/?last_event_id={first_id}'
+            )
+            communicator.scope['user'] = job.created_by
+            await communicator.connect()
+            frames = [await communicator.receive_json_from() for _ in range(4)]
+            await communicator.disconnect()
+            return frames
+        
+        frames = async_to_sync(session)()
+        
+        assert frames[0]['type'] == 'connection_established'
+        assert [(frame['type'], frame['event_id']) for frame in frames[1:3]] == [
+            ('job_progress', first_id + 1), ('job_status_change', first_id + 2),
+        ]
+        assert frames[1]['progress'] == 20
+        assert frames[3] == {
+            'type': 'replay_complete', 'replayed': 2, 'last_event_id': first_id + 2, 'truncated': False,
+        }
+    
+    def test_buffer_is_bounded_and_reports_truncation(self, job, settings):
+        """Only the newest events per group are kept; older resume points are flagged"""
+        settings.JOB_EVENT_REPLAY_SIZE = 2
+        publisher = JobEventPublisher(layer=RecordingChannelLayer())
+        for progress in (10, 20, 30, 40):
+            publisher.publish(job, 'job_progress', progress=progress)
+        groups = [f'job_{job.id}', f'user_{job.created_by_id}_jobs']
+        
+        events, truncated = event_replay.read(groups, 0)
+        assert [event['progress'] for event in events] == [30, 40]
+        assert truncated
+        events, truncated = event_replay.read(groups, events[0]['event_id'])
+        assert [event['progress'] for event in events] == [40]
+        assert not truncated
+
+
+@pytest.mark.django_db
+class TestWebSocketProtocol:
+    """Test the negotiated compact MessagePack encoding"""
+    
+    def test_msgpack_subprotocol_sends_compact_frames(self):
+        """Negotiating msgpack switches to binary frames with short keys, integer codes and epoch ms"""
+        import msgpack
+        from asgiref.sync import async_to_sync
+        from channels.layers import get_channel_layer
+        from channels.testing import WebsocketCommunicator
+        from .consumers import UserJobsConsumer
+        from . import ws_protocol
+        user = User.objects.create_user(username='owner', password='owner123')
+        
+        async def session():
+            communicator = WebsocketCommunicator(
+                UserJobsConsumer.as_asgi(), '/ws/jobs/user/', subprotocols=[ws_protocol.MSGPACK_SUBPROTOCOL]
+            )
+            communicator.scope['user'] = user
+            connected, subprotocol = await communicator.connect()
+            established = msgpack.unpackb(await communicator.receive_from())
+            await get_channel_layer().group_send(f'user_{user.id}_jobs', {
+                'type': 'job_status_change', 'job_id': 5, 'event_id': 9, 'status': JobStatus.COMPLETED,
+                'previous_status': JobStatus.RUNNING, 'timestamp': '2026-01-01T00:00:00+00:00',
+            })
+            status_change = msgpack.unpackb(await communicator.receive_from())
+            await communicator.send_to(bytes_data=msgpack.packb({'type': 'ping', 'timestamp': 1}))
+            pong = msgpack.unpackb(await communicator.receive_from())
+            await communicator.disconnect()
+            return subprotocol, established, status_change, pong
+        
+        subprotocol, established, status_change, pong = async_to_sync(session)()
+        
+        assert subprotocol == ws_protocol.MSGPACK_SUBPROTOCOL
+        schema = established['schema']
+        assert schema['message_types'][established['t']] == 'connection_established'
+        assert status_change == {
+            't': schema['message_types'].index('job_status_change'),
+            'j': 5,
+            'e': 9,
+            's': schema['statuses'].index('completed'),
+            'ps': schema['statuses'].index('running'),
+            'ts': 1767225600000,
+        }
+        assert pong == {'t': schema['message_types'].index('pong'), 'ts': 1}
+        
+        # Types added later are appended, so existing codes keep their values
+        assert schema['message_types'][-1] == 'resync'
+        _, resync = ws_protocol.encode(
+            {'type': 'resync', 'reason': 'slow_consumer', 'last_event_id': 9}, ws_protocol.MSGPACK_SUBPROTOCOL
+        )
+        assert msgpack.unpackb(resync) == {
+            't': schema['message_types'].index('resync'), 'reason': 'slow_consumer', 'last_event_id': 9,
+        }
+
+
+@pytest.mark.django_db
+class TestServerSentEvents:
+    """Test the SSE job event streams"""
+    
+    @pytest.fixture
+    def job(self, monkeypatch):
+        from .middleware import user_cache
+        user_cache.invalidate()
+        monkeypatch.setattr(event_replay, '_store', event_replay.LocalEventStore())
+        user = User.objects.create_user(username='owner', password='owner123')
+        project = Project.objects.create(name='Mine', owner=user)
+        job = Job.objects.create(project=project, type=JobType.TTS, created_by=user)
+        return Job.objects.select_related('project', 'created_by').get(id=job.id)
+    
+    def get(self, path, user=None, **headers):
+        from asgiref.sync import async_to_sync
+        from django.test import AsyncClient
+        from rest_framework_simplejwt.tokens import AccessToken
+        if user is not None:
+            headers['Authorization'] = f'Bearer {AccessToken.for_user(user)}'
+        return async_to_sync(AsyncClient().get)(path, headers=headers)
+    
+    def test_stream_requires_access(self, job):
+        """Anonymous users get 401, other users' jobs 404, and owners a text/event-stream"""
+        stranger = User.objects.create_user(username='stranger', password='stranger123')
+        
+        assert self.get(f'/api/jobs/{job.id}/events/').status_code == 401
+        assert self.get(f'/api/jobs/{job.id}/events/', user=stranger).status_code == 404
+        response = self.get(f'/api/jobs/{job.id}/events/', user=job.created_by)
+        assert response.status_code == 200
+        assert response['Content-Type'] == 'text/event-stream'
+        assert self.get('/api/jobs/events/', user=job.created_by).status_code == 200
+    
+    def test_stream_replays_from_last_event_id_then_goes_live(self, job):
+        """Missed events are replayed once, live events follow, idle streams get keepalives"""
+        import json
+        from asgiref.sync import async_to_sync
+        from channels.layers import get_channel_layer
+        from .sse import event_stream
+        publisher = JobEventPublisher(layer=RecordingChannelLayer())
+        for progress in (10, 20):
+            publisher.publish(job, 'job_progress', progress=progress, status=job.status)
+        first_id = publisher.layer.sent[0][1]['event_id']
+        group = f'job_{job.id}'
+        
+        async def session():
+            layer = get_channel_layer()
+            stream = event_stream([group], after=first_id, keepalive=0.05)
+            messages = [await stream.__anext__(), await stream.__anext__()]
+            # An event delivered live after being replayed is skipped
+            await layer.group_send(group, publisher.layer.sent[3][1])
+            await layer.group_send(group, {'type': 'job_log', 'job_id': job.id, 'first_line': 0, 'lines': ['x']})
+            messages += [await stream.__anext__(), await stream.__anext__()]
+            await stream.aclose()
+            return messages, layer.groups.get(group)
+        
+        messages, members = async_to_sync(session)()
+        
+        assert messages[0] == 'retry: 3000\n\n'
+        assert messages[1].startswith(f'id: {first_id + 1}\nevent: job_progress\ndata: ')
+        assert json.loads(messages[1].split('data: ')[1])['progress'] == 20
+        assert messages[2].startswith('event: job_log\n')
+        assert messages[3] == ': keepalive\n\n'
+        assert not members
+    
+    def test_hub_fails_subscribers_when_joining_fails(self):
+        """A channel-layer error while joining reaches every waiting subscriber and is not cached"""
+        import asyncio
+        from asgiref.sync import async_to_sync
+        from channels.layers import InMemoryChannelLayer
+        from .sse import StreamHub
+        
+        class FlakyLayer(InMemoryChannelLayer):
+            failures = 1
+            
+            async def group_add(self, group, channel):
+                if self.failures:
+                    self.failures -= 1
+                    raise ConnectionError('channel layer unavailable')
+                await super().group_add(group, channel)
+        
+        hub = StreamHub(layer=FlakyLayer())
+        
+        async def session():
+            queues = [asyncio.Queue(), asyncio.Queue()]
+            outcomes = await asyncio.wait_for(asyncio.gather(
+                *(hub.subscribe('job_1', queue) for queue in queues), return_exceptions=True
+            ), timeout=5)
+            failed_entries = dict(hub._groups)
+            await asyncio.wait_for(hub.subscribe('job_1', queues[0]), timeout=5)
+            joined = len(hub.layer.groups.get('job_1', {}))
+            await hub.unsubscribe('job_1', queues[0])
+            return outcomes, failed_entries, joined
+        
+        outcomes, failed_entries, joined = async_to_sync(session)()
+        
+        assert [type(outcome) for outcome in outcomes] == [ConnectionError, ConnectionError]
+        assert failed_entries == {}
+        assert joined == 1
+
+
+@pytest.mark.django_db
+class TestPresence:
+    """Test subscriber-aware publishing"""
+    
+    @pytest.fixture
+    def job(self, monkeypatch, settings):
+        settings.PRESENCE_CACHE_SECONDS = 0
+        monkeypatch.setattr(presence, '_store', presence.LocalPresenceStore())
+        monkeypatch.setattr(presence, '_watched_cache', {})
+        monkeypatch.setattr(event_replay, '_store', event_replay.LocalEventStore())
+        user = User.objects.create_user(username='owner', password='owner123')
+        project = Project.objects.create(name='Mine', owner=user)
+        job = Job.objects.create(project=project, type=JobType.TTS, created_by=user)
+        return Job.objects.select_related('project', 'created_by').get(id=job.id)
+    
+    def test_unwatched_groups_are_skipped(self, job, settings):
+        """Events only go to groups with listeners, and a left group is kept for the grace period"""
+        from asgiref.sync import async_to_sync, sync_to_async
+        from channels.testing import WebsocketCommunicator
+        from .consumers import UserJobsConsumer
+        layer = RecordingChannelLayer()
+        publisher = JobEventPublisher(layer=layer)
+        
+        publisher.publish(job, 'job_progress', progress=10)
+        publisher.publish(job, 'job_log', first_line=0, lines=['x'])
+        assert layer.sent == []
+        # Still buffered for replay; log lines are not replayed
+        events, truncated = event_replay.read([f'user_{job.created_by_id}_jobs'], 0)
+        assert [event['progress'] for event in events] == [10] and not truncated
+        
+        async def session(grace):
+            communicator = WebsocketCommunicator(UserJobsConsumer.as_asgi(), '/ws/jobs/user/')
+            communicator.scope['user'] = job.created_by
+            await communicator.connect()
+            await communicator.receive_json_from()
+            await sync_to_async(publisher.publish)(job, 'job_progress', progress=20)
+            settings.PRESENCE_GRACE = grace
+            await communicator.disconnect()
+        
+        async_to_sync(session)(60)
+        publisher.publish(job, 'job_progress', progress=30)
+        assert [(group, message['progress']) for group, message in layer.sent] == [
+            (f'user_{job.created_by_id}_jobs', 20),
+            (f'user_{job.created_by_id}_jobs', 30),
+        ]
+        
+        # Without a grace period the group is skipped as soon as the last listener leaves
+        presence._store = presence.LocalPresenceStore()
+        layer.sent.clear()
+        async_to_sync(session)(0)
+        layer.sent.clear()
+        publisher.publish(job, 'job_progress', progress=40)
+        assert layer.sent == []
+    
+    def test_reconnect_after_grace_replays_skipped_events(self, job, settings):
+        """Events published while nobody listened are replayed to a client returning after the grace period"""
+        from asgiref.sync import async_to_sync
+        from channels.testing import WebsocketCommunicator
+        from .consumers import UserJobsConsumer
+        settings.PRESENCE_GRACE = 0
+        layer = RecordingChannelLayer()
+        publisher = JobEventPublisher(layer=layer)
+        publisher.publish(job, 'job_progress', progress=10)
+        last_seen = event_replay.read([f'user_{job.created_by_id}_jobs'], 0)[0][-1]['event_id']
+        publisher.publish(job, 'job_status_change', status=JobStatus.RUNNING, previous_status=JobStatus.PENDING)
+        publisher.publish(job, 'job_progress', progress=50)
+        assert layer.sent == []
+        
+        async def reconnect():
+            communicator = WebsocketCommunicator(
+                UserJobsConsumer.as_asgi(), f'/ws/jobs/user/?last_event_id={last_seen}'
+            )
+            communicator.scope['user'] = job.created_by
+            await communicator.connect()
+            messages = [await communicator.receive_json_from() for _ in range(4)]
+            await communicator.disconnect()
+            return messages
+        
+        messages = async_to_sync(reconnect)()
+        
+        assert [message['type'] for message in messages[1:]] == ['job_status_change', 'job_progress', 'replay_complete']
+        assert messages[2]['progress'] == 50
+        assert messages[3]['truncated'] is False
+    
+    def test_skipping_can_be_disabled(self, job, settings):
+        """JOB_EVENTS_SKIP_UNWATCHED=False always sends to every group"""
+        settings.JOB_EVENTS_SKIP_UNWATCHED = False
+        layer = RecordingChannelLayer()
+        JobEventPublisher(layer=layer).publish(job, 'job_progress', progress=10)
+        assert len(layer.sent) == 3
+
+
+@pytest.mark.django_db
+class TestSlowConsumerBackpressure:
+    """Test bounded outbound queues and delivery counters"""
+    
+    def test_overflow_coalesces_then_disconnects_with_resync(self, settings, monkeypatch):
+        """A stalled socket coalesces progress, then gets a resync hint and is closed; counters are recorded"""
+        import asyncio
+        from asgiref.sync import async_to_sync
+        from channels.layers import get_channel_layer
+        from channels.testing import WebsocketCommunicator
+        from django.core.cache import cache
+        from .consumers import UserJobsConsumer
+        settings.WS_OUTBOUND_QUEUE_SIZE = 3
+        cache.clear()
+        monkeypatch.setattr(ws_metrics, '_known', set())
+        user = User.objects.create_user(username='owner', password='owner123')
+        group = f'user_{user.id}_jobs'
+        
+        class StalledConsumer(UserJobsConsumer):
+            async def send_json(self, data):
+                if data['type'].startswith('job_'):
+                    # The client stopped reading
+                    await asyncio.sleep(3600)
+                await super().send_json(data)
+        
+        async def session():
+            layer = get_channel_layer()
+            communicator = WebsocketCommunicator(StalledConsumer.as_asgi(), '/ws/jobs/user/')
+            communicator.scope['user'] = user
+            await communicator.connect()
+            await communicator.receive_json_from()
+            for event_id, progress in enumerate((10, 20, 30), start=1):
+                await layer.group_send(group, {
+                    'type': 'job_progress', 'job_id': 1, 'event_id': event_id, 'progress': progress,
+                })
+            for event_id in range(4, 8):
+                await layer.group_send(group, {
+                    'type': 'job_status_change', 'job_id': event_id, 'event_id': event_id, 'status': 'completed',
+                })
+            resync = await communicator.receive_json_from()
+            closed = await communicator.receive_output()
+            await communicator.disconnect()
+            return resync, closed
+        
+        resync, closed = async_to_sync(session)()
+        
+        assert resync == {'type': 'resync', 'reason': 'slow_consumer', 'last_event_id': None}
+        assert closed == {'type': 'websocket.close', 'code': 4008}
+        # The queued progress event does not count against the limit of 3: the
+        # fourth status change overflows, dropping the queue (progress + 3) and itself
+        assert ws_metrics.stats()['StalledConsumer'] == {
+            'delivered': 0, 'coalesced': 1, 'dropped': 5, 'overflow_disconnects': 1,
+        }
+
+
+class TestUnixSocketChannelLayer:
+    """Test the Redis-free channel layer for single-host deployments"""
+    
+    def test_group_send_from_worker_reaches_other_process(self, tmp_path):
+        """A worker-side layer instance fans out to another instance's channels via async_to_sync"""
+        from asgiref.sync import async_to_sync, sync_to_async
+        from .channel_layers import UnixSocketChannelLayer
+        server = UnixSocketChannelLayer(path=str(tmp_path))
+        worker = UnixSocketChannelLayer(path=str(tmp_path))
+        
+        async def session():
+            first, second, other = [await server.new_channel() for _ in range(3)]
+            await server.group_add('job_1', first)
+            await server.group_add('job_1', second)
+            await server.group_add('job_2', other)
+            await sync_to_async(async_to_sync(worker.group_send), thread_sensitive=False)(
+                'job_1', {'type': 'job_progress', 'job_id': 1, 'progress': 50}
+            )
+            received = [await server.receive(first), await server.receive(second)]
+            await server.group_discard('job_1', second)
+            await worker.group_send('job_1', {'type': 'job_progress', 'job_id': 1, 'progress': 60})
+            await worker.send(other, {'type': 'job_log', 'job_id': 2})
+            received += [await server.receive(first), await server.receive(other)]
+            pending = server._queues[second].qsize()
+            await server.close()
+            return received, pending
+        
+        received, pending = async_to_sync(session)()
+        
+        assert [message.get('progress') for message in received] == [50, 50, 60, None]
+        assert received[3] == {'type': 'job_log', 'job_id': 2}
+        assert pending == 0
+    
+    def test_memberships_of_a_gone_process_are_removed(self, tmp_path):
+        """Sending to a group whose receiving process is gone drops its memberships"""
+        import os
+        from asgiref.sync import async_to_sync
+        from .channel_layers import UnixSocketChannelLayer
+        server = UnixSocketChannelLayer(path=str(tmp_path))
+        worker = UnixSocketChannelLayer(path=str(tmp_path))
+        
+        async def session():
+            channel = await server.new_channel()
+            await server.group_add('job_1', channel)
+            await server.close()
+            await worker.group_send('job_1', {'type': 'job_progress', 'job_id': 1})
+        
+        async_to_sync(session)()
+        
+        assert os.listdir(tmp_path / 'groups' / 'job_1') == []
+    
+    def test_group_add_survives_concurrent_discard(self, tmp_path, monkeypatch):
+        """A discard emptying and removing the group directory between mkdir and join does not fail the join"""
+        import os
+        from asgiref.sync import async_to_sync
+        from .channel_layers import UnixSocketChannelLayer
+        joining, leaving = UnixSocketChannelLayer(path=str(tmp_path)), UnixSocketChannelLayer(path=str(tmp_path))
+        makedirs = os.makedirs
+        interleaved = []
+        
+        async def session():
+            leaver = await leaving.new_channel()
+            await leaving.group_add('job_1', leaver)
+            channel = await joining.new_channel()
+            
+            def makedirs_then_discard(path, **kwargs):
+                makedirs(path, **kwargs)
+                if not interleaved and path.endswith('job_1'):
+                    # The other process leaves right after the directory was checked
+                    interleaved.append(path)
+                    # What group_discard() does in the other process
+                    os.unlink(os.path.join(path, leaver))
+                    os.rmdir(path)
+            
+            monkeypatch.setattr(os, 'makedirs', makedirs_then_discard)
+            await joining.group_add('job_1', channel)
+            monkeypatch.setattr(os, 'makedirs', makedirs)
+            for layer in (joining, leaving):
+                await layer.close()
+            return channel
+        
+        channel = async_to_sync(session)()
+        
+        assert interleaved
+        assert os.listdir(tmp_path / 'groups' / 'job_1') == [channel]
+    
+    def test_undeliverable_messages_are_dropped_per_process(self, tmp_path):
+        """Oversized messages and refused datagrams are dropped without aborting the fan-out"""
+        import errno
+        import socket
+        from asgiref.sync import async_to_sync
+        from . import channel_layers
+        from .channel_layers import UnixSocketChannelLayer
+        refusing, accepting = UnixSocketChannelLayer(path=str(tmp_path)), UnixSocketChannelLayer(path=str(tmp_path))
+        worker = UnixSocketChannelLayer(path=str(tmp_path))
+        
+        class RefusingSocket:
+            """Refuses datagrams for one process with EMSGSIZE"""
+            def __init__(self):
+                self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            
+            def sendto(self, payload, path):
+                if refusing.process_id in path:
+                    raise OSError(errno.EMSGSIZE, 'Message too long')
+                return self.socket.sendto(payload, path)
+            
+            def close(self):
+                self.socket.close()
+        
+        async def session():
+            channels = [await refusing.new_channel(), await accepting.new_channel()]
+            for channel in channels:
+                await refusing.group_add('job_1', channel)
+            await worker.group_send('job_1', {'type': 'job_log', 'lines': ['x' * channel_layers.MAX_DATAGRAM]})
+            worker._sender = RefusingSocket()
+            await worker.group_send('job_1', {'type': 'job_progress', 'job_id': 1, 'progress': 70})
+            received = await accepting.receive(channels[1])
+            with pytest.raises(ValueError):
+                await worker.send('email.send', {'type': 'email'})
+            pending = [refusing._queues.get(channels[0]), accepting._queues[channels[1]].qsize()]
+            for layer in (refusing, accepting, worker):
+                await layer.close()
+            return received, pending
+        
+        received, pending = async_to_sync(session)()
+        
+        assert received['progress'] == 70
+        assert pending[0] is None or pending[0].empty()
+        assert pending[1] == 0
+
+
+@pytest.mark.django_db
+class TestKeysetPagination:
+    """Test cursor pagination of jobs and job results"""
+    
+    @pytest.fixture
+    def user(self):
+        user = User.objects.create_user(username='owner', password='owner123')
+        Profile.objects.create(user=user, role=UserRole.EDITOR)
+        return user
+    
+    @pytest.fixture
+    def client(self, user):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        return client
+    
+    @pytest.fixture
+    def jobs(self, user):
+        from django.utils import timezone
+        project = Project.objects.create(name='Paged', owner=user)
+        created_at = timezone.now()
+        jobs = [
+            Job.objects.create(project=project, type=JobType.TTS, created_by=user, status=JobStatus.COMPLETED)
+            for _ in range(7)
+        ]
+        # Identical timestamps exercise the id tie-breaker
+        Job.objects.filter(pk__in=[job.pk for job in jobs]).update(created_at=created_at)
+        return jobs
+    
+    def test_cursor_walks_all_jobs_forward_and_back(self, client, jobs):
+        """next and previous links visit every job once, newest id first, keeping filters"""
+        expected = [job.id for job in sorted(jobs, key=lambda job: job.id, reverse=True)]
+        pages = []
+        response = client.get('/api/jobs/', {'page_size': 3, 'status': JobStatus.COMPLETED})
+        while True:
+            assert response.status_code == status.HTTP_200_OK
+            pages.append([job['id'] for job in response.data['results']])
+            if not response.data['next']:
+                break
+            assert 'status=completed' in response.data['next']
+            response = client.get(response.data['next'])
+        
+        assert pages == [expected[0:3], expected[3:6], expected[6:7]]
+        back = client.get(response.data['previous'])
+        assert [job['id'] for job in back.data['results']] == expected[3:6]
+        first = client.get(back.data['previous'])
+        assert [job['id'] for job in first.data['results']] == expected[0:3]
+        assert first.data['previous'] is None
+    
+    def test_count_opt_in_and_page_number_fallback(self, client, jobs):
+        """The total is only counted for count=true; ?page= keeps page number responses"""
+        response = client.get('/api/jobs/', {'page_size': 3})
+        assert 'count' not in response.data
+        assert len(response.data['results']) == 3
+        assert client.get('/api/jobs/', {'page_size': 3, 'count': 'true'}).data['count'] == 7
+        
+        response = client.get('/api/jobs/', {'page': 1})
+        assert response.data['count'] == 7
+        assert len(response.data['results']) == 7
+        assert 'cursor=' not in str(response.data['next'])
+        
+        assert client.get('/api/jobs/', {'cursor': 'not-a-cursor'}).status_code == status.HTTP_404_NOT_FOUND
+    
+    def test_cursor_bounds_the_index_scan(self, client, jobs):
+        """The cursor predicate has a plain range conjunct on the ordering column, not only an OR"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        following = client.get('/api/jobs/', {'page_size': 3}).data['next']
+        with CaptureQueriesContext(connection) as captured:
+            client.get(following)
+        
+        page = next(query['sql'] for query in captured.captured_queries if ' LIMIT ' in query['sql'])
+        # The OR branches use < and =; <= only appears as the range conjunct
+        assert '"core_job"."created_at" <= ' in page
+    
+    def test_job_results_paginate_by_finished_at(self, client, jobs):
+        """Job results are paged most recently finished first"""
+        results = [JobResult.objects.create(job=job, result_url=f'https://example.com/{job.id}') for job in jobs[:4]]
+        response = client.get('/api/job-results/', {'page_size': 2})
+        following = client.get(response.data['next'])
+        ids = [result['id'] for result in response.data['results'] + following.data['results']]
+        assert ids == [result.id for result in reversed(results)]
+
+
+@pytest.mark.django_db
+class TestListQueryPlans:
+    """Test that list endpoints page through indexes (PostgreSQL only)"""
+    
+    # Tables whose page queries must never fall back to a sequential scan
+    PAGED_TABLES = {'core_job', 'core_jobresult'}
+    # Ordering column a cursor must bound each paged table's index scan on
+    KEYSET_COLUMNS = {'core_job': 'created_at', 'core_jobresult': 'finished_at'}
+    
+    @pytest.fixture
+    def seeded(self):
+        """Large enough that the planner prefers indexes where they fit"""
+        from django.db import connection
+        if connection.vendor != 'postgresql':
+            pytest.skip('Query plans are checked on PostgreSQL only')
+        users = [User.objects.create_user(username=f'planner-{index}', password='x') for index in range(20)]
+        for user in users:
+            Profile.objects.create(user=user, role=UserRole.EDITOR)
+        projects = [Project.objects.create(name=f'Plans {index}', owner=user) for index, user in enumerate(users)]
+        statuses = (
+            [JobStatus.COMPLETED] * 90 + [JobStatus.FAILED] * 5
+            + [JobStatus.PENDING] * 3 + [JobStatus.RUNNING] * 2
+        )
+        jobs = Job.objects.bulk_create(
+            Job(
+                project=projects[index % len(projects)],
+                created_by=users[(index * 7) % len(users)],
+                type=JobType.TTS,
+                status=statuses[index % len(statuses)],
+            )
+            for index in range(20000)
+        )
+        JobResult.objects.bulk_create(JobResult(job=job) for job in jobs if job.status == JobStatus.COMPLETED)
+        with connection.cursor() as cursor:
+            cursor.execute("UPDATE core_job SET created_at = now() - id * interval '1 second'")
+            cursor.execute("UPDATE core_jobresult SET finished_at = now() - id * interval '1 second'")
+            cursor.execute('ANALYZE core_job, core_jobresult, core_project')
+        admin = User.objects.create_superuser(username='planner-admin', password='x')
+        return {'user': users[0], 'admin': admin, 'project': projects[3]}
+    
+    def plan_problems(self, client, path, params):
+        """
+        EXPLAIN the page query of a list request; return the problems found.
+        
+        Sequential scans of a paged table and sorts are problems. With a
+        cursor, an index scan that merely filters rows is one too: the
+        keyset column has to appear in an Index Cond, so the scan starts
+        at the cursor instead of at the first row.
+        """
+        import json
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as captured:
+            response = client.get(path, params)
+        assert response.status_code == status.HTTP_200_OK, path
+        pages = [query['sql'] for query in captured.captured_queries if ' LIMIT ' in query['sql']]
+        assert pages, f'No page query for {path}'
+        problems = []
+        for sql in pages:
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+                plan = cursor.fetchone()[0]
+            plan = json.loads(plan) if isinstance(plan, str) else plan
+            nodes = [plan[0]['Plan']]
+            bounded = set()
+            while nodes:
+                node = nodes.pop()
+                nodes.extend(node.get('Plans', []))
+                if node['Node Type'] in ('Sort', 'Incremental Sort'):
+                    problems.append(f"{path} {params}: {node['Node Type']} on {node.get('Sort Key')}")
+                if node['Node Type'] == 'Seq Scan' and node.get('Relation Name') in self.PAGED_TABLES:
+                    problems.append(f"{path} {params}: Seq Scan on {node['Relation Name']}")
+                relation = node.get('Relation Name')
+                if relation in self.PAGED_TABLES and self.KEYSET_COLUMNS[relation] in node.get('Index Cond', ''):
+                    bounded.add(relation)
+            table = 'core_jobresult' if 'job-results' in path else 'core_job'
+            if 'cursor' in params and table not in bounded:
+                problems.append(f"{path} {params}: no Index Cond on {table}.{self.KEYSET_COLUMNS[table]}")
+        return problems
+    
+    def test_list_endpoints_use_indexes_without_sorting(self, seeded):
+        """Job and result lists, filtered and deep-paged, neither scan the table nor sort, and cursors seek"""
+        from urllib.parse import parse_qs, urlparse
+        client = APIClient()
+        problems = []
+        for user in (seeded['admin'], seeded['user']):
+            client.force_authenticate(user=user)
+            requests = [
+                ('/api/jobs/', {}),
+                ('/api/jobs/', {'project': seeded['project'].id}),
+                ('/api/jobs/', {'status': JobStatus.RUNNING}),
+                ('/api/jobs/', {'status': JobStatus.PENDING, 'type': JobType.TTS}),
+                ('/api/job-results/', {}),
+            ]
+            for path, params in requests:
+                problems += self.plan_problems(client, path, params)
+                # A deep page continues from a cursor instead of an offset
+                deep = client.get(path, {**params, 'page_size': 100})
+                for _ in range(5):
+                    if deep.data['next']:
+                        deep = client.get(deep.data['next'])
+                if deep.data['next']:
+                    cursor = parse_qs(urlparse(deep.data['next']).query)['cursor'][0]
+                    problems += self.plan_problems(client, path, {**params, 'cursor': cursor})
+        
+        assert problems == []
+
+
+@pytest.mark.django_db
+class TestProjectJobCounts:
+    """Test job counts in project responses"""
+    
+    @pytest.fixture
+    def user(self):
+        user = User.objects.create_user(username='owner', password='owner123')
+        Profile.objects.create(user=user, role=UserRole.EDITOR)
+        return user
+    
+    @pytest.fixture
+    def client(self, user):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        return client
+    
+    def test_list_counts_jobs_per_status_in_one_query(self, client, user, django_assert_num_queries):
+        """A page of projects costs the same queries however many projects and jobs it holds"""
+        projects = [Project.objects.create(name=f'Counted {index}', owner=user) for index in range(5)]
+        statuses = [JobStatus.PENDING, JobStatus.RUNNING, JobStatus.COMPLETED, JobStatus.COMPLETED, JobStatus.FAILED]
+        Job.objects.bulk_create(
+            Job(project=project, type=JobType.TTS, created_by=user, status=job_status)
+            for project in projects[:3] for job_status in statuses
+        )
+        
+        # Page count, page, job counts
+        with django_assert_num_queries(3):
+            response = client.get('/api/projects/')
+        
+        by_name = {project['name']: project for project in response.data['results']}
+        assert by_name['Counted 0']['jobs_count'] == 5
+        assert by_name['Counted 0']['jobs_by_status'] == {
+            'pending': 1, 'running': 1, 'completed': 2, 'failed': 1, 'cancelled': 0,
+        }
+        assert by_name['Counted 4']['jobs_count'] == 0
+        assert set(by_name['Counted 4']['jobs_by_status'].values()) == {0}
+    
+    def test_detail_includes_counts(self, client, user):
+        """Project detail responses carry the same counts"""
+        project = Project.objects.create(name='Detail', owner=user)
+        Job.objects.create(project=project, type=JobType.TTS, created_by=user, status=JobStatus.CANCELLED)
+        response = client.get(f'/api/projects/{project.id}/')
+        assert response.data['jobs_count'] == 1
+        assert response.data['jobs_by_status']['cancelled'] == 1
+
+
+@pytest.mark.django_db
+class TestJobStats:
+    """Test incrementally maintained project and user job statistics"""
+    
+    @pytest.fixture
+    def editor(self):
+        user = User.objects.create_user(username='editor', password='editor123')
+        Profile.objects.create(user=user, role=UserRole.EDITOR)
+        return user
+    
+    @pytest.fixture
+    def client(self, editor):
+        client = APIClient()
+        client.force_authenticate(user=editor)
+        return client
+    
+    @pytest.fixture
+    def project(self, editor):
+        return Project.objects.create(name='Dashboard', owner=editor)
+    
+    @pytest.fixture
+    def lifecycle(self, client, project, eager_celery, monkeypatch):
+        """Three jobs created through the API: two processed to completion, one cancelled"""
+        from django.core.cache import cache
+        # Cancellation flags of earlier tests' jobs would stop jobs reusing their IDs
+        cache.clear()
+        monkeypatch.setattr(tasks.process_job, 'apply_async', lambda **kwargs: None)
+        ids = [
+            client.post('/api/jobs/', {
+                'project_id': project.id, 'created_by_id': project.owner_id, 'type': JobType.TTS,
+                'input_url': f'https://example.com/{n}.txt',
+            }, format='json').data['id']
+            for n in range(3)
+        ]
+        for job_id in ids[:2]:
+            tasks.process_job.apply(args=[job_id])
+        cancellation.cancel(Job.objects.select_related('project', 'created_by').get(pk=ids[2]))
+        return ids
+    
+    def test_counters_follow_job_lifecycle(self, client, project, lifecycle, django_assert_num_queries):
+        """Creation, processing and cancellation are counted; the endpoints read one row"""
+        with django_assert_num_queries(1):
+            user_stats = client.get('/api/jobs/stats/').data
+        project_stats = client.get(f'/api/projects/{project.id}/stats/').data
+        
+        for stats in (user_stats, project_stats):
+            assert (stats['total'], stats['completed'], stats['cancelled'], stats['pending']) == (3, 2, 1, 0)
+            assert stats['success_rate'] == 1.0
+            assert stats['average_duration_seconds'] >= 0
+        assert job_stats.reconcile() == 0
+    
+    def test_deletes_are_uncounted(self, client, editor, project, lifecycle):
+        """Deleting a job or a whole project removes its jobs from the counters"""
+        client.delete(f'/api/jobs/{lifecycle[2]}/')
+        assert client.get('/api/jobs/stats/').data['cancelled'] == 0
+        
+        client.delete(f'/api/projects/{project.id}/')
+        assert client.get('/api/jobs/stats/').data['total'] == 0
+        assert not JobStats.objects.filter(scope=StatsScope.PROJECT, scope_id=project.id).exists()
+        assert job_stats.reconcile() == 0
+    
+    def test_cancel_counts_from_current_status(self, client, project, eager_celery, monkeypatch):
+        """Cancelling through a stale instance uncounts the status the job holds now"""
+        monkeypatch.setattr(tasks.process_job, 'apply_async', lambda **kwargs: None)
+        job_id = client.post('/api/jobs/', {
+            'project_id': project.id, 'created_by_id': project.owner_id, 'type': JobType.TTS,
+            'input_url': 'https://example.com/in.txt',
+        }, format='json').data['id']
+        stale = Job.objects.select_related('project', 'created_by').get(pk=job_id)
+        # A worker starts the job after the instance was read
+        tasks.update_job_progress(job_id, 10, JobStatus.RUNNING)
+        
+        assert cancellation.cancel(stale)
+        
+        stats = client.get('/api/jobs/stats/').data
+        assert (stats['pending'], stats['running'], stats['cancelled']) == (0, 0, 1)
+        assert job_stats.reconcile() == 0
+    
+    def test_reconcile_and_rebuild_repair_drift(self, editor, project, lifecycle):
+        """Drifted rows are recomputed; the rebuild command recreates identical rows"""
+        from django.core.management import call_command
+        fields = ['scope', 'scope_id', 'pending', 'running', 'completed', 'failed', 'cancelled', 'duration_count']
+        expected = sorted(JobStats.objects.values_list(*fields))
+        JobStats.objects.filter(scope=StatsScope.USER).update(completed=40, running=3)
+        # Changes that bypass the API are missed until reconciled
+        Job.objects.filter(pk=lifecycle[2]).delete()
+        
+        assert job_stats.reconcile() == 2
+        assert job_stats.summary(StatsScope.USER, editor.id)['total'] == 2
+        
+        JobStats.objects.all().delete()
+        call_command('rebuild_job_stats', stdout=open(os.devnull, 'w'))
+        rows = sorted(JobStats.objects.values_list(*fields))
+        assert [row[:6] for row in rows] == [
+            (scope, scope_id, 0, 0, 2, 0) for scope, scope_id, *_ in expected
+        ]
+        assert [row[6:] for row in rows] == [(0, 2), (0, 2)]
+
+
+@pytest.mark.django_db
+class TestSparseFieldsets:
+    """Test ?fields= and ?expand= on list and detail endpoints"""
+    
+    @pytest.fixture
+    def editor(self):
+        user = User.objects.create_user(username='editor', password='editor123')
+        Profile.objects.create(user=user, role=UserRole.EDITOR)
+        return user
+    
+    @pytest.fixture
+    def client(self, editor):
+        client = APIClient()
+        client.force_authenticate(user=editor)
+        return client
+    
+    @pytest.fixture
+    def jobs(self, editor):
+        project = Project.objects.create(name='Sparse', owner=editor)
+        jobs = [
+            Job.objects.create(project=project, type=JobType.TTS, created_by=editor, meta={'voice': 'en-US'})
+            for _ in range(4)
+        ]
+        JobResult.objects.create(job=jobs[0], result_url='https://example.com/out.mp3')
+        return jobs
+    
+    def test_fields_project_columns_and_joins(self, client, jobs):
+        """Only requested fields are rendered, and the page query neither joins users nor reads meta"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as captured:
+            response = client.get('/api/jobs/', {'fields': 'id,status,progress', 'count': 'false'})
+        
+        assert [set(job) for job in response.data['results']] == [{'id', 'status', 'progress'}] * 4
+        page = [query['sql'] for query in captured.captured_queries if 'core_job' in query['sql']]
+        assert len(page) == 1
+        assert 'auth_user' not in page[0] and '"meta"' not in page[0]
+    
+    def test_full_list_has_fixed_query_count(self, client, editor, jobs, django_assert_num_queries):
+        """Default rows still nest creator and project name, and has_result costs no per-row query"""
+        Job.objects.create(project=jobs[0].project, type=JobType.STT, created_by=editor)
+        # Only the page query; the total is opt-in
+        with django_assert_num_queries(1):
+            response = client.get('/api/jobs/')
+        
+        results = {job['id']: job for job in response.data['results']}
+        assert results[jobs[0].id]['has_result'] is True
+        assert results[jobs[1].id]['has_result'] is False
+        assert results[jobs[0].id]['created_by']['username'] == 'editor'
+        assert results[jobs[0].id]['project'] == 'Sparse (Owner: editor)'
+    
+    def test_expand_nests_related_objects(self, client, jobs):
+        """expand replaces string relations with nested objects, on jobs and on results"""
+        response = client.get(f'/api/jobs/{jobs[0].id}/', {'expand': 'project', 'fields': 'id,project'})
+        assert response.data == {
+            'id': jobs[0].id,
+            'project': {
+                'id': jobs[0].project_id, 'name': 'Sparse', 'owner_id': jobs[0].project.owner_id,
+                'created_at': response.data['project']['created_at'],
+            },
+        }
+        
+        response = client.get('/api/job-results/', {'expand': 'job', 'fields': 'id,job'})
+        nested = response.data['results'][0]['job']
+        assert (nested['id'], nested['has_result'], nested['meta']) == (jobs[0].id, True, {'voice': 'en-US'})
+        
+        response = client.get('/api/job-results/', {'fields': 'job_status,result_file_url'})
+        assert response.data['results'] == [{'job_status': JobStatus.PENDING, 'result_file_url': None}]
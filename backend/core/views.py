@@ -1,21 +1,27 @@
+import copy
 from django.shortcuts import render
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import viewsets, filters
 from rest_framework.decorators import action
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.db import connection, models
-from .models import Project, Job, JobResult, Profile, Settings, JobStatus
+from django.db import connection, models, transaction
+from .models import Project, Job, JobResult, Profile, Settings, JobStatus, StatsScope
 from .serializers import (
     ProjectSerializer,
     JobSerializer,
+    BulkJobSerializer,
     JobResultSerializer,
     ProfileSerializer,
-    SettingsSerializer
+    SettingsSerializer,
+    attach_job_counts
 )
 from .permissions import IsAdminOrEditor
-from .tasks import process_job
+from .pagination import JobPagination, JobResultPagination
+from .fieldsets import SparseFieldsViewSetMixin, query_list
+from . import result_cache, scheduler, cancellation, job_logs, ws_metrics, job_stats
 
 # Create your views here.
 
@@ -62,6 +68,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
     ViewSet for Project model.
     Provides CRUD operations for projects.
     Supports filtering by owner and search by name/description.
+    Responses carry jobs_count and jobs_by_status, counted per page in one query.
     Requires IsAdminOrEditor permission: Admin and Editor can create/edit, Viewer is read-only.
     """
     serializer_class = ProjectSerializer
@@ -79,12 +86,35 @@ class ProjectViewSet(viewsets.ModelViewSet):
         queryset = Project.objects.all()
         if not self.request.user.is_superuser:
             queryset = queryset.filter(owner=self.request.user)
-        return queryset.select_related('owner').prefetch_related('jobs')
+        return queryset.select_related('owner')
+    
+    def paginate_queryset(self, queryset):
+        """Count the page's jobs per status in one query (see attach_job_counts)"""
+        page = super().paginate_queryset(queryset)
+        requested = query_list(self.request, 'fields')
+        if page is not None and (not requested or requested & {'jobs_count', 'jobs_by_status'}):
+            attach_job_counts(page)
+        return page
     
     def perform_create(self, serializer):
         """Set the owner to the current user when creating a project"""
         serializer.save(owner=self.request.user)
     
+    def perform_destroy(self, instance):
+        """Delete the project and its jobs' log segments; the jobs are uncounted from their creators' statistics"""
+        with transaction.atomic():
+            job_ids = list(instance.jobs.values_list('id', flat=True))
+            job_stats.record_project_deleted(instance)
+            instance.delete()
+            # Segments are only removed once the cascade has been committed
+            transaction.on_commit(lambda: [job_logs.delete(job_id) for job_id in job_ids])
+    
+    @action(detail=True, methods=['get'])
+    def stats(self, request, pk=None):
+        """Job totals, success rate and average duration for a project"""
+        project = self.get_object()
+        return Response(job_stats.summary(StatsScope.PROJECT, project.pk))
+    
     @action(detail=True, methods=['get'])
     def jobs(self, request, pk=None):
         """Get all jobs for a specific project"""
@@ -94,19 +124,30 @@ class ProjectViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class JobViewSet(viewsets.ModelViewSet):
+class JobViewSet(SparseFieldsViewSetMixin, viewsets.ModelViewSet):
     """
     ViewSet for Job model.
     Provides CRUD operations for jobs.
     Supports filtering by project, type, status, and created_by.
+    Lists are cursor-paginated on (created_at, id); see core/pagination.py.
+    ?fields= lists load only the columns they render; see core/fieldsets.py.
     Requires IsAdminOrEditor permission: Admin and Editor can create/edit, Viewer is read-only.
     """
     serializer_class = JobSerializer
     permission_classes = [IsAuthenticated, IsAdminOrEditor]
+    pagination_class = JobPagination
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['type', 'status', 'project__name']
     ordering_fields = ['created_at', 'status', 'progress']
     ordering = ['-created_at']
+    field_columns = {
+        'project': (['project__name', 'project__owner__username'], ['project__owner']),
+        'created_by': (
+            ['created_by__username', 'created_by__email', 'created_by__first_name', 'created_by__last_name'],
+            ['created_by'],
+        ),
+        'has_result': ([], []),
+    }
     
     def get_queryset(self):
         """
@@ -136,19 +177,68 @@ class JobViewSet(viewsets.ModelViewSet):
         if job_type:
             queryset = queryset.filter(type=job_type)
         
-        return queryset.select_related('project', 'created_by').prefetch_related('result')
+        # has_result is answered by an EXISTS subquery instead of loading result rows
+        queryset = queryset.select_related('project__owner', 'created_by').annotate(
+            result_exists=models.Exists(JobResult.objects.filter(job=models.OuterRef('pk')))
+        )
+        return self.sparse_queryset(queryset)
     
     def perform_create(self, serializer):
         """
         Set the created_by to the current user when creating a job
         and trigger Celery task to process the job asynchronously.
         """
-        job = serializer.save(created_by=self.request.user)
+        with transaction.atomic():
+            job = serializer.save(created_by=self.request.user)
+            job_stats.record_created([job])
         
-        # Trigger Celery task to process the job asynchronously
-        # Only process if job status is PENDING (default)
+        # Hand the job to the scheduler, which releases it to the Celery queue
+        # registered for its type once capacity allows. Only process if job
+        # status is PENDING (default)
         if job.status == JobStatus.PENDING:
-            process_job.delay(job.id)
+            scheduler.submit(job)
+    
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Create many jobs in one request.
+        
+        Expects {"jobs": [{"project_id", "type", "input_url", "meta"}, ...]}.
+        Invalid specs are reported per item by index and do not fail the rest
+        of the batch. Valid jobs are inserted with one bulk INSERT, created by
+        the current user as in perform_create, and handed to the scheduler
+        once the transaction commits.
+        """
+        serializer = BulkJobSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        jobs = [
+            Job(
+                project_id=item['project_id'],
+                type=item['type'],
+                input_url=item.get('input_url'),
+                meta=item.get('meta', {}),
+                created_by=request.user,
+            )
+            for _, item in serializer.valid_items
+        ]
+        scheduler.assign_schedule(jobs)
+        with transaction.atomic():
+            jobs = Job.objects.bulk_create(jobs, batch_size=1000)
+            job_stats.record_created(jobs)
+            transaction.on_commit(scheduler.schedule)
+        
+        results = [
+            {'index': index, 'id': job.id}
+            for (index, _), job in zip(serializer.valid_items, jobs)
+        ]
+        results.extend({'index': index, 'errors': errors} for index, errors in serializer.item_errors)
+        results.sort(key=lambda item: item['index'])
+        return Response({
+            'created': len(jobs),
+            'failed': len(serializer.item_errors),
+            'results': results,
+        }, status=201 if jobs else 400)
     
     @action(detail=True, methods=['get'])
     def result(self, request, pk=None):
@@ -159,6 +249,104 @@ class JobViewSet(viewsets.ModelViewSet):
             return Response(serializer.data)
         return Response({'detail': 'No result found for this job'}, status=404)
     
+    def perform_update(self, serializer):
+        """Save the job and move it between statistics counters if needed"""
+        before = copy.copy(serializer.instance)
+        with transaction.atomic():
+            job = serializer.save()
+            job_stats.record_update(before, job)
+    
+    def perform_destroy(self, instance):
+        """Delete the job and its log segments"""
+        job_id = instance.id
+        with transaction.atomic():
+            job_stats.record_deleted([instance])
+            instance.delete()
+        job_logs.delete(job_id)
+    
+    @action(detail=True, methods=['get'])
+    def logs(self, request, pk=None):
+        """
+        Read a job's log by line or byte range.
+        
+        ?start_line=&end_line= returns lines [start_line, end_line);
+        ?start_byte=&end_byte= returns the uncompressed text in that byte range.
+        Ranges are capped at JOB_LOG_MAX_RANGE_LINES / JOB_LOG_MAX_RANGE_BYTES.
+        Live lines are pushed to job WebSocket subscribers as job_log events.
+        """
+        job = self.get_object()
+        params = request.query_params
+        try:
+            ranges = {
+                name: int(params[name]) if params.get(name) not in (None, '') else None
+                for name in ('start_line', 'end_line', 'start_byte', 'end_byte')
+            }
+        except ValueError:
+            return Response({'detail': 'Range parameters must be integers'}, status=400)
+        if any(value is not None and value < 0 for value in ranges.values()):
+            return Response({'detail': 'Range parameters must not be negative'}, status=400)
+        
+        total_lines, total_bytes = job_logs.log_size(job.id)
+        data = {'job_id': job.id, 'total_lines': total_lines, 'total_bytes': total_bytes}
+        
+        if ranges['start_byte'] is not None or ranges['end_byte'] is not None:
+            start = ranges['start_byte'] or 0
+            end = min(
+                ranges['end_byte'] if ranges['end_byte'] is not None else total_bytes,
+                start + settings.JOB_LOG_MAX_RANGE_BYTES,
+            )
+            text = job_logs.read_bytes(job.id, start, end).decode('utf-8', errors='replace')
+            data.update({'start_byte': start, 'end_byte': max(start, min(end, total_bytes)), 'text': text})
+        else:
+            start = ranges['start_line'] or 0
+            end = min(
+                ranges['end_line'] if ranges['end_line'] is not None else total_lines,
+                start + settings.JOB_LOG_MAX_RANGE_LINES,
+            )
+            lines = job_logs.read_lines(job.id, start, end)
+            data.update({'start_line': start, 'end_line': start + len(lines), 'lines': lines})
+        return Response(data)
+    
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        """Cancel a pending or running job"""
+        job = self.get_object()
+        if not cancellation.cancel(job):
+            return Response({'detail': f'Job cannot be cancelled (status: {job.status})'}, status=400)
+        serializer = self.get_serializer(job)
+        return Response(serializer.data)
+    
+    @action(detail=True, methods=['get'])
+    def queue(self, request, pk=None):
+        """Scheduling state of a job: priority, queue position and why it is waiting"""
+        job = self.get_object()
+        return Response(scheduler.queue_info(job))
+    
+    @action(detail=False, methods=['get'], url_path='cache-stats')
+    def cache_stats(self, request):
+        """Result cache hit/miss counters and size"""
+        return Response(result_cache.stats())
+    
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """
+        Job totals, success rate and average duration for the current user.
+        
+        Superusers can pass ?user=<id> to read another user's statistics.
+        """
+        user_id = request.user.id
+        if request.user.is_superuser and request.query_params.get('user'):
+            try:
+                user_id = int(request.query_params['user'])
+            except ValueError:
+                return Response({'detail': 'user must be an integer'}, status=400)
+        return Response(job_stats.summary(StatsScope.USER, user_id))
+    
+    @action(detail=False, methods=['get'], url_path='ws-stats')
+    def ws_stats(self, request):
+        """WebSocket delivered/coalesced/dropped counters per consumer class"""
+        return Response(ws_metrics.stats())
+    
     @action(detail=True, methods=['patch'])
     def update_progress(self, request, pk=None):
         """Update job progress"""
@@ -172,19 +360,28 @@ class JobViewSet(viewsets.ModelViewSet):
         return Response({'detail': 'Progress value required'}, status=400)
 
 
-class JobResultViewSet(viewsets.ModelViewSet):
+class JobResultViewSet(SparseFieldsViewSetMixin, viewsets.ModelViewSet):
     """
     ViewSet for JobResult model.
     Provides CRUD operations for job results.
     Supports filtering by job and search in metadata.
+    Lists are cursor-paginated on (finished_at, id); see core/pagination.py.
+    ?fields= lists load only the columns they render; see core/fieldsets.py.
     Requires IsAdminOrEditor permission: Admin and Editor can create/edit, Viewer is read-only.
     """
     serializer_class = JobResultSerializer
     permission_classes = [IsAuthenticated, IsAdminOrEditor]
+    pagination_class = JobResultPagination
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['job__type', 'job__status']
     ordering_fields = ['finished_at']
     ordering = ['-finished_at']
+    field_columns = {
+        'job': (['job__type', 'job__status', 'job__project__name'], ['job__project']),
+        'job_type': (['job__type'], ['job']),
+        'job_status': (['job__status'], ['job']),
+        'result_file_url': (['result_file'], []),
+    }
     
     def get_queryset(self):
         """
@@ -204,7 +401,9 @@ class JobResultViewSet(viewsets.ModelViewSet):
         if job_id:
             queryset = queryset.filter(job_id=job_id)
         
-        return queryset.select_related('job', 'job__project', 'job__created_by')
+        return self.sparse_queryset(
+            queryset.select_related('job__project__owner', 'job__created_by')
+        )
     
     @action(detail=True, methods=['get'])
     def job_details(self, request, pk=None):
@@ -0,0 +1,60 @@
+"""
+Delivery counters for the WebSocket consumers.
+
+Each connection counts, per consumer class:
+- delivered: events written to the socket
+- coalesced: progress events replaced by a newer one for the same job
+  before they were sent
+- dropped: events discarded when a slow client was disconnected
+- overflow_disconnects: connections closed because their outbound queue
+  was full (see JobEventsConsumer in core/consumers.py)
+
+Connections add their counts to totals in the Django cache (Redis in
+production) when they disconnect, and every
+settings.WS_METRICS_FLUSH_INTERVAL seconds while active. The totals are
+exposed by stats() and GET /api/jobs/ws-stats/. They are meant for sizing
+settings.WS_OUTBOUND_QUEUE_SIZE and the channel layer capacity from real
+traffic.
+"""
+
+from django.core.cache import cache
+
+
+COUNTERS = ('delivered', 'coalesced', 'dropped', 'overflow_disconnects')
+
+CONSUMERS_KEY = 'ws_metrics_consumers'
+
+# Consumer classes already registered in CONSUMERS_KEY by this process
+_known = set()
+
+
+def _key(consumer, counter):
+    return f'ws_metrics:{consumer}:{counter}'
+
+
+def record(consumer, counts):
+    """Add a connection's counts to the totals of its consumer class"""
+    if consumer not in _known:
+        names = set(cache.get(CONSUMERS_KEY) or ())
+        if consumer not in names:
+            cache.set(CONSUMERS_KEY, sorted(names | {consumer}), timeout=None)
+        _known.add(consumer)
+    for counter, value in counts.items():
+        if not value:
+            continue
+        key = _key(consumer, counter)
+        try:
+            cache.incr(key, value)
+        except ValueError:
+            # Counter missing or expired; add() avoids clobbering a concurrent incr
+            if not cache.add(key, value, timeout=None):
+                cache.incr(key, value)
+
+
+def stats():
+    """Totals per consumer class"""
+    result = {}
+    for consumer in cache.get(CONSUMERS_KEY) or ():
+        values = cache.get_many([_key(consumer, counter) for counter in COUNTERS])
+        result[consumer] = {counter: values.get(_key(consumer, counter), 0) for counter in COUNTERS}
+    return result
@@ -0,0 +1,138 @@
+"""
+Wire encodings for the job WebSocket consumers.
+
+Clients pick an encoding with the WebSocket subprotocol header
+(``Sec-WebSocket-Protocol``):
+
+- no subprotocol, or ``ai-platform.json.v1``: JSON text frames (default)
+- ``ai-platform.msgpack.v1``: compact MessagePack binary frames
+
+Compact frames carry the same messages as JSON, with these changes:
+- keys are shortened (KEYS)
+- message types, job statuses and job types become integer codes
+  (MESSAGE_TYPES, STATUSES, JOB_TYPES; the code is the list index)
+- ISO timestamps become epoch milliseconds
+
+The code tables are sent once, as ``schema`` in the connection_established
+frame, so clients do not have to hard-code them. The tables are
+append-only: new entries go at the end and existing codes never change.
+Values without a code are sent unchanged. Clients may send their own
+messages as JSON text or as MessagePack with the long key names.
+
+See ``python manage.py ws_protocol_benchmark`` for bytes on the wire and
+encode time of both encodings.
+"""
+
+import json
+from datetime import datetime
+import msgpack
+from .models import JobStatus, JobType
+
+
+JSON_SUBPROTOCOL = 'ai-platform.json.v1'
+MSGPACK_SUBPROTOCOL = 'ai-platform.msgpack.v1'
+
+MESSAGE_TYPES = [
+    'connection_established', 'pong', 'error', 'batch',
+    'job_update', 'job_progress', 'job_status_change', 'job_log',
+    'subscribed', 'unsubscribed', 'replay_complete', 'resync',
+]
+STATUSES = [
+    JobStatus.PENDING, JobStatus.RUNNING, JobStatus.COMPLETED, JobStatus.FAILED, JobStatus.CANCELLED,
+]
+JOB_TYPES = [
+    JobType.STT, JobType.TTS, JobType.VOICE_CLONING, JobType.DUBBING, JobType.AI_STORIES,
+]
+KEYS = {
+    'type': 't',
+    'job_id': 'j',
+    'event_id': 'e',
+    'timestamp': 'ts',
+    'progress': 'p',
+    'status': 's',
+    'previous_status': 'ps',
+    'job': 'jb',
+    'first_line': 'fl',
+    'lines': 'l',
+    'events': 'ev',
+    'id': 'i',
+    'input_url': 'u',
+    'project_id': 'pj',
+    'project_name': 'pn',
+    'created_by_id': 'cb',
+    'created_by_username': 'cu',
+    'created_at': 'ca',
+}
+
+TIMESTAMP_KEYS = {'timestamp', 'created_at'}
+
+_MESSAGE_TYPE_CODES = {name: code for code, name in enumerate(MESSAGE_TYPES)}
+_STATUS_CODES = {str(status): code for code, status in enumerate(STATUSES)}
+_JOB_TYPE_CODES = {str(job_type): code for code, job_type in enumerate(JOB_TYPES)}
+
+
+def negotiate(subprotocols):
+    """Pick the subprotocol to accept from the ones a client offered (None for plain JSON)"""
+    for name in subprotocols or ():
+        if name in (MSGPACK_SUBPROTOCOL, JSON_SUBPROTOCOL):
+            return name
+    return None
+
+
+def schema():
+    """Code tables for compact frames, sent to msgpack clients on connect"""
+    return {
+        'keys': KEYS,
+        'message_types': MESSAGE_TYPES,
+        'statuses': [str(status) for status in STATUSES],
+        'job_types': [str(job_type) for job_type in JOB_TYPES],
+    }
+
+
+def epoch_ms(value):
+    """ISO timestamp to epoch milliseconds; other values are returned unchanged"""
+    if not isinstance(value, str):
+        return value
+    try:
+        return int(datetime.fromisoformat(value).timestamp() * 1000)
+    except ValueError:
+        return value
+
+
+def compact(message, job_payload=False):
+    """Rewrite a message (or an embedded job payload) into its compact form"""
+    result = {}
+    for key, value in message.items():
+        if key == 'type':
+            value = (_JOB_TYPE_CODES if job_payload else _MESSAGE_TYPE_CODES).get(value, value)
+        elif key in ('status', 'previous_status'):
+            value = _STATUS_CODES.get(value, value)
+        elif key in TIMESTAMP_KEYS:
+            value = epoch_ms(value)
+        elif key == 'job' and isinstance(value, dict):
+            value = compact(value, job_payload=True)
+        elif key == 'events' and isinstance(value, list):
+            value = [compact(event) for event in value]
+        result[KEYS.get(key, key)] = value
+    return result
+
+
+def encode(message, subprotocol=None):
+    """Return ``(text_data, bytes_data)`` for a message in the negotiated encoding"""
+    if subprotocol == MSGPACK_SUBPROTOCOL:
+        return None, msgpack.packb(compact(message), use_bin_type=True)
+    return json.dumps(message), None
+
+
+def decode(text_data=None, bytes_data=None):
+    """Parse a client frame; raises ValueError if it cannot be decoded"""
+    if bytes_data is not None:
+        try:
+            message = msgpack.unpackb(bytes_data, raw=False)
+        except Exception as exc:
+            raise ValueError('Invalid MessagePack frame') from exc
+    else:
+        message = json.loads(text_data)
+    if not isinstance(message, dict):
+        raise ValueError('Message must be an object')
+    return message